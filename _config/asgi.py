@@ -2,6 +2,8 @@
 ASGI config for noteboard project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests are handled by Django, WebSocket connections by the room
+collaboration channel in ``utilities.realtime``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -13,4 +15,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "_config.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from utilities.realtime import lifespan, room_websocket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        return await room_websocket(scope, receive, send)
+
+    if scope["type"] == "lifespan":
+        return await lifespan(scope, receive, send)
+
+    return await django_application(scope, receive, send)
@@ -48,6 +48,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    # Before SessionMiddleware, to see responses after the session is saved.
+    "texteditor.middleware.AnonymousNoteTextMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -182,4 +184,81 @@ if os.environ.get("EMAIL_LOGGING") == "True":
 # reCAPTCHA
 
 RECAPTCHA_PUBLIC_KEY = os.environ.get("RECAPTCHA_PUBLIC_KEY")
-RECAPTCHA_PRIVATE_KEY = os.environ.get("RECAPTCHA_PRIVATE_KEY")
\ No newline at end of file
+RECAPTCHA_PRIVATE_KEY = os.environ.get("RECAPTCHA_PRIVATE_KEY")
+
+
+# S3
+# https://botocore.amazonaws.com/v1/documentation/api/latest/reference/config.html
+
+AWS_S3_MAX_POOL_CONNECTIONS = int(os.environ.get("AWS_S3_MAX_POOL_CONNECTIONS", 50))
+AWS_S3_MAX_ATTEMPTS = int(os.environ.get("AWS_S3_MAX_ATTEMPTS", 5))
+AWS_S3_RETRY_MODE = os.environ.get("AWS_S3_RETRY_MODE", "standard")
+AWS_S3_CONNECT_TIMEOUT = float(os.environ.get("AWS_S3_CONNECT_TIMEOUT", 5))
+AWS_S3_READ_TIMEOUT = float(os.environ.get("AWS_S3_READ_TIMEOUT", 30))
+
+# Serve the views that read or write storage with async variants (for ASGI).
+ASYNC_STORAGE_VIEWS = os.environ.get("ASYNC_STORAGE_VIEWS") == "True"
+# Async storage class. Defaults to aiobotocore; set it to
+# "utilities.async_storage.ThreadedObjectStorage" to use threads instead, or
+# to "utilities.async_storage.MemoryObjectStorage" for local development.
+ASYNC_OBJECT_STORAGE = os.environ.get("ASYNC_OBJECT_STORAGE", "")
+
+
+# Note text cache
+
+NOTE_TEXT_CACHE_MAX_SIZE = int(
+    os.environ.get("NOTE_TEXT_CACHE_MAX_SIZE", 64 * 1024 * 1024)
+)
+NOTE_TEXT_CACHE_ALIAS = os.environ.get("NOTE_TEXT_CACHE_ALIAS") or None
+NOTE_TEXT_CACHE_TIMEOUT = int(os.environ.get("NOTE_TEXT_CACHE_TIMEOUT", 24 * 60 * 60))
+
+
+# Note text storage
+
+# Store note text compressed and deduplicated by content (see TextBlob).
+NOTE_TEXT_CONTENT_ADDRESSED = os.environ.get("NOTE_TEXT_CONTENT_ADDRESSED") == "True"
+# Text up to this many bytes is kept in the database (see InlineNoteText).
+NOTE_TEXT_INLINE_MAX_SIZE = int(os.environ.get("NOTE_TEXT_INLINE_MAX_SIZE", 32 * 1024))
+# Concurrent uploads when storing many notes at once (e.g. on sign-up).
+NOTE_TEXT_UPLOAD_WORKERS = int(os.environ.get("NOTE_TEXT_UPLOAD_WORKERS", 8))
+
+
+# Canvas uploads
+
+# Lifetime, in seconds, of the presigned canvas upload and download URLs.
+CANVAS_URL_EXPIRY = int(os.environ.get("CANVAS_URL_EXPIRY", 5 * 60))
+CANVAS_MAX_SIZE = int(os.environ.get("CANVAS_MAX_SIZE", 32 * 1024 * 1024))
+CANVAS_URL_CACHE_ALIAS = os.environ.get("CANVAS_URL_CACHE_ALIAS", "default")
+
+
+# Note text buffer
+
+NOTE_TEXT_FLUSH_DELAY = float(os.environ.get("NOTE_TEXT_FLUSH_DELAY", 10))
+
+
+# Export
+
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", 8))
+
+
+# Home listing
+
+HOME_PAGE_SIZE = int(os.environ.get("HOME_PAGE_SIZE", 100))
+
+
+# Page cache
+
+RELEASE = os.environ.get("RELEASE", "")
+PAGE_CACHE_ALIAS = os.environ.get("PAGE_CACHE_ALIAS", "default")
+PAGE_CACHE_TIMEOUT = int(os.environ.get("PAGE_CACHE_TIMEOUT", 24 * 60 * 60))
+
+
+# Real-time collaboration
+
+REALTIME_BROKER = os.environ.get(
+    "REALTIME_BROKER", "utilities.realtime.InProcessBroker"
+)
+REALTIME_SAVE_INTERVAL = float(os.environ.get("REALTIME_SAVE_INTERVAL", 5))
+REALTIME_MAX_MESSAGE_SIZE = int(
+    os.environ.get("REALTIME_MAX_MESSAGE_SIZE", 1024 * 1024)
+)
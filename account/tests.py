@@ -1,3 +1,131 @@
-from django.test import TestCase
+import re
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser as DjangoAnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from texteditor.anonymous import AnonymousUser
+from texteditor.middleware import AnonymousNoteTextMiddleware
+from texteditor.models import (
+    AnonymousNoteText,
+    Canvas,
+    Folder,
+    InlineNoteText,
+    Note,
+    Room,
+)
+from utilities.page_cache import CSRF_TOKEN_PLACEHOLDER
+
+from .models import Accounts
+
+_csrf_input_pattern = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        caches[settings.PAGE_CACHE_ALIAS].clear()
+
+    def get_csrf_token(self, client: Client, path: str) -> str:
+        response = client.get(path)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, CSRF_TOKEN_PLACEHOLDER)
+
+        return _csrf_input_pattern.search(response.content.decode()).group(1)
+
+    def test_cached_page_carries_token_of_each_visitor(self):
+        first = Client(enforce_csrf_checks=True)
+        second = Client(enforce_csrf_checks=True)
+        path = reverse("sign_in_view")
+
+        with mock.patch(
+            "utilities.page_cache.render_to_string", wraps=render_to_string
+        ) as render:
+            first_token = self.get_csrf_token(first, path)
+            # The query string does not get a cache entry of its own.
+            second_token = self.get_csrf_token(second, f"{path}?next=/")
+
+        render.assert_called_once()
+
+        for client, token in ((first, first_token), (second, second_token)):
+            response = client.post(path, {"csrfmiddlewaretoken": token})
+            self.assertNotEqual(response.status_code, 403)
+
+        response = first.post(path, {"csrfmiddlewaretoken": "x" * 64})
+        self.assertEqual(response.status_code, 403)
+
+
+class EmailConfirmationTests(TestCase):
+    def create_anonymous_workspace(self) -> str:
+        """
+        Fill the workspace of a new anonymous session and return its key.
+        """
+
+        def view(request):
+            user = AnonymousUser.from_request(request)
+            folder = user.add_folder("folder")
+            subfolder = user.add_folder("sub", folder=folder)
+            user.add_note(text="first")
+            user.add_note(text="nested", folder=subfolder)
+            user.add_note(name="Shopping")
+            user.save(request.session)
+
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        request.user = DjangoAnonymousUser()
+        AnonymousNoteTextMiddleware(SessionMiddleware(view))(request)
+
+        return request.session.session_key
+
+    def test_confirmation_saves_anonymous_workspace(self):
+        account = Accounts.objects.create(email="user@example.com", confirmation_code=1)
+        Note.objects.create(
+            user=account,
+            name="Note1",
+            room=Room.objects.create(user=account, name="room"),
+            canvas_file=Canvas.objects.create(),
+        )
+        session_key = self.create_anonymous_workspace()
+        self.assertEqual(
+            AnonymousNoteText.objects.filter(session_key=session_key).count(), 3
+        )
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        session = self.client.session
+        session["confirming_account_id"] = account.id
+        session.save()
+
+        response = self.client.post(
+            reverse("email_confirmation_view"), {"confirmation_code": "1"}
+        )
+
+        self.assertRedirects(response, reverse("home"), fetch_redirect_response=False)
+        account.refresh_from_db()
+        self.assertTrue(account.is_active)
+
+        subfolder = Folder.objects.get(user=account, name="sub")
+        self.assertEqual(subfolder.folder.name, "folder")
+        self.assertIsNone(subfolder.folder.folder)
+
+        notes = {note.name: note for note in Note.objects.filter(user=account)}
+        # The default name already taken in the account is reassigned.
+        self.assertCountEqual(notes, ["Note1", "Note2", "Note3", "Shopping"])
+        self.assertEqual(notes["Note3"].folder, subfolder)
+        self.assertEqual(Room.objects.filter(user=account).count(), 4)
+        self.assertEqual(
+            dict(
+                InlineNoteText.objects.filter(note__user=account).values_list(
+                    "note__name", "text"
+                )
+            ),
+            {"Note2": "first", "Note3": "nested"},
+        )
+        self.assertFalse(
+            AnonymousNoteText.objects.filter(session_key=session_key).exists()
+        )
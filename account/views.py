@@ -17,6 +17,7 @@ from texteditor.anonymous import AnonymousUser
 from texteditor.models import Folder
 from utilities.generate_meta_tags import generate_meta_tags
 from utilities.notifications import send_admin_notification, send_user_notification
+from utilities.page_cache import render_cached_page
 
 
 class SignUpView(FormView):
@@ -28,19 +29,19 @@ class SignUpView(FormView):
         if request.user.is_authenticated:
             return redirect(reverse("home"))
 
-        form = SignUpForm()
+        def get_context():
+            meta_tags = generate_meta_tags(
+                "Noteboard · Sign Up",
+                "A web-based notepad.",
+                request.build_absolute_uri(reverse("sign_up_view")),
+            )
 
-        meta_tags = generate_meta_tags(
-            "Noteboard · Sign Up",
-            "A web-based notepad.",
-            request.build_absolute_uri(reverse("sign_up_view")),
-        )
+            return {
+                "meta_tags": meta_tags,
+                "form": SignUpForm(),
+            }
 
-        context = {
-            "meta_tags": meta_tags,
-            "form": form,
-        }
-        return render(request, self.sign_up_template, context)
+        return render_cached_page(request, self.sign_up_template, get_context)
 
     def post(self, request):
         form = SignUpForm(data=request.POST)
@@ -99,20 +100,19 @@ class SignInView(FormView):
         if request.user.is_authenticated:
             return redirect(reverse("home"))
 
-        form = SignInForm()
-
-        meta_tags = generate_meta_tags(
-            "Noteboard · Login",
-            "A web-based notepad.",
-            request.build_absolute_uri(reverse("sign_in_view")),
-        )
+        def get_context():
+            meta_tags = generate_meta_tags(
+                "Noteboard · Login",
+                "A web-based notepad.",
+                request.build_absolute_uri(reverse("sign_in_view")),
+            )
 
-        context = {
-            "form": form,
-            "meta_tags": meta_tags,
-        }
+            return {
+                "form": SignInForm(),
+                "meta_tags": meta_tags,
+            }
 
-        return render(request, self.sign_in_template, context)
+        return render_cached_page(request, self.sign_in_template, get_context)
 
     def post(self, request):
         if request.user.is_authenticated:
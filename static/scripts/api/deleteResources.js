@@ -0,0 +1,20 @@
+import { generateRequestHeaders } from './generateRequestHeaders.js';
+
+const deleteResources = async ({ resources }) => {
+    const url = '/resources/delete';
+    const headers = generateRequestHeaders();
+
+    const payload = {
+        resources: resources.map(({ id, token }) => ({ id, token })),
+    };
+
+    const response = await fetch(url, {
+        method: 'POST',
+        headers,
+        body: JSON.stringify(payload),
+    });
+
+    return response.json();
+};
+
+export { deleteResources };
@@ -0,0 +1,29 @@
+import { getCsrfToken } from '../utilities/getCsrfToken.js';
+
+const exportResources = ({ resources }) => {
+    const form = document.createElement('form');
+    form.method = 'POST';
+    form.action = '/resources/export';
+    form.classList.add('hidden');
+
+    const fields = {
+        csrfmiddlewaretoken: getCsrfToken(),
+        resources: JSON.stringify(
+            resources.map(({ id, token }) => ({ id, token })),
+        ),
+    };
+
+    for (const [name, value] of Object.entries(fields)) {
+        const input = document.createElement('input');
+        input.type = 'hidden';
+        input.name = name;
+        input.value = value;
+        form.appendChild(input);
+    }
+
+    document.body.appendChild(form);
+    form.submit();
+    form.remove();
+};
+
+export { exportResources };
@@ -67,9 +67,12 @@ document.addEventListener('DOMContentLoaded', async () => {
         event.stopPropagation();
 
         const csrfToken = getCSRFToken();
-        const destinationIndex = [...resourceList.children].indexOf(
-            placeholder,
+        const resourceOffset = parseInt(
+            document.querySelector('[name="resource-offset"]').value,
         );
+        const destinationIndex =
+            resourceOffset +
+            [...resourceList.children].indexOf(placeholder);
 
         const body = {
             moved_resource_id: draggedItemId,
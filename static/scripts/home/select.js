@@ -1,5 +1,5 @@
-import { getCsrfToken } from '../utilities/getCsrfToken.js';
-import { downloadTextFile } from '../utilities/files.js';
+import { deleteResources } from '../api/deleteResources.js';
+import { exportResources } from '../api/exportResources.js';
 
 const resources = document.querySelectorAll('.resource-list .resource');
 const dependantItems = document.querySelectorAll('.requires-selection');
@@ -116,12 +116,12 @@ selectAllButton.addEventListener('click', () => {
 });
 
 downloadButton.addEventListener('click', () => {
-    for (const resource of selection) {
-        if (resource.dataset.type === 'note') {
-            const text = resource.dataset.text;
-            downloadTextFile(`${resource.dataset.name}.txt`, text);
-        }
-    }
+    exportResources({
+        resources: selection.map((resource) => ({
+            id: parseInt(resource.dataset.id),
+            token: resource.dataset.token,
+        })),
+    });
 });
 
 deleteButton.addEventListener('click', async () => {
@@ -129,16 +129,15 @@ deleteButton.addEventListener('click', async () => {
         return;
     }
 
-    for (const resource of selection) {
-        const deleteForm = resource.querySelector('.delete-form');
-        const action = deleteForm.action;
+    const response = await deleteResources({
+        resources: selection.map((resource) => ({
+            id: parseInt(resource.dataset.id),
+            token: resource.dataset.token,
+        })),
+    });
 
-        await fetch(action, {
-            method: 'POST',
-            headers: {
-                'X-CSRFToken': getCsrfToken(),
-            },
-        });
+    if (!response.success) {
+        alert('Failed to delete the selected items.');
     }
 
     window.location.reload();
@@ -869,16 +869,50 @@ class Canvas {
     }
 
     async save() {
-        const url = `/notes/${this.noteToken}/canvas/save`;
-
-        const formData = new FormData();
         const blob = await new Promise((resolve) => {
             this.canvas.toBlob(resolve, 'image/png');
         });
 
-        formData.append('file', blob);
+        // The image goes straight to storage through a presigned URL, the
+        // server only records the upload once it is complete.
+        const uploadResponse = await fetch(
+            `/notes/${this.noteToken}/canvas/upload`,
+            {
+                method: 'POST',
+                headers: {
+                    'X-CSRFToken': getCsrfToken(),
+                },
+            },
+        );
 
-        fetch(url, {
+        if (!uploadResponse.ok) {
+            return;
+        }
+
+        const { payload } = await uploadResponse.json();
+
+        // Storage expects the signed fields first and the file last.
+        const uploadData = new FormData();
+
+        for (const [name, value] of Object.entries(payload.fields)) {
+            uploadData.append(name, value);
+        }
+
+        uploadData.append('file', blob);
+
+        const postResponse = await fetch(payload.url, {
+            method: 'POST',
+            body: uploadData,
+        });
+
+        if (!postResponse.ok) {
+            return;
+        }
+
+        const formData = new FormData();
+        formData.append('upload', payload.upload);
+
+        fetch(`/notes/${this.noteToken}/canvas/upload/complete`, {
             method: 'POST',
             headers: {
                 'X-CSRFToken': getCsrfToken(),
@@ -902,12 +936,20 @@ class Canvas {
     }
 
     async loadInitial() {
-        const url = `/notes/${this.noteToken}/canvas`;
+        const url = `/notes/${this.noteToken}/canvas/url`;
 
-        const response = await fetch(url);
         const canvasLoadingIcon = document.querySelector(
             '.canvas-loading-icon',
         );
+        const urlResponse = await fetch(url);
+
+        if (!urlResponse.ok) {
+            canvasLoadingIcon.classList.add('hidden');
+            return;
+        }
+
+        const { payload } = await urlResponse.json();
+        const response = await fetch(payload.url);
 
         if (!response.ok) {
             canvasLoadingIcon.classList.add('hidden');
@@ -0,0 +1,193 @@
+import { TextOperation } from './textOperation.js';
+
+const RETRY_DELAY = 2000;
+const FINAL_CLOSE_CODES = [4403, 4404];
+
+// Keeps a text area in sync with the other members of a room by exchanging
+// operations with the server (see utilities/realtime.py).
+//
+// At most one operation is outstanding (sent but not acknowledged). Local
+// edits made meanwhile are composed into `buffer` and sent together once
+// the outstanding operation is acknowledged. `shadow` is the text area value
+// the operations account for so far, and `confirmed` the text of the server
+// at `version`.
+//
+// Edits made while disconnected keep being composed into `buffer`, and are
+// rebased onto the next snapshot and sent like any other edit. Only the
+// outstanding operation is uncertain then: if the server applied it but the
+// connection dropped before its acknowledgement, it is sent again.
+const connectToRoom = ({ noteToken, roomName, textArea }) => {
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const url = `${protocol}//${window.location.host}/ws/${noteToken}/r/${roomName}/`;
+
+    let webSocket;
+    let version = null;
+    let hasConnected = false;
+    let confirmed = textArea.value;
+    let shadow = textArea.value;
+    let outstanding = null;
+    let buffer = null;
+
+    const isConnected = () =>
+        version !== null && webSocket.readyState === WebSocket.OPEN;
+
+    // False until the first snapshot, e.g. when the server has no channel.
+    const wasConnected = () => hasConnected;
+
+    const hasUnsentEdits = () => textArea.value !== confirmed;
+
+    // The text was saved without the channel, so a document opened from
+    // now on already contains it.
+    const setSavedText = (text) => {
+        if (!hasConnected && buffer === null) {
+            confirmed = text;
+            shadow = text;
+        }
+    };
+
+    const captureLocalEdits = () => {
+        if (textArea.value === shadow) {
+            return;
+        }
+
+        const operation = TextOperation.diff(shadow, textArea.value);
+        buffer = buffer === null ? operation : buffer.compose(operation);
+        shadow = textArea.value;
+    };
+
+    const send = () => {
+        if (outstanding !== null || buffer === null) {
+            return;
+        }
+
+        outstanding = buffer;
+        buffer = null;
+
+        webSocket.send(
+            JSON.stringify({
+                type: 'operation',
+                version,
+                operation: outstanding,
+            }),
+        );
+    };
+
+    const update = () => {
+        captureLocalEdits();
+
+        if (isConnected()) {
+            send();
+        }
+    };
+
+    const applyRemote = (operation) => {
+        let { selectionStart, selectionEnd } = textArea;
+
+        textArea.value = operation.apply(textArea.value);
+        shadow = textArea.value;
+
+        selectionStart = operation.transformIndex(selectionStart);
+        selectionEnd = operation.transformIndex(selectionEnd);
+        textArea.setSelectionRange(selectionStart, selectionEnd);
+    };
+
+    const handlers = {
+        snapshot: (message) => {
+            captureLocalEdits();
+
+            // Everything not acknowledged yet, rebased onto the snapshot.
+            let local = new TextOperation().retain(confirmed.length);
+
+            for (const operation of [outstanding, buffer]) {
+                if (operation !== null) {
+                    local = local.compose(operation);
+                }
+            }
+
+            const remote = TextOperation.diff(confirmed, message.text);
+            const [localPrime, remotePrime] = TextOperation.transform(
+                local,
+                remote,
+            );
+
+            version = message.version;
+            hasConnected = true;
+            confirmed = message.text;
+            outstanding = null;
+            buffer = localPrime.isNoop() ? null : localPrime;
+
+            applyRemote(remotePrime);
+            send();
+        },
+        ack: (message) => {
+            version = message.version;
+            confirmed = outstanding.apply(confirmed);
+            outstanding = null;
+            update();
+        },
+        operation: (message) => {
+            if (version === null || message.version <= version) {
+                return;
+            }
+
+            captureLocalEdits();
+
+            let remote = TextOperation.fromJSON(message.operation);
+            confirmed = remote.apply(confirmed);
+
+            if (outstanding !== null) {
+                [outstanding, remote] = TextOperation.transform(
+                    outstanding,
+                    remote,
+                );
+            }
+
+            if (buffer !== null) {
+                [buffer, remote] = TextOperation.transform(buffer, remote);
+            }
+
+            version = message.version;
+            applyRemote(remote);
+        },
+        error: (message) => {
+            console.error(message.message);
+        },
+    };
+
+    const connect = () => {
+        webSocket = new WebSocket(url);
+
+        webSocket.addEventListener('message', (event) => {
+            const message = JSON.parse(event.data);
+            handlers[message.type]?.(message);
+        });
+
+        webSocket.addEventListener('close', (event) => {
+            version = null;
+
+            if (!FINAL_CLOSE_CODES.includes(event.code)) {
+                setTimeout(connect, RETRY_DELAY);
+            }
+        });
+    };
+
+    connect();
+
+    window.addEventListener('beforeunload', (event) => {
+        if (hasConnected && hasUnsentEdits()) {
+            event.preventDefault();
+            return;
+        }
+
+        webSocket.close();
+    });
+
+    return {
+        isConnected,
+        wasConnected,
+        setSavedText,
+        update,
+    };
+};
+
+export { connectToRoom };
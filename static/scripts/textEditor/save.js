@@ -1,11 +1,23 @@
 import { isAnonymous } from '../anonymous.js';
 import { saveRoom as saveRoomAPI } from '../api/saveRoom.js';
 import { getInputValue } from '../utilities/inputs.js';
+import { connectToRoom } from './roomChannel.js';
 
 const textArea = document.querySelector('.editor-text-area');
 const noteToken = getInputValue('note-token');
 const isUsersRoom = getInputValue('is-users-room', (value) => value === 'true');
 
+// Notes of anonymous users only live in their session, so there is no room
+// to collaborate in and every change is saved directly.
+const room =
+    isAnonymous && isUsersRoom
+        ? null
+        : connectToRoom({
+              noteToken,
+              roomName: getInputValue('room-name'),
+              textArea,
+          });
+
 const saveFile = async () => {
     const text = textArea.value;
 
@@ -27,11 +39,24 @@ const saveFile = async () => {
 
     if (!response.success) {
         alert('Failed to save file');
+        return;
     }
+
+    room?.setSavedText(text);
 };
 
 let throttleTimeout;
 textArea.addEventListener('input', () => {
     clearTimeout(throttleTimeout);
+
+    // Once the room has connected, edits are sent as operations and the
+    // server saves the text. Edits made while reconnecting are sent once the
+    // connection is back: saving them directly would be overwritten by the
+    // document the other members still have open.
+    if (room && room.wasConnected()) {
+        room.update();
+        return;
+    }
+
     throttleTimeout = setTimeout(saveFile, 500);
 });
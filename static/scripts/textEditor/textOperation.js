@@ -0,0 +1,299 @@
+// Mirrors utilities/text_operations.py: an operation is a list of
+// components, where a positive number retains that many characters, a
+// negative one deletes them, and a string is inserted.
+
+const isRetain = (component) => typeof component === 'number' && component > 0;
+const isDelete = (component) => typeof component === 'number' && component < 0;
+const isInsert = (component) => typeof component === 'string';
+
+const isHighSurrogate = (code) => code >= 0xd800 && code <= 0xdbff;
+const isLowSurrogate = (code) => code >= 0xdc00 && code <= 0xdfff;
+
+class TextOperation {
+    constructor() {
+        this.components = [];
+        this.baseLength = 0;
+        this.targetLength = 0;
+    }
+
+    static fromJSON(components) {
+        const operation = new TextOperation();
+
+        for (const component of components) {
+            if (isInsert(component)) {
+                operation.insert(component);
+            } else if (isRetain(component)) {
+                operation.retain(component);
+            } else {
+                operation.delete(-component);
+            }
+        }
+
+        return operation;
+    }
+
+    toJSON() {
+        return this.components;
+    }
+
+    retain(length) {
+        if (length === 0) {
+            return this;
+        }
+
+        this.baseLength += length;
+        this.targetLength += length;
+
+        if (isRetain(this.components.at(-1))) {
+            this.components[this.components.length - 1] += length;
+        } else {
+            this.components.push(length);
+        }
+
+        return this;
+    }
+
+    insert(text) {
+        if (text === '') {
+            return this;
+        }
+
+        this.targetLength += text.length;
+        const components = this.components;
+
+        if (isInsert(components.at(-1))) {
+            components[components.length - 1] += text;
+        } else if (isDelete(components.at(-1))) {
+            if (isInsert(components.at(-2))) {
+                components[components.length - 2] += text;
+            } else {
+                components.splice(components.length - 1, 0, text);
+            }
+        } else {
+            components.push(text);
+        }
+
+        return this;
+    }
+
+    delete(length) {
+        if (length === 0) {
+            return this;
+        }
+
+        this.baseLength += length;
+
+        if (isDelete(this.components.at(-1))) {
+            this.components[this.components.length - 1] -= length;
+        } else {
+            this.components.push(-length);
+        }
+
+        return this;
+    }
+
+    isNoop() {
+        return (
+            this.components.length === 0 ||
+            (this.components.length === 1 && isRetain(this.components[0]))
+        );
+    }
+
+    apply(text) {
+        if (text.length !== this.baseLength) {
+            throw new Error('The operation does not match the text.');
+        }
+
+        const parts = [];
+        let cursor = 0;
+
+        for (const component of this.components) {
+            if (isInsert(component)) {
+                parts.push(component);
+            } else if (isRetain(component)) {
+                parts.push(text.slice(cursor, cursor + component));
+                cursor += component;
+            } else {
+                cursor -= component;
+            }
+        }
+
+        return parts.join('');
+    }
+
+    // Where a position in the text ends up once the operation is applied.
+    transformIndex(index) {
+        let cursor = 0;
+        let result = index;
+
+        for (const component of this.components) {
+            if (cursor > index) {
+                break;
+            }
+
+            if (isInsert(component)) {
+                result += component.length;
+            } else if (isRetain(component)) {
+                cursor += component;
+            } else {
+                result -= Math.min(-component, index - cursor);
+                cursor -= component;
+            }
+        }
+
+        return result;
+    }
+
+    // The single replacement turning `before` into `after`, without splitting
+    // surrogate pairs.
+    static diff(before, after) {
+        const maxLength = Math.min(before.length, after.length);
+        let prefix = 0;
+
+        while (prefix < maxLength && before[prefix] === after[prefix]) {
+            prefix++;
+        }
+
+        const splitsPair = (text, index) =>
+            isHighSurrogate(text.charCodeAt(index - 1)) &&
+            isLowSurrogate(text.charCodeAt(index));
+
+        if (splitsPair(before, prefix) || splitsPair(after, prefix)) {
+            prefix--;
+        }
+
+        let suffix = 0;
+
+        while (
+            suffix < maxLength - prefix &&
+            before[before.length - 1 - suffix] === after[after.length - 1 - suffix]
+        ) {
+            suffix++;
+        }
+
+        if (
+            splitsPair(before, before.length - suffix) ||
+            splitsPair(after, after.length - suffix)
+        ) {
+            suffix--;
+        }
+
+        return new TextOperation()
+            .retain(prefix)
+            .delete(before.length - prefix - suffix)
+            .insert(after.slice(prefix, after.length - suffix))
+            .retain(suffix);
+    }
+
+    // The operation applying `this` and then `other`.
+    compose(other) {
+        if (this.targetLength !== other.baseLength) {
+            throw new Error('The operations cannot be composed.');
+        }
+
+        const result = new TextOperation();
+        const componentsA = this.components[Symbol.iterator]();
+        const componentsB = other.components[Symbol.iterator]();
+        let componentA = componentsA.next().value;
+        let componentB = componentsB.next().value;
+
+        while (componentA !== undefined || componentB !== undefined) {
+            if (isDelete(componentA)) {
+                result.delete(-componentA);
+                componentA = componentsA.next().value;
+                continue;
+            }
+
+            if (isInsert(componentB)) {
+                result.insert(componentB);
+                componentB = componentsB.next().value;
+                continue;
+            }
+
+            if (componentA === undefined || componentB === undefined) {
+                throw new Error('The operations cannot be composed.');
+            }
+
+            const lengthA = isInsert(componentA)
+                ? componentA.length
+                : componentA;
+            const length = Math.min(lengthA, Math.abs(componentB));
+
+            if (isRetain(componentB)) {
+                if (isInsert(componentA)) {
+                    result.insert(componentA.slice(0, length));
+                } else {
+                    result.retain(length);
+                }
+            } else if (isRetain(componentA)) {
+                result.delete(length);
+            }
+
+            componentA = isInsert(componentA)
+                ? componentA.slice(length) || componentsA.next().value
+                : shorten(componentA, length) || componentsA.next().value;
+            componentB =
+                shorten(componentB, length) || componentsB.next().value;
+        }
+
+        return result;
+    }
+
+    // Returns [a', b'] so that applying a then b' equals applying b then a'.
+    // Text inserted by `a` goes first at equal positions.
+    static transform(a, b) {
+        if (a.baseLength !== b.baseLength) {
+            throw new Error('Concurrent operations must share a base.');
+        }
+
+        const aPrime = new TextOperation();
+        const bPrime = new TextOperation();
+        const componentsA = a.components[Symbol.iterator]();
+        const componentsB = b.components[Symbol.iterator]();
+        let componentA = componentsA.next().value;
+        let componentB = componentsB.next().value;
+
+        while (componentA !== undefined || componentB !== undefined) {
+            if (isInsert(componentA)) {
+                aPrime.insert(componentA);
+                bPrime.retain(componentA.length);
+                componentA = componentsA.next().value;
+                continue;
+            }
+
+            if (isInsert(componentB)) {
+                aPrime.retain(componentB.length);
+                bPrime.insert(componentB);
+                componentB = componentsB.next().value;
+                continue;
+            }
+
+            if (componentA === undefined || componentB === undefined) {
+                throw new Error('Concurrent operations must share a base.');
+            }
+
+            const length = Math.min(Math.abs(componentA), Math.abs(componentB));
+
+            if (isRetain(componentA) && isRetain(componentB)) {
+                aPrime.retain(length);
+                bPrime.retain(length);
+            } else if (isDelete(componentA) && isRetain(componentB)) {
+                aPrime.delete(length);
+            } else if (isRetain(componentA) && isDelete(componentB)) {
+                bPrime.delete(length);
+            }
+
+            componentA =
+                shorten(componentA, length) || componentsA.next().value;
+            componentB =
+                shorten(componentB, length) || componentsB.next().value;
+        }
+
+        return [aPrime, bPrime];
+    }
+}
+
+const shorten = (component, length) =>
+    component > 0 ? component - length : component + length;
+
+export { TextOperation };
@@ -1,7 +1,14 @@
 from django.contrib import admin
 
 # Register your models here.
-from texteditor.models import Folder, Note, Room
+from texteditor.models import (
+    Folder,
+    Note,
+    PendingNoteText,
+    Room,
+    StorageDeletion,
+    TextBlob,
+)
 
 
 class RoomAdmin(admin.ModelAdmin):
@@ -22,6 +29,24 @@ class FolderAdmin(admin.ModelAdmin):
     search_fields = ("user",)
 
 
+class StorageDeletionAdmin(admin.ModelAdmin):
+    list_display = ("name", "date", "attempts", "next_attempt")
+    search_fields = ("name",)
+
+
+class PendingNoteTextAdmin(admin.ModelAdmin):
+    list_display = ("note", "date", "attempts", "next_attempt")
+    search_fields = ("note__name",)
+
+
+class TextBlobAdmin(admin.ModelAdmin):
+    list_display = ("digest", "size", "stored_size", "references", "date")
+    search_fields = ("digest",)
+
+
 admin.site.register(Room, RoomAdmin)
 admin.site.register(Note, NoteAdmin)
 admin.site.register(Folder, FolderAdmin)
+admin.site.register(StorageDeletion, StorageDeletionAdmin)
+admin.site.register(PendingNoteText, PendingNoteTextAdmin)
+admin.site.register(TextBlob, TextBlobAdmin)
@@ -4,19 +4,30 @@ import dataclasses
 import datetime
 import typing
 
+from django.conf import settings
 from django.db import transaction
-from django.core.files.base import ContentFile
 from django.contrib.auth.models import User
-from django.http import HttpRequest
+from django.contrib.sessions.backends.base import SessionBase
+from django.http import HttpRequest, HttpResponse
 
 from account.models import Accounts
+from utilities.note_names import NOTE_NAME_REGEX, NoteNameAllocator, get_note_number
+from utilities.note_text_uploads import (
+    confirm_note_text_uploads,
+    release_note_text_uploads,
+    upload_note_texts,
+)
+from utilities.resource_index import INDEX_GAP
 from texteditor.models import (
+    AnonymousNoteText,
+    Canvas as CanvasModel,
+    InlineNoteText as InlineNoteTextModel,
     Note as NoteModel,
     Folder as FolderModel,
     Room as RoomModel,
 )
 
-from .models import get_token, generate_file_name
+from .models import get_token
 
 
 @dataclasses.dataclass
@@ -62,8 +73,6 @@ class Folder:
     folder: typing.Optional[Folder] = None
     folder_id: typing.Optional[int] = None
     date: datetime.datetime = dataclasses.field(default_factory=datetime.datetime.now)
-    folders: typing.List[Folder] = dataclasses.field(default_factory=list)
-    notes: typing.List[Note] = dataclasses.field(default_factory=list)
 
     def serialize(self) -> typing.Dict[str, typing.Any]:
         return {
@@ -105,6 +114,22 @@ class Folder:
 
         return folders
 
+    @property
+    def folders(self) -> typing.List[Folder]:
+        return [
+            resource
+            for resource in self._user.get_resources_in_folder(self)
+            if isinstance(resource, Folder)
+        ]
+
+    @property
+    def notes(self) -> typing.List[Note]:
+        return [
+            resource
+            for resource in self._user.get_resources_in_folder(self)
+            if isinstance(resource, Note)
+        ]
+
     @property
     def note_count(self) -> int:
         return len(self.notes)
@@ -115,7 +140,7 @@ class Folder:
 
     @property
     def resource_count(self) -> int:
-        return self.note_count + self.folder_count
+        return self._user.get_resource_count_in_folder(self)
 
 
 @dataclasses.dataclass
@@ -125,12 +150,29 @@ class Note:
     name: str
     token: str
     index: int
-    text: str
     room: typing.Optional[Room] = None
     room_id: typing.Optional[int] = None
     folder: typing.Optional[Folder] = None
     folder_id: typing.Optional[int] = None
     date: datetime.datetime = dataclasses.field(default_factory=datetime.datetime.now)
+    # Loaded from the database on first access, see `AnonymousNoteText`.
+    _text: typing.Optional[str] = dataclasses.field(default=None, repr=False)
+
+    @property
+    def room_name(self) -> typing.Optional[str]:
+        return self.room.name if self.room else None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._user.load_texts([self])
+
+        return self._text
+
+    @text.setter
+    def text(self, text: str) -> None:
+        self._text = text
+        self._user.mark_text_changed(self)
 
     def get_text(self) -> str:
         return self.text
@@ -149,7 +191,6 @@ class Note:
             "folder_id": self.folder_id,
             "date": self.date.isoformat(),
             "index": self.index,
-            "text": self.text,
         }
 
     @classmethod
@@ -158,11 +199,19 @@ class Note:
         data: typing.Dict[str, typing.Any],
         user: AnonymousUser,
     ) -> Note:
-        return cls(
+        data = dict(data)
+        # Sessions written before texts were moved out of them.
+        text = data.pop("text", None)
+        note = cls(
             user,
             **{**data, "date": datetime.datetime.fromisoformat(data["date"])},
         )
 
+        if text is not None:
+            note.text = text
+
+        return note
+
     def get_folder_history(self) -> typing.List[Folder]:
         folders = []
 
@@ -175,14 +224,30 @@ class Note:
 
 
 class AnonymousUser:
-    def __init__(self, user: User):
+    def __init__(self, user: User, session_key: typing.Optional[str] = None):
         self.user = user
-        self.folders: typing.List[Folder] = []
+        self.session_key = session_key
+        self._changed_note_ids: typing.Set[int] = set()
+        self._deleted_note_ids: typing.Set[int] = set()
+        # Set by `save`, texts are only written once the session is.
+        self._session: typing.Optional[SessionBase] = None
+        # Resources by id, in creation order.
         self._folder_map: typing.Dict[int, Folder] = {}
-        self.notes: typing.List[Note] = []
         self._note_map: typing.Dict[int, Note] = {}
-        self.rooms: typing.List[Room] = []
         self._room_map: typing.Dict[int, Room] = {}
+        # The resources of each folder (None for the root) in display order,
+        # so that `resource.index` is always its position in the list.
+        self._children: typing.Dict[
+            typing.Optional[int], typing.List[typing.Union[Folder, Note]]
+        ] = {}
+        # Secondary indexes, kept in step by the add, delete and rename
+        # methods. Names are not unique, so they map to every note using them.
+        self._folder_token_map: typing.Dict[str, Folder] = {}
+        self._note_token_map: typing.Dict[str, Note] = {}
+        self._note_name_map: typing.Dict[str, typing.List[Note]] = {}
+        self._note_room_map: typing.Dict[int, Note] = {}
+        self._room_name_map: typing.Dict[str, Room] = {}
+        self._note_names = NoteNameAllocator()
         self._next_folder_id = 0
         self._next_note_id = 0
         self._next_room_id = 0
@@ -193,28 +258,27 @@ class AnonymousUser:
         raw_notes = request.session.get("_anonymous_notes", [])
         raw_rooms = request.session.get("_anonymous_rooms", [])
 
-        user = AnonymousUser(request.user)
+        user = AnonymousUser(request.user, request.session.session_key)
+        # See `save_request_texts`.
+        request._anonymous_users = [*getattr(request, "_anonymous_users", ()), user]
 
         for raw_folder in raw_folders:
             folder = Folder.deserialize(raw_folder, user)
-            user.folders.append(folder)
-            user._folder_map[raw_folder["id"]] = folder
+            user._index_folder(folder)
 
             if folder.id >= user._next_folder_id:
                 user._next_folder_id = folder.id + 1
 
         for raw_note in raw_notes:
             note = Note.deserialize(raw_note, user)
-            user.notes.append(note)
-            user._note_map[raw_note["id"]] = note
+            user._index_note(note)
 
             if note.id >= user._next_note_id:
                 user._next_note_id = note.id + 1
 
         for raw_room in raw_rooms:
             room = Room.deserialize(raw_room, user)
-            user.rooms.append(room)
-            user._room_map[raw_room["id"]] = room
+            user._index_room(room)
 
             if room.id >= user._next_room_id:
                 user._next_room_id = room.id + 1
@@ -223,17 +287,88 @@ class AnonymousUser:
             if resource.folder_id is not None:
                 resource.folder = user._folder_map[resource.folder_id]
 
-                if isinstance(resource, Folder):
-                    resource.folder.folders.append(resource)
-                else:
-                    resource.folder.notes.append(resource)
-
             if resource.room_id is not None:
                 resource.room = user._room_map[resource.room_id]
 
+            user._children.setdefault(resource.folder_id, []).append(resource)
+
+        # Sessions written before deletes renumbered their siblings can have
+        # gaps in their indexes, so they are made contiguous again.
+        for children in user._children.values():
+            children.sort(key=lambda resource: resource.index)
+            user._renumber(children)
+
         return user
 
-    def save(self, session: typing.Dict[str, typing.Any]) -> None:
+    @property
+    def folders(self) -> typing.List[Folder]:
+        return list(self._folder_map.values())
+
+    @property
+    def notes(self) -> typing.List[Note]:
+        return list(self._note_map.values())
+
+    @property
+    def rooms(self) -> typing.List[Room]:
+        return list(self._room_map.values())
+
+    def _index_folder(self, folder: Folder) -> None:
+        self._folder_map[folder.id] = folder
+        self._folder_token_map[folder.token] = folder
+
+    def _index_note(self, note: Note) -> None:
+        self._note_map[note.id] = note
+        self._note_token_map[note.token] = note
+        self._note_name_map.setdefault(note.name, []).append(note)
+        self._note_names.take(note.name)
+
+        if note.room_id is not None:
+            self._note_room_map[note.room_id] = note
+
+    def _index_room(self, room: Room) -> None:
+        self._room_map[room.id] = room
+        self._room_name_map[room.name] = room
+
+    def _unindex_note_name(self, note: Note) -> None:
+        notes = self._note_name_map[note.name]
+        notes.remove(note)
+
+        if not notes:
+            del self._note_name_map[note.name]
+
+        self._note_names.release(note.name)
+
+    @staticmethod
+    def _renumber(
+        children: typing.List[typing.Union[Folder, Note]],
+        start: int = 0,
+        stop: typing.Optional[int] = None,
+    ) -> None:
+        for index in range(start, len(children) if stop is None else stop):
+            children[index].index = index
+
+    def _insert_child(
+        self, resource: typing.Union[Folder, Note], index: typing.Optional[int]
+    ) -> None:
+        children = self._children.setdefault(resource.folder_id, [])
+        index = len(children) if index is None else min(max(index, 0), len(children))
+        children.insert(index, resource)
+        self._renumber(children, index)
+
+    def _remove_child(self, resource: typing.Union[Folder, Note]) -> None:
+        children = self._children[resource.folder_id]
+        del children[resource.index]
+        self._renumber(children, resource.index)
+
+        if not children:
+            del self._children[resource.folder_id]
+
+    def save(self, session: SessionBase) -> None:
+        """
+        Store the workspace in `session`. Changed texts are written by
+        `save_texts` once the session itself has been saved, which
+        `save_request_texts` does for users loaded with `from_request`.
+        """
         session.update(
             {
                 "_anonymous_folders": [folder.serialize() for folder in self.folders],
@@ -241,26 +376,93 @@ class AnonymousUser:
                 "_anonymous_rooms": [room.serialize() for room in self.rooms],
             }
         )
+        self._session = session
+
+    def save_texts(self) -> None:
+        """
+        Write the texts changed and remove those deleted since the last call,
+        once `save` has been called and its session saved.
+        """
+        if self._session is None or self._session.session_key is None:
+            return
+
+        if not self._changed_note_ids and not self._deleted_note_ids:
+            return
+
+        self.session_key = self._session.session_key
+        texts = AnonymousNoteText.objects.filter(session_key=self.session_key)
+
+        with transaction.atomic():
+            texts.filter(note_id__in=self._deleted_note_ids).delete()
+            AnonymousNoteText.objects.bulk_create(
+                [
+                    AnonymousNoteText(
+                        session_key=self.session_key,
+                        note_id=note_id,
+                        text=self._note_map[note_id]._text,
+                    )
+                    for note_id in sorted(self._changed_note_ids)
+                ],
+                update_conflicts=True,
+                unique_fields=["session_key", "note_id"],
+                update_fields=["text", "date"],
+            )
+
+        self._changed_note_ids.clear()
+        self._deleted_note_ids.clear()
+
+    @staticmethod
+    def save_request_texts(request: HttpRequest, response: HttpResponse) -> None:
+        """
+        Write the texts of the users loaded from `request`, after
+        SessionMiddleware has processed `response`. The session of a failed
+        request is not saved, and neither are the texts; if saving the session
+        raised, this is not reached at all.
+        """
+        if response.status_code == 500:
+            return
+
+        for user in getattr(request, "_anonymous_users", ()):
+            user.save_texts()
+
+    def load_texts(self, notes: typing.Optional[typing.Iterable[Note]] = None) -> None:
+        """
+        Load the text of the given notes (all of them by default) with one
+        query, skipping those already loaded.
+        """
+        notes = self.notes if notes is None else notes
+        notes = [note for note in notes if note._text is None]
+
+        if not notes:
+            return
+
+        texts = {}
+
+        if self.session_key is not None:
+            texts = dict(
+                AnonymousNoteText.objects.filter(
+                    session_key=self.session_key,
+                    note_id__in=[note.id for note in notes],
+                ).values_list("note_id", "text")
+            )
+
+        for note in notes:
+            note._text = texts.get(note.id, "")
+
+    def mark_text_changed(self, note: Note) -> None:
+        self._changed_note_ids.add(note.id)
 
     def get_folder_by_id(self, folder_id: int) -> typing.Optional[Folder]:
         return self._folder_map.get(folder_id, None)
 
     def get_folder_by_token(self, token: str) -> typing.Optional[Folder]:
-        for folder in self.folders:
-            if folder.token == token:
-                return folder
-
-        return None
+        return self._folder_token_map.get(token, None)
 
     def get_note_by_id(self, note_id: int) -> typing.Optional[Note]:
         return self._note_map.get(note_id, None)
 
     def get_note_by_token(self, token: str) -> typing.Optional[Note]:
-        for note in self.notes:
-            if note.token == token:
-                return note
-
-        return None
+        return self._note_token_map.get(token, None)
 
     def get_note_by_id_and_token(
         self, note_id: int, token: str
@@ -273,42 +475,39 @@ class AnonymousUser:
             return None
 
     def get_note_by_name(self, name: str) -> typing.Optional[Note]:
-        for note in self.notes:
-            if note.name == name:
-                return note
+        notes = self._note_name_map.get(name)
 
-        return None
+        return notes[0] if notes else None
 
     def get_note_by_room(self, room: Room) -> typing.Optional[Note]:
-        for note in self.notes:
-            if note.room == room:
-                return note
-
-        return None
+        return self._note_room_map.get(room.id, None)
 
     def get_note_by_name_and_room_name(
         self, note_name: str, room_name: str
     ) -> typing.Optional[Note]:
-        for note in self.notes:
-            if note.name == note_name and note.room.name == room_name:
-                return note
+        room = self._room_name_map.get(room_name)
+        note = self.get_note_by_room(room) if room else None
 
-        return None
+        if note and note.name == note_name:
+            return note
+        else:
+            return None
 
     def get_note_by_token_and_room_name(
         self, note_token: str, room_name: str
     ) -> typing.Optional[Note]:
-        for note in self.notes:
-            if note.token == note_token and note.room.name == room_name:
-                return note
+        note = self.get_note_by_token(note_token)
 
-        return None
+        if note and note.room and note.room.name == room_name:
+            return note
+        else:
+            return None
 
     def get_room_by_id(self, room_id: int) -> typing.Optional[Room]:
         return self._room_map.get(room_id, None)
 
     def get_room_by_token(self, token: str) -> typing.Optional[Room]:
-        for room in self.rooms:
+        for room in self._room_map.values():
             if room.token == token:
                 return room
 
@@ -320,9 +519,6 @@ class AnonymousUser:
         index: typing.Optional[int] = None,
         folder: typing.Optional[Folder] = None,
     ) -> Folder:
-        if index is None:
-            index = self.get_resource_count_in_folder(folder)
-
         folder = Folder(
             self,
             id=self._next_folder_id,
@@ -331,15 +527,12 @@ class AnonymousUser:
             folder=folder,
             folder_id=folder.id if folder else None,
             date=datetime.datetime.now(),
-            index=index,
+            index=0,
         )
 
-        self.folders.append(folder)
-        self._folder_map[folder.id] = folder
+        self._index_folder(folder)
         self._next_folder_id += 1
-
-        if folder.folder:
-            folder.folder.folders.append(folder)
+        self._insert_child(folder, index)
 
         return folder
 
@@ -351,15 +544,7 @@ class AnonymousUser:
         name: typing.Optional[str] = None,
     ) -> Note:
         if name is None:
-            i = 1
-            name = f"Note{i}"
-
-            while self.get_note_by_name(name):
-                i += 1
-                name = f"Note{i}"
-
-        if index is None:
-            index = self.get_resource_count_in_folder(folder)
+            name = self._note_names.get_free_name()
 
         room = Room(
             self,
@@ -367,8 +552,7 @@ class AnonymousUser:
             name=get_token(),
         )
 
-        self.rooms.append(room)
-        self._room_map[room.id] = room
+        self._index_room(room)
         self._next_room_id += 1
 
         note = Note(
@@ -379,47 +563,100 @@ class AnonymousUser:
             folder=folder,
             folder_id=folder.id if folder else None,
             date=datetime.datetime.now(),
-            index=index,
-            text=text,
+            index=0,
             room=room,
             room_id=room.id,
         )
-
-        self.notes.append(note)
-        self._note_map[note.id] = note
+        self._index_note(note)
         self._next_note_id += 1
-
-        if note.folder:
-            note.folder.notes.append(note)
+        self._insert_child(note, index)
+        note.text = text
 
         return note
 
     def delete_folder(self, folder: Folder) -> None:
-        for nested_folder in folder.folders:
-            self.delete_folder(nested_folder)
+        self._remove_child(folder)
 
-        for note in folder.notes:
-            self.delete_note(note)
+        # The folder's subtree goes away as a whole, so its contents are
+        # dropped without renumbering them one by one.
+        folders = [folder]
 
-        if folder.folder:
-            folder.folder.folders.remove(folder)
+        while folders:
+            folder = folders.pop()
+            del self._folder_map[folder.id]
+            del self._folder_token_map[folder.token]
 
-        self.folders.remove(folder)
-        del self._folder_map[folder.id]
+            for resource in self._children.pop(folder.id, []):
+                if isinstance(resource, Folder):
+                    folders.append(resource)
+                else:
+                    self._delete_note(resource)
 
     def delete_note(self, note: Note) -> None:
+        self._remove_child(note)
+        self._delete_note(note)
+
+    def _delete_note(self, note: Note) -> None:
         if note.room:
             self.delete_room(note.room)
 
-        if note.folder:
-            note.folder.notes.remove(note)
-
-        self.notes.remove(note)
         del self._note_map[note.id]
+        del self._note_token_map[note.token]
+        self._unindex_note_name(note)
+        self._changed_note_ids.discard(note.id)
+        self._deleted_note_ids.add(note.id)
 
     def delete_room(self, room: Room) -> None:
-        self.rooms.remove(room)
         del self._room_map[room.id]
+        self._room_name_map.pop(room.name, None)
+        self._note_room_map.pop(room.id, None)
+
+    def rename_resource(self, resource: typing.Union[Folder, Note], name: str) -> bool:
+        """
+        Rename `resource`, unless it is a note and `name` is a default name
+        ("NoteN") another note already has. Returns whether it was renamed.
+        """
+        if isinstance(resource, Note):
+            if get_note_number(name) is not None and any(
+                note is not resource for note in self._note_name_map.get(name, [])
+            ):
+                return False
+
+            self._unindex_note_name(resource)
+            resource.name = name
+            self._note_name_map.setdefault(name, []).append(resource)
+            self._note_names.take(name)
+        else:
+            resource.name = name
+
+        return True
+
+    def move_resource(
+        self,
+        resource: typing.Union[Folder, Note],
+        destination_folder: typing.Optional[Folder],
+    ) -> None:
+        """
+        Move `resource` to the end of `destination_folder`, closing the gap
+        it leaves in its current folder.
+        """
+        self._remove_child(resource)
+        resource.folder = destination_folder
+        resource.folder_id = destination_folder.id if destination_folder else None
+        self._insert_child(resource, None)
+
+    def change_resource_index(
+        self, resource: typing.Union[Folder, Note], index: int
+    ) -> None:
+        """
+        Move `resource` to position `index` within its folder, shifting the
+        resources in between by one.
+        """
+        children = self._children[resource.folder_id]
+        start, end = sorted((resource.index, index))
+        del children[resource.index]
+        children.insert(index, resource)
+        self._renumber(children, start, end + 1)
 
     def get_resources_in_folder(
         self,
@@ -427,14 +664,7 @@ class AnonymousUser:
         order_by: typing.Optional[str] = None,
         reverse: bool = False,
     ) -> typing.List[typing.Union[Folder, Note]]:
-        resources = []
-
-        if folder:
-            resources = folder.folders + folder.notes
-        else:
-            for resource in self.folders + self.notes:
-                if not resource.folder:
-                    resources.append(resource)
+        resources = list(self._children.get(folder.id if folder else None, []))
 
         if order_by:
             resources.sort(
@@ -444,40 +674,28 @@ class AnonymousUser:
         return resources
 
     def get_resource_count_in_folder(self, folder: typing.Optional[Folder]) -> int:
-        return len(self.get_resources_in_folder(folder))
+        return len(self._children.get(folder.id if folder else None, []))
 
     def get_resources_with_index_gt_in_folder(
         self, folder: typing.Optional[Folder], index: int
     ) -> typing.List[typing.Union[Folder, Note]]:
-        resources = []
+        children = self._children.get(folder.id if folder else None, [])
 
-        for resource in self.get_resources_in_folder(folder):
-            if resource.index > index:
-                resources.append(resource)
-
-        return resources
+        return children[max(index + 1, 0) :]
 
     def get_resources_with_index_lt_in_folder(
         self, folder: typing.Optional[Folder], index: int
     ) -> typing.List[typing.Union[Folder, Note]]:
-        resources = []
+        children = self._children.get(folder.id if folder else None, [])
 
-        for resource in self.get_resources_in_folder(folder):
-            if resource.index < index:
-                resources.append(resource)
-
-        return resources
+        return children[: max(index, 0)]
 
     def get_resources_with_index_in_range_in_folder(
         self, folder: typing.Optional[Folder], start: int, end: int
     ) -> typing.List[typing.Union[Folder, Note]]:
-        resources = []
+        children = self._children.get(folder.id if folder else None, [])
 
-        for resource in self.get_resources_in_folder(folder):
-            if start <= resource.index <= end:
-                resources.append(resource)
-
-        return resources
+        return children[max(start, 0) : max(end + 1, 0)]
 
     def get_resource_by_id_and_token(
         self, id: int, token: str
@@ -492,53 +710,137 @@ class AnonymousUser:
         else:
             return None
 
-    def save_to_database(self, user: Accounts):
-        with transaction.atomic():
-            folder_map = {}
+    def save_to_database(self, user: Accounts) -> None:
+        """
+        Copy the workspace into the account of `user`, with one bulk insert
+        per model.
+
+        Text too large to be kept inline is uploaded first, on a bounded
+        thread pool, and the uploads are released again if the transaction
+        fails.
+        """
+        self.load_texts()
+
+        notes = [note for note in self.notes if note.room is not None]
+        names = self._get_database_note_names(user, notes)
+        contents = {note.id: note.text.encode("utf-8") for note in notes}
+        file_names = upload_note_texts(
+            user,
+            {
+                note_id: content
+                for note_id, content in contents.items()
+                if len(content) > settings.NOTE_TEXT_INLINE_MAX_SIZE
+            },
+        )
 
-            for folder in self.folders:
-                folder_model = FolderModel(
-                    user=user,
-                    name=folder.name,
-                    token=folder.token,
-                    date=folder.date,
-                    index=folder.index,
-                )
-                folder_model.save()
-                folder_map[folder.id] = folder_model
-
-            for folder in self.folders:
-                if folder.folder and folder.folder.id in folder_map:
-                    folder_model = folder_map[folder.id]
-                    folder_model.folder = folder_map[folder.folder.id]
-                    folder_model.save()
-
-            room_map = {}
-            for room in self.rooms:
-                room_model = RoomModel(
-                    user=user,
-                    name=room.name,
-                )
-                room_model.save()
-                room_map[room.id] = room_model
-
-            for note in self.notes:
-                if note.room.id in room_map:
-                    note_model = NoteModel(
-                        user=user,
-                        name=note.name,
-                        date=note.date,
-                        index=note.index,
-                        token=note.token,
-                        room=room_map[note.room.id],
-                    )
+        try:
+            with transaction.atomic():
+                self._create_models(user, notes, names, contents, file_names)
+                confirm_note_text_uploads(file_names.values())
+
+                if self.session_key is not None:
+                    AnonymousNoteText.objects.filter(
+                        session_key=self.session_key
+                    ).delete()
+        except Exception:
+            release_note_text_uploads(file_names.values())
+            raise
+
+        self._changed_note_ids.clear()
+        self._deleted_note_ids.clear()
+
+    @staticmethod
+    def _get_database_note_names(
+        user: Accounts, notes: typing.List[Note]
+    ) -> typing.Dict[int, str]:
+        """
+        Return the name each note gets in the account of `user`: its own,
+        unless it is a default name ("NoteN") already used there or by an
+        earlier note, in which case it gets the smallest free one.
+        """
+        allocator = NoteNameAllocator(
+            NoteModel.objects.filter(
+                user=user, name__regex=NOTE_NAME_REGEX
+            ).values_list("name", flat=True)
+        )
+        names = {}
 
-                    if note.folder and note.folder.id in folder_map:
-                        note_model.folder = folder_map[note.folder.id]
+        for note in notes:
+            name = note.name
 
-                    note_model.save()
+            if get_note_number(name) is not None:
+                if allocator.is_taken(name):
+                    name = allocator.get_free_name()
 
-                    note_model.text_file = ContentFile(
-                        note.get_text().encode(), generate_file_name(note_model)
-                    )
-                    note_model.save()
+                allocator.take(name)
+
+            names[note.id] = name
+
+        return names
+
+    def _create_models(
+        self,
+        user: Accounts,
+        notes: typing.List[Note],
+        names: typing.Dict[int, str],
+        contents: typing.Dict[int, bytes],
+        file_names: typing.Dict[int, str],
+    ) -> None:
+        folder_models = {
+            folder.id: FolderModel(
+                user=user,
+                name=folder.name,
+                token=folder.token,
+                date=folder.date,
+                index=(folder.index + 1) * INDEX_GAP,
+            )
+            for folder in self.folders
+        }
+        FolderModel.objects.bulk_create(folder_models.values())
+
+        # Parents only have a primary key once inserted, so nested folders
+        # are linked afterwards with a single update.
+        nested_folders = []
+
+        for folder in self.folders:
+            if folder.folder_id is not None:
+                folder_models[folder.id].folder = folder_models[folder.folder_id]
+                nested_folders.append(folder_models[folder.id])
+
+        FolderModel.objects.bulk_update(nested_folders, ["folder"])
+
+        room_models = RoomModel.objects.bulk_create(
+            [RoomModel(user=user, name=note.room.name) for note in notes]
+        )
+        canvas_models = CanvasModel.objects.bulk_create([CanvasModel() for _ in notes])
+        note_models = NoteModel.objects.bulk_create(
+            [
+                NoteModel(
+                    user=user,
+                    name=names[note.id],
+                    date=note.date,
+                    index=(note.index + 1) * INDEX_GAP,
+                    token=note.token,
+                    room=room_model,
+                    canvas_file=canvas_model,
+                    folder=(
+                        folder_models[note.folder_id]
+                        if note.folder_id is not None
+                        else None
+                    ),
+                    text_file=file_names.get(note.id),
+                )
+                for note, room_model, canvas_model in zip(
+                    notes, room_models, canvas_models
+                )
+            ]
+        )
+        InlineNoteTextModel.objects.bulk_create(
+            [
+                InlineNoteTextModel(
+                    note=note_model, text=contents[note.id].decode("utf-8")
+                )
+                for note, note_model in zip(notes, note_models)
+                if contents[note.id] and note.id not in file_names
+            ]
+        )
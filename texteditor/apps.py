@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class TexteditorConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "texteditor"
+
+    def ready(self):
+        from texteditor.templatetags.icons import icon_registry
+
+        icon_registry.load()
@@ -0,0 +1,293 @@
+"""
+Async variants of the views that talk to object storage, for ASGI
+deployments. They behave like the views of the same name in `views`, but
+read and write storage with the async object storage, so a slow storage
+call does not hold a thread. Enabled with the ASYNC_STORAGE_VIEWS setting.
+"""
+
+import typing
+from http import HTTPStatus
+
+from asgiref.sync import sync_to_async
+from botocore.exceptions import ClientError
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.views import View
+
+from utilities.async_storage import (
+    aiter_object_body,
+    get_async_object_storage,
+    get_write_parameters,
+)
+from utilities.note_text_buffer import buffer_note_text
+from utilities.responses import (
+    ApiErrorKwargsResponse,
+    ApiErrorMessageAndCodeResponse,
+    ApiSuccessKwargsResponse,
+    ApiSuccessResponse,
+)
+
+from .anonymous import AnonymousUser
+from .forms import SaveCanvasForm, SaveRoomForm
+from .models import Note, generate_file_name
+from .views import ErrorCode
+from .views import GetNoteCanvas as SyncGetNoteCanvas
+
+
+@sync_to_async
+def get_anonymous_note_text(
+    request: HttpRequest, note_token: str
+) -> typing.Optional[str]:
+    note = AnonymousUser.from_request(request).get_note_by_token(note_token)
+
+    return None if note is None else note.get_text()
+
+
+@sync_to_async
+def save_anonymous_note_text(request: HttpRequest, note_token: str, text: str) -> bool:
+    user = AnonymousUser.from_request(request)
+    note = user.get_note_by_token(note_token)
+
+    if note is None or note.room is None:
+        return False
+
+    note.room.note.text = text
+    user.save(request.session)
+
+    return True
+
+
+class GetNoteText(View):
+    async def get(self, request: HttpRequest, note_token: str):
+        user = await request.auser()
+
+        if not user.is_authenticated:
+            text = await get_anonymous_note_text(request, note_token)
+
+            if text is not None:
+                return ApiSuccessKwargsResponse(text=text)
+
+        note = (
+            await Note.objects.select_related("room").filter(token=note_token).afirst()
+        )
+
+        if note is None:
+            return ApiErrorMessageAndCodeResponse(
+                "Note not found.",
+                ErrorCode.NOTE_NOT_FOUND,
+            )
+
+        if not user.pk == note.user_id and not note.room.is_public:
+            return ApiErrorMessageAndCodeResponse(
+                "You do not have permission to view this note.",
+                ErrorCode.NO_EDIT_PERMISSION,
+                HTTPStatus.FORBIDDEN,
+            )
+
+        return ApiSuccessKwargsResponse(text=await note.aget_text())
+
+
+class GetNoteCanvas(View):
+    chunk_size = SyncGetNoteCanvas.chunk_size
+    range_pattern = SyncGetNoteCanvas.range_pattern
+
+    async def get(self, request: HttpRequest, note_token: str):
+        note = (
+            await Note.objects.select_related("room", "canvas_file")
+            .filter(token=note_token)
+            .afirst()
+        )
+
+        if note is None:
+            return ApiErrorMessageAndCodeResponse(
+                "Note not found.",
+                ErrorCode.NOTE_NOT_FOUND,
+            )
+
+        user = await request.auser()
+
+        if not user.pk == note.user_id and not note.room.is_public:
+            return ApiErrorMessageAndCodeResponse(
+                "You do not have permission to view this canvas.",
+                ErrorCode.NO_EDIT_PERMISSION,
+                HTTPStatus.FORBIDDEN,
+            )
+
+        if not note.canvas_file.file:
+            return ApiErrorMessageAndCodeResponse(
+                "Canvas not found.",
+                ErrorCode.NOTE_NOT_FOUND,
+            )
+
+        parameters = {}
+
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            parameters["IfNoneMatch"] = if_none_match
+
+        byte_range = request.headers.get("Range")
+        if byte_range and self.range_pattern.match(byte_range):
+            parameters["Range"] = byte_range
+
+        try:
+            s3_object = await get_async_object_storage().get_object(
+                note.canvas_file.file.name, **parameters
+            )
+        except ClientError as error:
+            metadata = error.response.get("ResponseMetadata", {})
+            status = metadata.get("HTTPStatusCode")
+
+            if status == HTTPStatus.NOT_MODIFIED:
+                response = HttpResponseNotModified()
+                response["ETag"] = metadata.get("HTTPHeaders", {}).get(
+                    "etag", if_none_match
+                )
+                return response
+
+            if status == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+                return HttpResponse(status=HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+
+            raise
+
+        response = StreamingHttpResponse(
+            aiter_object_body(s3_object["Body"], self.chunk_size),
+            content_type="image/png",
+            status=(
+                HTTPStatus.PARTIAL_CONTENT
+                if "ContentRange" in s3_object
+                else HTTPStatus.OK
+            ),
+        )
+        response["Content-Length"] = s3_object["ContentLength"]
+        response["ETag"] = s3_object["ETag"]
+        response["Accept-Ranges"] = "bytes"
+        response["Cache-Control"] = "private, no-cache"
+
+        if "ContentRange" in s3_object:
+            response["Content-Range"] = s3_object["ContentRange"]
+
+        return response
+
+
+class SaveRoom(View):
+    async def post(self, request: HttpRequest, note_token: str):
+        form = SaveRoomForm(request.POST, request.FILES)
+
+        if not form.is_valid():
+            return ApiErrorKwargsResponse(
+                status=HTTPStatus.BAD_REQUEST,
+                errors=form.errors,
+                message="Invalid form.",
+                code=ErrorCode.INVALID_FORM,
+            )
+
+        user = await request.auser()
+
+        if not user.is_authenticated and form.cleaned_data.get("own"):
+            text = form.cleaned_data.get("text")
+
+            if text is None:
+                return ApiErrorMessageAndCodeResponse(
+                    "Text is required.",
+                    ErrorCode.INVALID_FORM,
+                )
+
+            if not await save_anonymous_note_text(request, note_token, text):
+                return ApiErrorMessageAndCodeResponse(
+                    "This room does not exist.",
+                    ErrorCode.ROOM_NOT_FOUND,
+                )
+
+            return ApiSuccessResponse("File saved successfully.")
+
+        file = form.cleaned_data.get("file")
+
+        if file is None:
+            return ApiErrorMessageAndCodeResponse(
+                "File is required.",
+                ErrorCode.INVALID_FORM,
+            )
+
+        note = (
+            await Note.objects.select_related("room")
+            .filter(token=note_token, room__isnull=False)
+            .afirst()
+        )
+
+        if note is None:
+            return ApiErrorMessageAndCodeResponse(
+                "This room does not exist.",
+                ErrorCode.SAVE_ROOM_NOT_FOUND,
+            )
+
+        if not note.room.user_id == user.pk and not note.room.is_editable:
+            return ApiErrorMessageAndCodeResponse(
+                "You do not have permission to change this file.",
+                ErrorCode.NO_EDIT_PERMISSION,
+                HTTPStatus.FORBIDDEN,
+            )
+
+        try:
+            text = file.read().decode("utf-8")
+        except UnicodeDecodeError:
+            return ApiErrorMessageAndCodeResponse(
+                "The file must be UTF-8 text.",
+                ErrorCode.INVALID_FORM,
+            )
+
+        await sync_to_async(buffer_note_text)(note.pk, text)
+
+        return ApiSuccessResponse("File saved successfully.")
+
+
+class SaveCanvas(View):
+    async def post(self, request: HttpRequest, note_token: str):
+        form = SaveCanvasForm(request.POST, request.FILES)
+
+        if not form.is_valid():
+            return ApiErrorKwargsResponse(
+                status=HTTPStatus.BAD_REQUEST,
+                errors=form.errors,
+                message="Invalid form.",
+                code=ErrorCode.INVALID_FORM,
+            )
+
+        file = form.cleaned_data.get("file")
+
+        note = (
+            await Note.objects.select_related("user", "room", "canvas_file")
+            .filter(token=note_token)
+            .afirst()
+        )
+
+        if note is None:
+            return ApiErrorMessageAndCodeResponse(
+                "Note not found.",
+                ErrorCode.NOTE_NOT_FOUND,
+            )
+
+        user = await request.auser()
+
+        if not user.pk == note.user_id and not note.room.is_editable:
+            return ApiErrorMessageAndCodeResponse(
+                "You do not have permission to save this canvas.",
+                ErrorCode.NO_EDIT_PERMISSION,
+                HTTPStatus.FORBIDDEN,
+            )
+
+        canvas = note.canvas_file
+
+        name = canvas.file.name if canvas.file else generate_file_name(note)
+        await get_async_object_storage().put_object(
+            name, file.read(), **get_write_parameters(name, file)
+        )
+
+        if not canvas.file:
+            canvas.file.name = name
+            await canvas.asave(update_fields=["file"])
+
+        return ApiSuccessResponse("Canvas saved successfully.")
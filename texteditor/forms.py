@@ -66,6 +66,32 @@ class TransferResourceForm(forms.Form):
     destination_folder_token = forms.CharField(required=False, empty_value=None)
 
 
+class ResourceSelectionForm(forms.Form):
+    resources = forms.JSONField()
+
+    def clean_resources(self):
+        resources = self.cleaned_data.get("resources")
+
+        if not isinstance(resources, list) or not resources:
+            raise forms.ValidationError("Select at least one resource.")
+
+        cleaned_resources = []
+
+        for resource in resources:
+            if (
+                not isinstance(resource, dict)
+                or not isinstance(resource.get("id"), int)
+                or not isinstance(resource.get("token"), str)
+            ):
+                raise forms.ValidationError(
+                    "Each resource needs an integer id and a token."
+                )
+
+            cleaned_resources.append((resource["id"], resource["token"]))
+
+        return cleaned_resources
+
+
 class MoveResourceForm(forms.Form):
     moved_resource_id = forms.IntegerField()
     moved_resource_token = forms.CharField()
@@ -76,6 +102,10 @@ class SaveCanvasForm(forms.Form):
     file = forms.FileField(allow_empty_file=True, required=True)
 
 
+class CompleteCanvasUploadForm(forms.Form):
+    upload = forms.CharField()
+
+
 class UpdateCanvasBackgroundForm(forms.Form):
     background = forms.CharField()
 
@@ -0,0 +1,45 @@
+import timeit
+import xml.etree.ElementTree as ET
+
+from django.core.management.base import BaseCommand
+
+from texteditor.templatetags.icons import ICON_DIR, IconRegistry
+
+
+def parse_icon(icon_name, class_str="", **kwargs):
+    path = ICON_DIR / f"{icon_name}.svg"
+    root = ET.parse(path).getroot()
+    root.set("class", class_str)
+
+    for key, value in kwargs.items():
+        root.set(key, value)
+
+    return ET.tostring(root, encoding="unicode", method="html")
+
+
+class Command(BaseCommand):
+    help = "Compare rendering icons from the registry with parsing them per call."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--icon", default="file-text")
+        parser.add_argument("--number", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        name, number = options["icon"], options["number"]
+
+        registry = IconRegistry(ICON_DIR)
+        load_time = timeit.timeit(registry.load, number=1)
+        self.stdout.write(f"Loaded the registry in {load_time * 1000:.1f} ms.")
+
+        if registry.get(name).render("icon") != parse_icon(name, "icon"):
+            self.stderr.write("Registry output differs from the parsed icon.")
+
+        for label, render in (
+            ("parse per call", lambda: parse_icon(name, "icon")),
+            ("registry", lambda: registry.get(name).render("icon")),
+        ):
+            seconds = timeit.timeit(render, number=number)
+            self.stdout.write(
+                f"{label}: {seconds / number * 1_000_000:.2f} µs per icon "
+                f"({number} renders)"
+            )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from utilities.anonymous_note_texts import BATCH_SIZE, clear_anonymous_note_texts
+
+
+class Command(BaseCommand):
+    help = "Delete the note texts of anonymous sessions that no longer exist."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        cleared = clear_anonymous_note_texts(batch_size=options["batch_size"])
+        self.stdout.write(f"Cleared {cleared} session(s).")
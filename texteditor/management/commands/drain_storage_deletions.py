@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from utilities.storage_deletions import (
+    BATCH_SIZE,
+    MAX_ATTEMPTS,
+    collect_text_blobs,
+    drain_storage_deletions,
+)
+
+
+class Command(BaseCommand):
+    help = "Remove files queued for deletion from storage in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep draining, sleeping between empty polls.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to sleep when the outbox is empty (with --loop).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            collected = collect_text_blobs(batch_size=options["batch_size"])
+
+            if collected:
+                self.stdout.write(f"Collected {collected} unused text blob(s).")
+
+            processed = drain_storage_deletions(
+                batch_size=options["batch_size"],
+                max_attempts=options["max_attempts"],
+            )
+
+            if processed:
+                self.stdout.write(f"Processed {processed} file(s).")
+                continue
+
+            if not options["loop"]:
+                break
+
+            time.sleep(options["interval"])
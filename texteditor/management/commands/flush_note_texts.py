@@ -0,0 +1,59 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from utilities.note_text_buffer import BATCH_SIZE, flush_note_texts
+
+
+class Command(BaseCommand):
+    help = "Upload buffered note text to storage in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Upload every buffered text, due or not.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep flushing, sleeping when a poll uploads nothing.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1,
+            help="Seconds to sleep when nothing was uploaded (with --loop).",
+        )
+
+    def handle(self, *args, **options):
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        while not stopping:
+            # Only count successful uploads: with --all, texts that failed are
+            # selected again right away, and retrying them must not spin.
+            uploaded = flush_note_texts(
+                batch_size=options["batch_size"], flush_all=options["all"]
+            )
+
+            if uploaded:
+                self.stdout.write(f"Uploaded {uploaded} note text(s).")
+                continue
+
+            if not options["loop"]:
+                return
+
+            time.sleep(options["interval"])
+
+        # Stopped by a signal: try to upload everything still buffered before
+        # exiting. Texts that fail stay in the database for the next run.
+        flush_note_texts(batch_size=None, flush_all=True)
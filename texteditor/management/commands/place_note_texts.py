@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from utilities.note_text_placement import BATCH_SIZE, place_note_texts
+
+
+class Command(BaseCommand):
+    help = (
+        "Move small note texts from storage into the database, and texts "
+        "above the size threshold back to storage."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--after",
+            type=int,
+            default=0,
+            help="Resume after this note id.",
+        )
+
+    def handle(self, *args, **options):
+        after = options["after"]
+
+        while True:
+            checked, moved, after = place_note_texts(
+                batch_size=options["batch_size"], after=after
+            )
+
+            if after is None:
+                break
+
+            self.stdout.write(
+                f"Checked {checked} note(s), moved {moved}, up to {after}."
+            )
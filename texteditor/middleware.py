@@ -0,0 +1,19 @@
+from django.http import HttpRequest, HttpResponse
+
+from .anonymous import AnonymousUser
+
+
+class AnonymousNoteTextMiddleware:
+    """
+    Write the note texts anonymous users changed during the request, once
+    their session has been saved. See `AnonymousUser.save_request_texts`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        response = self.get_response(request)
+        AnonymousUser.save_request_texts(request, response)
+
+        return response
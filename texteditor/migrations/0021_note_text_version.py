@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('texteditor', '0020_auto_20250101_1234'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='text_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
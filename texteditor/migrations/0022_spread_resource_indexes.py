@@ -0,0 +1,57 @@
+from django.db import migrations
+
+INDEX_GAP = 1024
+
+
+def respace_indexes(Folder, Note, get_index):
+    groups = {}
+
+    for model in (Folder, Note):
+        for resource in model.objects.only("id", "user_id", "folder_id", "index"):
+            groups.setdefault((resource.user_id, resource.folder_id), []).append(
+                resource
+            )
+
+    folders = []
+    notes = []
+
+    for resources in groups.values():
+        resources.sort(key=lambda resource: resource.index)
+
+        for position, resource in enumerate(resources):
+            resource.index = get_index(position)
+
+            if isinstance(resource, Folder):
+                folders.append(resource)
+            else:
+                notes.append(resource)
+
+    Folder.objects.bulk_update(folders, ["index"], batch_size=1000)
+    Note.objects.bulk_update(notes, ["index"], batch_size=1000)
+
+
+def spread_indexes(apps, schema_editor):
+    respace_indexes(
+        apps.get_model("texteditor", "Folder"),
+        apps.get_model("texteditor", "Note"),
+        lambda position: (position + 1) * INDEX_GAP,
+    )
+
+
+def compact_indexes(apps, schema_editor):
+    respace_indexes(
+        apps.get_model("texteditor", "Folder"),
+        apps.get_model("texteditor", "Note"),
+        lambda position: position,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("texteditor", "0021_note_text_version"),
+    ]
+
+    operations = [
+        migrations.RunPython(spread_indexes, reverse_code=compact_indexes),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 04:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("texteditor", "0023_storage_deletion"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="folder",
+            index=models.Index(
+                fields=["user", "folder", "index"],
+                name="texteditor__user_id_e721d0_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                fields=["user", "folder", "index"],
+                name="texteditor__user_id_be7438_idx",
+            ),
+        ),
+    ]
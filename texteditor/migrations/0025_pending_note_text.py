@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-18 04:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("texteditor", "0024_resource_listing_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PendingNoteText",
+            fields=[
+                (
+                    "note",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="pending_text",
+                        serialize=False,
+                        to="texteditor.note",
+                    ),
+                ),
+                ("text", models.TextField()),
+                ("revision", models.PositiveIntegerField(default=1)),
+                ("date", models.DateTimeField(auto_now=True)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                (
+                    "next_attempt",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                ("last_error", models.TextField(blank=True, default="")),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 04:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("texteditor", "0025_pending_note_text"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TextBlob",
+            fields=[
+                (
+                    "digest",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("size", models.PositiveIntegerField()),
+                ("stored_size", models.PositiveIntegerField()),
+                ("references", models.PositiveIntegerField(db_index=True, default=0)),
+                ("date", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-18 04:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("texteditor", "0026_text_blob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InlineNoteText",
+            fields=[
+                (
+                    "note",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="inline_text",
+                        serialize=False,
+                        to="texteditor.note",
+                    ),
+                ),
+                ("text", models.TextField()),
+            ],
+        ),
+    ]
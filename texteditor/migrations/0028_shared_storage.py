@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-18 04:58
+
+import texteditor.models
+import texteditor.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("texteditor", "0027_inline_note_text"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="canvas",
+            name="file",
+            field=models.FileField(
+                blank=True,
+                null=True,
+                storage=texteditor.storage.get_private_media_storage,
+                upload_to=texteditor.models.note_upload_to,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="note",
+            name="text_file",
+            field=models.FileField(
+                blank=True,
+                null=True,
+                storage=texteditor.storage.get_private_media_storage,
+                upload_to=texteditor.models.note_upload_to,
+            ),
+        ),
+    ]
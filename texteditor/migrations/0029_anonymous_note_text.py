@@ -0,0 +1,39 @@
+# Generated by Django 5.1.6 on 2026-10-18 05:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("texteditor", "0028_shared_storage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnonymousNoteText",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("session_key", models.CharField(max_length=40)),
+                ("note_id", models.PositiveIntegerField()),
+                ("text", models.TextField(blank=True, default="")),
+                ("date", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("session_key", "note_id"),
+                        name="unique_anonymous_note_text",
+                    )
+                ],
+            },
+        ),
+    ]
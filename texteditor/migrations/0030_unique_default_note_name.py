@@ -0,0 +1,63 @@
+# Generated by Django 5.1.6 on 2026-10-18 05:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+NOTE_NAME_REGEX = r"^Note([1-9][0-9]*)$"
+
+
+def rename_duplicate_note_names(apps, schema_editor):
+    """
+    Give every note but the oldest of each duplicated "NoteN" name the
+    smallest free "NoteN" name of its user, so the constraint can be added.
+    """
+    Note = apps.get_model("texteditor", "Note")
+
+    duplicates = (
+        Note.objects.filter(name__regex=NOTE_NAME_REGEX)
+        .values("user_id", "name")
+        .annotate(count=models.Count("id"))
+        .filter(count__gt=1)
+    )
+
+    for user_id in {duplicate["user_id"] for duplicate in duplicates}:
+        notes = Note.objects.filter(user_id=user_id, name__regex=NOTE_NAME_REGEX)
+        taken = set()
+        renamed = []
+
+        for note in notes.order_by("id"):
+            if note.name in taken:
+                renamed.append(note)
+            else:
+                taken.add(note.name)
+
+        number = 1
+
+        for note in renamed:
+            while f"Note{number}" in taken:
+                number += 1
+
+            note.name = f"Note{number}"
+            taken.add(note.name)
+
+        Note.objects.bulk_update(renamed, ["name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("texteditor", "0029_anonymous_note_text"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_note_names, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="note",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("name__regex", "^Note([1-9][0-9]*)$")),
+                fields=("user", "name"),
+                name="unique_default_note_name",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("texteditor", "0030_unique_default_note_name"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pendingnotetext",
+            name="claimed_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,12 +1,27 @@
 from __future__ import annotations
 
+import collections
 import secrets
+import typing
 
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
 
 from account.models import Accounts
-from texteditor.storage import PrivateMediaStorage
-from utilities.aws import download_file_from_aws
+from texteditor.storage import get_private_media_storage
+from utilities.async_storage import get_async_object_storage
+from utilities.aws import download_file_from_aws, upload_file_to_aws
+from utilities.note_names import NOTE_NAME_REGEX, NoteNameAllocator
+from utilities.text_blobs import (
+    decompress_text,
+    get_text_blob_digest,
+    get_text_blob_name,
+    is_text_blob_name,
+    parse_text_blob_name,
+    upload_text_blob,
+)
+from utilities.text_cache import note_text_cache
 
 
 def generate_file_name(note: Note):
@@ -42,13 +57,19 @@ class Folder(models.Model):
     date = models.DateTimeField(auto_now_add=True, null=True)
     index = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [models.Index(fields=["user", "folder", "index"])]
+
     def __str__(self):
         return f"{self.name}"
 
 
 class Canvas(models.Model):
     file = models.FileField(
-        upload_to=note_upload_to, storage=PrivateMediaStorage, null=True, blank=True
+        upload_to=note_upload_to,
+        storage=get_private_media_storage,
+        null=True,
+        blank=True,
     )
     background = models.CharField(max_length=7, default="#FBFCFF")
 
@@ -67,26 +88,348 @@ class Note(models.Model):
     room = models.ForeignKey(Room, on_delete=models.CASCADE, null=True, blank=True)
     name = models.CharField(max_length=60)
     text_file = models.FileField(
-        upload_to=note_upload_to, storage=PrivateMediaStorage, null=True, blank=True
+        upload_to=note_upload_to,
+        storage=get_private_media_storage,
+        null=True,
+        blank=True,
     )
     folder = models.ForeignKey(Folder, on_delete=models.CASCADE, null=True, blank=True)
     date = models.DateTimeField(auto_now_add=True, null=True)
     token = models.CharField(max_length=100, default=get_token, unique=True)
     index = models.PositiveIntegerField(default=0)
-    canvas_file = models.OneToOneField(Canvas, on_delete=models.CASCADE, related_name="note")
+    canvas_file = models.OneToOneField(
+        Canvas, on_delete=models.CASCADE, related_name="note"
+    )
     display = models.CharField(
         max_length=6, choices=DefaultDisplay.choices, default=DefaultDisplay.TEXT
     )
+    text_version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "folder", "index"])]
+        constraints = [
+            # Default names are picked as the smallest free one, so two
+            # concurrent creates can pick the same; one of them then retries.
+            models.UniqueConstraint(
+                fields=["user", "name"],
+                condition=models.Q(name__regex=NOTE_NAME_REGEX),
+                name="unique_default_note_name",
+            )
+        ]
 
     def __str__(self):
         return f"{self.name}"
 
+    @classmethod
+    def get_free_name(cls, user: Accounts) -> str:
+        """
+        Return the smallest "NoteN" name that no note of `user` has, with one
+        query over the notes already named that way.
+        """
+        return NoteNameAllocator(
+            cls.objects.filter(user=user, name__regex=NOTE_NAME_REGEX).values_list(
+                "name", flat=True
+            )
+        ).get_free_name()
+
+    @property
+    def text_cache_key(self) -> str:
+        return f"{self.text_file.name}:{self.text_version}"
+
     def get_text(self):
+        pending_text, inline_text = (
+            Note.objects.filter(pk=self.pk)
+            .values_list("pending_text__text", "inline_text__text")
+            .first()
+        ) or (None, None)
+
+        if pending_text is not None:
+            return pending_text
+
+        if inline_text is not None:
+            return inline_text
+
+        if self.text_file:
+            text = note_text_cache.get(self.text_cache_key)
+
+            if text is not None:
+                return text
+
+            try:
+                text = self.read_text_file().decode("utf-8")
+            except Exception:
+                return ""
+
+            note_text_cache.set(self.text_cache_key, text)
+
+            return text
+
+        return ""
+
+    async def aget_text(self):
+        """
+        Same as `get_text`, reading storage with the async object storage.
+        """
+        pending_text, inline_text = (
+            await Note.objects.filter(pk=self.pk)
+            .values_list("pending_text__text", "inline_text__text")
+            .afirst()
+        ) or (None, None)
+
+        if pending_text is not None:
+            return pending_text
+
+        if inline_text is not None:
+            return inline_text
+
         if self.text_file:
+            text = await note_text_cache.aget(self.text_cache_key)
+
+            if text is not None:
+                return text
+
             try:
-                file = download_file_from_aws(self.text_file)
-                return file.read().decode("utf-8")
+                content = await get_async_object_storage().read(self.text_file.name)
+
+                if is_text_blob_name(self.text_file.name):
+                    content = decompress_text(content)
+
+                text = content.decode("utf-8")
             except Exception:
                 return ""
 
+            await note_text_cache.aset(self.text_cache_key, text)
+
+            return text
+
         return ""
+
+    def read_text_file(self) -> bytes:
+        """
+        Download the text file from storage, without any fallback.
+        """
+        content = download_file_from_aws(self.text_file).read()
+
+        if is_text_blob_name(self.text_file.name):
+            content = decompress_text(content)
+
+        return content
+
+    def save_text_file(self, file):
+        """
+        Store a new version of the note text and refresh the cached copy.
+
+        Text of up to NOTE_TEXT_INLINE_MAX_SIZE bytes is kept in the database
+        (see `InlineNoteText`); larger text is uploaded to storage. A note
+        moves between the two whenever its size crosses the threshold, and the
+        file or row it leaves is released.
+
+        The version is bumped on every upload so that other workers holding an
+        entry for the previous version stop using it. The note row stays locked
+        from the upload until the commit, so concurrent saves are applied,
+        versioned and cached in the same order.
+
+        With NOTE_TEXT_CONTENT_ADDRESSED, uploaded text is stored as a shared
+        compressed blob (see `TextBlob`) and the previous file is released.
+        Files that are not blobs are otherwise overwritten in place.
+        """
+        content = file.read()
+        file.seek(0)
+
+        try:
+            text = content.decode("utf-8")
+        except UnicodeDecodeError:
+            text = None
+
+        is_inline = (
+            text is not None and len(content) <= settings.NOTE_TEXT_INLINE_MAX_SIZE
+        )
+
+        with transaction.atomic():
+            current = (
+                Note.objects.select_for_update()
+                .only("text_file", "text_version")
+                .get(pk=self.pk)
+            )
+            previous_name = current.text_file.name if current.text_file else None
+            self.text_version = current.text_version + 1
+
+            if previous_name:
+                note_text_cache.delete(current.text_cache_key)
+
+            if is_inline:
+                InlineNoteText.objects.update_or_create(
+                    note=self, defaults={"text": text}
+                )
+                self.text_file = None
+            else:
+                InlineNoteText.objects.filter(note=self).delete()
+
+                if settings.NOTE_TEXT_CONTENT_ADDRESSED:
+                    self.text_file = TextBlob.acquire(content)
+                elif previous_name and not is_text_blob_name(previous_name):
+                    upload_file_to_aws(previous_name, file)
+                    previous_name = None
+                else:
+                    self.text_file = file
+
+            self.save(update_fields=["text_file", "text_version"])
+
+            if previous_name:
+                if is_text_blob_name(previous_name):
+                    TextBlob.release([previous_name])
+                else:
+                    StorageDeletion.objects.create(name=previous_name)
+
+        if not is_inline and text is not None:
+            note_text_cache.set(self.text_cache_key, text)
+
+
+class InlineNoteText(models.Model):
+    """
+    Text of a note small enough to be kept in the database rather than in
+    storage, so that opening the note costs one primary key lookup. The
+    column is compressed by the database itself (TOAST on PostgreSQL).
+    """
+
+    note = models.OneToOneField(
+        Note, on_delete=models.CASCADE, primary_key=True, related_name="inline_text"
+    )
+    text = models.TextField()
+
+    def __str__(self):
+        return f"{self.note}"
+
+
+class StorageDeletion(models.Model):
+    """
+    Outbox of storage files waiting to be removed. Rows are written in the
+    same transaction as the records that referenced the files and drained in
+    batches by the `drain_storage_deletions` management command.
+    """
+
+    name = models.CharField(max_length=255)
+    date = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now, db_index=True)
+    last_error = models.TextField(blank=True, default="")
+
+    def __str__(self):
+        return f"{self.name}"
+
+
+class TextBlob(models.Model):
+    """
+    Note text stored once per distinct content, gzip-compressed, under a
+    name derived from its SHA-256 digest. Notes with identical text point
+    their `text_file` at the same blob.
+
+    `references` counts those notes. Blobs that are no longer referenced are
+    removed through the storage deletion outbox by `collect_text_blobs`.
+    """
+
+    digest = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveIntegerField()
+    stored_size = models.PositiveIntegerField()
+    references = models.PositiveIntegerField(default=0, db_index=True)
+    date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.digest}"
+
+    @property
+    def name(self) -> str:
+        return get_text_blob_name(self.digest)
+
+    @classmethod
+    def acquire(cls, content: bytes) -> str:
+        """
+        Take a reference to the blob holding `content`, uploading it if no
+        blob has this content yet, and return the blob file name.
+
+        The blob row is locked (or created) before a pending deletion of the
+        same name is cancelled, so `collect_text_blobs` cannot queue a new
+        deletion in between. Cancelling waits for the outbox worker if it is
+        removing that object right now, so the object is then uploaded again
+        instead of being removed afterwards.
+        """
+        digest = get_text_blob_digest(content)
+        name = get_text_blob_name(digest)
+
+        with transaction.atomic():
+            blob, created = cls.objects.select_for_update().get_or_create(
+                digest=digest,
+                defaults={"size": len(content), "stored_size": 0, "references": 1},
+            )
+            StorageDeletion.objects.filter(name=name).delete()
+
+            if created:
+                blob.stored_size = upload_text_blob(name, content)
+                blob.save(update_fields=["stored_size"])
+            else:
+                blob.references = models.F("references") + 1
+                blob.save(update_fields=["references"])
+
+        return name
+
+    @classmethod
+    def release(cls, names: typing.Iterable[str]) -> None:
+        """
+        Drop one reference per name (a name may be repeated).
+        """
+        released = collections.Counter(parse_text_blob_name(name) for name in names)
+
+        with transaction.atomic():
+            for blob in cls.objects.select_for_update().filter(digest__in=released):
+                blob.references = max(blob.references - released[blob.digest], 0)
+                blob.save(update_fields=["references"])
+
+
+class PendingNoteText(models.Model):
+    """
+    Write-behind buffer for note text. Saves land here and are acknowledged
+    right away; the `flush_note_texts` management command uploads them to
+    storage once `next_attempt` is due. Until then, `Note.get_text` reads the
+    text from this row.
+    """
+
+    note = models.OneToOneField(
+        Note, on_delete=models.CASCADE, primary_key=True, related_name="pending_text"
+    )
+    text = models.TextField()
+    # Bumped on every save, so that a flush only clears the row if no newer
+    # text arrived while it was uploading.
+    revision = models.PositiveIntegerField(default=1)
+    date = models.DateTimeField(auto_now=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now, db_index=True)
+    last_error = models.TextField(blank=True, default="")
+    # Set while a flush worker uploads the text, so that no other worker
+    # uploads an older revision over it.
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.note}"
+
+
+class AnonymousNoteText(models.Model):
+    """
+    Text of a note in the workspace of an anonymous user, keyed by session.
+    The rest of the workspace is small and stays in the session; texts are
+    only loaded when used and only written when changed.
+    """
+
+    session_key = models.CharField(max_length=40)
+    note_id = models.PositiveIntegerField()
+    text = models.TextField(blank=True, default="")
+    date = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["session_key", "note_id"], name="unique_anonymous_note_text"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.session_key}:{self.note_id}"
@@ -1,9 +1,193 @@
+import logging
+import threading
+import time
+import typing
+
+from botocore.config import Config
 from django.conf import settings
 from storages.backends.s3boto3 import S3Boto3Storage
 
+logger = logging.getLogger(__name__)
+
+# Minimum number of seconds between two warnings about a saturated pool.
+SATURATION_WARNING_INTERVAL = 60
+
+
+class PoolMetrics:
+    """
+    Counters of the requests sent through the shared S3 client.
+
+    A request is in flight from the moment it is sent until its response has
+    been received. When more requests are in flight than the pool holds,
+    the extra ones open connections that are discarded afterwards (losing
+    keep-alive), so `saturated` counts the requests sent in that state.
+    """
+
+    def __init__(self, pool_size: int):
+        self.pool_size = pool_size
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.saturated = 0
+        self._warned_at: typing.Optional[float] = None
+        self._lock = threading.Lock()
+
+    def on_send(self, **kwargs) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            is_saturated = self.in_flight > self.pool_size
+
+            if is_saturated:
+                self.saturated += 1
+
+        if is_saturated:
+            self._warn()
+
+    def on_response(self, **kwargs) -> None:
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+
+    def snapshot(self) -> typing.Dict[str, int]:
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "requests": self.requests,
+                "saturated": self.saturated,
+            }
+
+    def _warn(self) -> None:
+        now = time.monotonic()
+
+        if (
+            self._warned_at is not None
+            and now - self._warned_at < SATURATION_WARNING_INTERVAL
+        ):
+            return
+
+        self._warned_at = now
+        logger.warning("S3 connection pool saturated: %s", self.snapshot())
+
 
 class PrivateMediaStorage(S3Boto3Storage):
-    bucket_name = (
-        "dev-nb-s33-83928491491" if settings.DEBUG else "nb-s33-88444666337"
-    )
+    """
+    S3 storage whose botocore client (and so its connection pool) is shared
+    by every thread. Each thread still gets its own boto3 resource, as
+    resources are not thread-safe, but they are all built on the same client
+    instead of creating one each.
+
+    Use `get_private_media_storage` rather than creating instances.
+    """
+
+    bucket_name = "dev-nb-s33-83928491491" if settings.DEBUG else "nb-s33-88444666337"
     location = " "
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.client_config = self.client_config.merge(
+            Config(
+                max_pool_connections=settings.AWS_S3_MAX_POOL_CONNECTIONS,
+                retries={
+                    "max_attempts": settings.AWS_S3_MAX_ATTEMPTS,
+                    "mode": settings.AWS_S3_RETRY_MODE,
+                },
+                connect_timeout=settings.AWS_S3_CONNECT_TIMEOUT,
+                read_timeout=settings.AWS_S3_READ_TIMEOUT,
+                tcp_keepalive=True,
+            )
+        )
+        self.pool_metrics = PoolMetrics(settings.AWS_S3_MAX_POOL_CONNECTIONS)
+        self._client = None
+        self._resource_class = None
+        self._client_lock = threading.Lock()
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.pop("pool_metrics", None)
+        state.pop("_client", None)
+        state.pop("_resource_class", None)
+        state.pop("_client_lock", None)
+
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.pool_metrics = PoolMetrics(settings.AWS_S3_MAX_POOL_CONNECTIONS)
+        self._client = None
+        self._resource_class = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    client = self._create_session().client(
+                        "s3",
+                        region_name=self.region_name,
+                        use_ssl=self.use_ssl,
+                        endpoint_url=self.endpoint_url,
+                        config=self.client_config,
+                        verify=self.verify,
+                    )
+                    client.meta.events.register(
+                        "before-send.s3", self.pool_metrics.on_send
+                    )
+                    client.meta.events.register(
+                        "response-received.s3", self.pool_metrics.on_response
+                    )
+                    self._client = client
+
+        return self._client
+
+    @property
+    def connection(self):
+        connection = getattr(self._connections, "connection", None)
+
+        if connection is None:
+            connection = self._get_resource_class()(client=self.client)
+            self._connections.connection = connection
+
+        return connection
+
+    def _get_resource_class(self):
+        # boto3 generates the S3 resource class from its service model when a
+        # resource is created. That is done once, with a throwaway client;
+        # afterwards instances are created directly around the shared client.
+        if self._resource_class is None:
+            with self._client_lock:
+                if self._resource_class is None:
+                    self._resource_class = type(
+                        self._create_session().resource(
+                            "s3",
+                            region_name=self.region_name,
+                            use_ssl=self.use_ssl,
+                            endpoint_url=self.endpoint_url,
+                            config=self.client_config,
+                            verify=self.verify,
+                        )
+                    )
+
+        return self._resource_class
+
+
+_storage: typing.Optional[PrivateMediaStorage] = None
+_storage_lock = threading.Lock()
+
+
+def get_private_media_storage() -> PrivateMediaStorage:
+    """
+    Return the process-wide private media storage. Also used as the storage
+    callable of the file fields, so that models and helpers share it.
+    """
+    global _storage
+
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = PrivateMediaStorage()
+
+    return _storage
@@ -1,12 +1,96 @@
+import dataclasses
 import pathlib
+import threading
+import typing
 import xml.etree.ElementTree as ET
+from html import escape
 
 from django import template
+from django.conf import settings
 from django.utils.safestring import mark_safe
 
 register = template.Library()
 
-ICON_DIR = pathlib.Path("static/images/icons/")
+ICON_DIR = pathlib.Path(settings.BASE_DIR) / "static" / "images" / "icons"
+
+ET.register_namespace("", "http://www.w3.org/2000/svg")
+
+
+@dataclasses.dataclass(frozen=True)
+class CompiledIcon:
+    """
+    An SVG icon split around its root attributes, so that rendering it with
+    different classes and attributes is plain string concatenation.
+    """
+
+    head: str
+    attributes: typing.Dict[str, str]
+    tail: str
+    mtime: float
+
+    def render(self, class_str: str = "", **kwargs) -> str:
+        attributes = {**self.attributes, "class": class_str, **kwargs}
+        rendered = "".join(
+            f' {key}="{escape(str(value))}"' for key, value in attributes.items()
+        )
+
+        return f"{self.head}{rendered}{self.tail}"
+
+
+def compile_icon(path: pathlib.Path) -> CompiledIcon:
+    mtime = path.stat().st_mtime
+    root = ET.parse(path).getroot()
+
+    shell = ET.Element(root.tag)
+    shell.text = root.text
+    shell.extend(root)
+    svg = ET.tostring(shell, encoding="unicode", method="html")
+    head, tail = svg.split(">", 1)
+
+    return CompiledIcon(head, dict(root.attrib), f">{tail}", mtime)
+
+
+class IconRegistry:
+    """
+    Process-wide cache of compiled icons.
+
+    Every icon is parsed once, on `load` (called when the app is ready) or on
+    first use. With `auto_reload`, the source file is checked on every lookup
+    and the icon is recompiled when it changes.
+    """
+
+    def __init__(self, directory: pathlib.Path, auto_reload: bool = False):
+        self.directory = directory
+        self.auto_reload = auto_reload
+        self._icons: typing.Dict[str, CompiledIcon] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        icons = {path.stem: compile_icon(path) for path in self.directory.glob("*.svg")}
+
+        with self._lock:
+            self._icons = icons
+
+    def get(self, name: str) -> CompiledIcon:
+        icon = self._icons.get(name)
+
+        if icon is not None and not self.auto_reload:
+            return icon
+
+        path = self.directory / f"{name}.svg"
+
+        if icon is not None and path.stat().st_mtime == icon.mtime:
+            return icon
+
+        icon = compile_icon(path)
+
+        with self._lock:
+            self._icons = {**self._icons, name: icon}
+
+        return icon
+
+
+icon_registry = IconRegistry(ICON_DIR, auto_reload=settings.DEBUG)
 
 
 @register.simple_tag
@@ -19,17 +103,4 @@ def icon(icon_name, class_str="", **kwargs):
     SVG element. Any additional keyword arguments will be added as attributes
     to the SVG element.
     """
-    path = ICON_DIR / f"{icon_name}.svg"
-
-    ET.register_namespace("", "http://www.w3.org/2000/svg")
-    tree = ET.parse(path)
-
-    root = tree.getroot()
-    root.set("class", class_str)
-
-    for key, value in kwargs.items():
-        root.set(key, value)
-
-    svg = ET.tostring(root, encoding="unicode", method="html")
-
-    return mark_safe(svg)
+    return mark_safe(icon_registry.get(icon_name).render(class_str, **kwargs))
@@ -2,12 +2,16 @@ from django import template
 
 from texteditor.models import Folder, Note
 from texteditor.anonymous import Folder as AnonymousFolder, Note as AnonymousNote
+from utilities.resource_listing import ListedResource
 
 register = template.Library()
 
 
 @register.filter
 def get_type(value):
+    if type(value) is ListedResource:
+        return value.type
+
     if type(value) in [Folder, AnonymousFolder]:
         return "folder"
 
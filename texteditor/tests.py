@@ -1,3 +1,897 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import zipfile
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser as DjangoAnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+
+from account.models import Accounts
+from utilities import realtime
+from utilities.anonymous_note_texts import clear_anonymous_note_texts
+from utilities.async_storage import MemoryObjectStorage
+from utilities.export import get_export_entries, stream_zip
+from utilities.note_names import NoteNameAllocator
+from utilities.note_text_buffer import buffer_note_text, flush_note_texts
+from utilities.note_text_placement import place_note_texts
+from utilities.resource_index import (
+    INDEX_GAP,
+    _get_index_between,
+    get_sibling_indexes,
+    move_to_position,
+)
+from utilities.storage_deletions import (
+    RETRY_DELAY,
+    collect_text_blobs,
+    drain_storage_deletions,
+)
+from utilities.text_blobs import compress_text, get_text_blob_name
+from utilities.text_cache import note_text_cache
+from utilities.text_operations import (
+    NoteDocument,
+    OperationError,
+    TextOperation,
+    get_length,
+)
+
+from . import async_views
+from .anonymous import AnonymousUser
+from .middleware import AnonymousNoteTextMiddleware
+from .models import (
+    AnonymousNoteText,
+    Canvas,
+    Folder,
+    InlineNoteText,
+    Note,
+    PendingNoteText,
+    Room,
+    StorageDeletion,
+    TextBlob,
+)
+
+
+def create_user(email: str = "user@example.com") -> Accounts:
+    return Accounts.objects.create(email=email, is_active=True)
+
+
+def create_note(user: Accounts, name: str = "Note1", **kwargs) -> Note:
+    room = Room.objects.create(user=user, name=f"{user.pk}-{name}")
+
+    return Note.objects.create(
+        user=user, name=name, room=room, canvas_file=Canvas.objects.create(), **kwargs
+    )
+
+
+def get_async_request(user: Accounts, path: str = "/", method: str = "get", **kwargs):
+    request = getattr(AsyncRequestFactory(), method)(path, **kwargs)
+
+    async def auser():
+        return user
+
+    request.auser = auser
+
+    return request
+
+
+async def read_streaming_content(response) -> bytes:
+    return b"".join([chunk async for chunk in response.streaming_content])
+
+
+def apply_operation(operation: TextOperation, text: str) -> str:
+    document = bytearray(text.encode("utf-16-le", "surrogatepass"))
+    operation.apply(document)
+
+    return document.decode("utf-16-le", "surrogatepass")
+
+
+class RoomChannelTests(TestCase):
+    def setUp(self):
+        self.note = create_note(create_user())
+        self.note.room.is_public = True
+        self.note.room.is_editable = True
+        self.note.room.save()
+        InlineNoteText.objects.create(note=self.note, text="hello")
+
+    def connect(self, origin: bytes = b"http://testserver"):
+        """
+        Open a connection to the room, returning its task, its queue of
+        incoming events and the list of messages sent to it.
+        """
+        events = asyncio.Queue()
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            "type": "websocket",
+            "path": f"/ws/{self.note.token}/r/{self.note.room.name}/",
+            "headers": [(b"host", b"testserver"), (b"origin", origin)],
+        }
+        events.put_nowait({"type": "websocket.connect"})
+        task = asyncio.ensure_future(realtime.room_websocket(scope, events.get, send))
+
+        return task, events, messages
+
+    async def next_message(self, messages):
+        async with asyncio.timeout(5):
+            while not any(message["type"] == "websocket.send" for message in messages):
+                await asyncio.sleep(0)
+
+        index = next(
+            index
+            for index, message in enumerate(messages)
+            if message["type"] == "websocket.send"
+        )
+
+        return json.loads(messages.pop(index)["text"])
+
+    async def test_operations_are_acknowledged_and_relayed(self):
+        first, first_events, first_messages = self.connect()
+        second, second_events, second_messages = self.connect()
+
+        try:
+            snapshot = await self.next_message(first_messages)
+            self.assertEqual(
+                snapshot, {"type": "snapshot", "version": 0, "text": "hello"}
+            )
+            await self.next_message(second_messages)
+
+            first_events.put_nowait(
+                {
+                    "type": "websocket.receive",
+                    "text": json.dumps({"version": 0, "operation": [5, " world"]}),
+                }
+            )
+
+            self.assertEqual(
+                await self.next_message(first_messages), {"type": "ack", "version": 1}
+            )
+            self.assertEqual(
+                await self.next_message(second_messages),
+                {"type": "operation", "version": 1, "operation": [5, " world"]},
+            )
+        finally:
+            first_events.put_nowait({"type": "websocket.disconnect"})
+            second_events.put_nowait({"type": "websocket.disconnect"})
+            await asyncio.gather(first, second)
+            await realtime.writer.flush_all()
+
+        note = await Note.objects.aget(pk=self.note.pk)
+        self.assertEqual(await note.aget_text(), "hello world")
+
+    def test_parse_operation(self):
+        event = {"text": json.dumps({"version": 2, "operation": [1, "😀", -2]})}
+        version, operation = realtime._parse_operation(event)
+
+        self.assertEqual(version, 2)
+        self.assertEqual(operation.components, [1, "😀", -2])
+        self.assertEqual(operation.base_length, 3)
+        self.assertEqual(operation.target_length, 3)
+
+        for data in ('{"version": "2", "operation": []}', '{"operation": [0]}'):
+            with self.subTest(data=data), self.assertRaises(OperationError):
+                realtime._parse_operation({"text": data})
+
+    async def test_rejects_other_origins(self):
+        task, _, messages = self.connect(origin=b"http://example.com")
+        await task
+
+        self.assertEqual(
+            messages, [{"type": "websocket.close", "code": realtime.CLOSE_FORBIDDEN}]
+        )
+
+
+class NoteTextCacheTests(TestCase):
+    def setUp(self):
+        note_text_cache.clear()
+        self.note = create_note(create_user(), text_file="1/text")
+
+    def test_storage_is_read_once(self):
+        with mock.patch(
+            "texteditor.models.download_file_from_aws",
+            return_value=io.BytesIO(b"stored"),
+        ) as download:
+            self.assertEqual(self.note.get_text(), "stored")
+            self.assertEqual(Note.objects.get(pk=self.note.pk).get_text(), "stored")
+
+        download.assert_called_once()
+
+    @override_settings(NOTE_TEXT_INLINE_MAX_SIZE=0)
+    def test_saved_text_is_cached_under_new_version(self):
+        note_text_cache.set(self.note.text_cache_key, "old")
+
+        with mock.patch("texteditor.models.upload_file_to_aws") as upload:
+            self.note.save_text_file(ContentFile(b"new", name="text.txt"))
+
+        upload.assert_called_once()
+        note = Note.objects.get(pk=self.note.pk)
+        self.assertEqual(note.text_version, 1)
+
+        with mock.patch("texteditor.models.download_file_from_aws") as download:
+            self.assertEqual(note.get_text(), "new")
+
+        download.assert_not_called()
+
+
+class AsyncCanvasDownloadTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.note = create_note(self.user)
+        self.note.canvas_file.file.name = "1/canvas"
+        self.note.canvas_file.save()
+        self.storage = MemoryObjectStorage()
+        self.storage.objects["1/canvas"] = (b"0123456789", {})
+        patcher = mock.patch("utilities.async_storage._storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def get(self, headers=None):
+        view = async_views.GetNoteCanvas.as_view()
+
+        return await view(
+            get_async_request(self.user, headers=headers), note_token=self.note.token
+        )
+
+    async def test_streams_whole_canvas(self):
+        response = await self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(await read_streaming_content(response), b"0123456789")
+
+    async def test_serves_ranges(self):
+        response = await self.get({"Range": "bytes=2-4"})
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 2-4/10")
+        self.assertEqual(await read_streaming_content(response), b"234")
+
+        response = await self.get({"Range": "bytes=20-"})
+        self.assertEqual(response.status_code, 416)
+
+    async def test_revalidates_with_etag(self):
+        etag = (await self.get())["ETag"]
+        response = await self.get({"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+
+class AsyncCanvasSaveTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.note = create_note(self.user)
+        self.storage = MemoryObjectStorage()
+        patcher = mock.patch("utilities.async_storage._storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def save(self, content: bytes):
+        request = get_async_request(
+            self.user,
+            method="post",
+            data={"file": SimpleUploadedFile("blob", content, "image/png")},
+        )
+
+        return await async_views.SaveCanvas.as_view()(
+            request, note_token=self.note.token
+        )
+
+    async def test_stores_canvas_with_sync_metadata(self):
+        response = await self.save(b"first")
+        self.assertEqual(response.status_code, 200)
+
+        canvas = await Canvas.objects.aget(pk=self.note.canvas_file_id)
+        content, parameters = self.storage.objects[canvas.file.name]
+        self.assertEqual(content, b"first")
+        self.assertEqual(parameters["ContentType"], "image/png")
+
+        # Later saves overwrite the same object.
+        await self.save(b"second")
+        self.assertEqual(list(self.storage.objects), [canvas.file.name])
+        self.assertEqual(self.storage.objects[canvas.file.name][0], b"second")
+
+
+class ResourceIndexTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+
+    def create_folder(self, name: str, index: int) -> Folder:
+        return Folder.objects.create(user=self.user, name=name, index=index)
+
+    def test_index_between(self):
+        self.assertEqual(_get_index_between(None, None), INDEX_GAP)
+        self.assertEqual(_get_index_between(None, 10), 5)
+        self.assertEqual(_get_index_between(10, 20), 15)
+        self.assertEqual(_get_index_between(10, None), 10 + INDEX_GAP)
+
+    def test_index_between_exhausted_gap(self):
+        self.assertIsNone(_get_index_between(10, 11))
+        self.assertIsNone(_get_index_between(None, 0))
+
+    def test_move_only_writes_moved_resource(self):
+        first = self.create_folder("first", INDEX_GAP)
+        second = self.create_folder("second", 2 * INDEX_GAP)
+        moved = self.create_folder("moved", 3 * INDEX_GAP)
+
+        move_to_position(moved, 1, self.user)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.index, INDEX_GAP)
+        self.assertEqual(second.index, 2 * INDEX_GAP)
+        self.assertEqual(moved.index, INDEX_GAP + INDEX_GAP // 2)
+
+    def test_move_into_exhausted_gap_rebalances(self):
+        first = self.create_folder("first", 1)
+        second = self.create_folder("second", 2)
+        moved = self.create_folder("moved", 3)
+
+        move_to_position(moved, 1, self.user)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.index, INDEX_GAP)
+        self.assertEqual(second.index, 2 * INDEX_GAP)
+        self.assertTrue(first.index < moved.index < second.index)
+        self.assertEqual(
+            list(get_sibling_indexes(None, self.user)),
+            [first.index, moved.index, second.index],
+        )
+
+
+class BulkDeleteTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.client.force_login(self.user)
+
+    def delete(self, *resources):
+        return self.client.post(
+            reverse("bulk_delete_resource"),
+            json.dumps(
+                {
+                    "resources": [
+                        {"id": resource.id, "token": resource.token}
+                        for resource in resources
+                    ]
+                }
+            ),
+            content_type="application/json",
+        )
+
+    def test_deletes_subtrees_and_queues_their_files(self):
+        folder = Folder.objects.create(user=self.user, name="folder")
+        subfolder = Folder.objects.create(user=self.user, name="sub", folder=folder)
+        nested = create_note(self.user, "Note1", folder=subfolder, text_file="1/a")
+        nested.canvas_file.file.name = "1/b"
+        nested.canvas_file.save()
+        note = create_note(self.user, "Note2", text_file="1/c")
+        kept = create_note(self.user, "Note3")
+
+        response = self.delete(folder, note)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Folder.objects.filter(user=self.user).exists())
+        self.assertEqual(list(Note.objects.filter(user=self.user)), [kept])
+        self.assertFalse(Canvas.objects.filter(pk=nested.canvas_file_id).exists())
+        self.assertEqual(
+            set(StorageDeletion.objects.values_list("name", flat=True)),
+            {"1/a", "1/b", "1/c"},
+        )
+
+    def test_rejects_resources_of_other_users(self):
+        note = create_note(self.user)
+        other = create_note(create_user("other@example.com"))
+
+        response = self.delete(note, other)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Note.objects.count(), 2)
+        self.assertFalse(StorageDeletion.objects.exists())
+
+
+class StorageDeletionTests(TestCase):
+    def test_drains_due_files_and_retries_failures(self):
+        StorageDeletion.objects.create(name="1/removed")
+        StorageDeletion.objects.create(name="1/failed")
+        StorageDeletion.objects.create(
+            name="1/later", next_attempt=timezone.now() + datetime.timedelta(hours=1)
+        )
+
+        with mock.patch(
+            "utilities.storage_deletions.remove_files_from_aws",
+            return_value={"1/failed": "AccessDenied"},
+        ) as remove:
+            self.assertEqual(drain_storage_deletions(), 2)
+
+        remove.assert_called_once()
+        self.assertCountEqual(remove.call_args.args[0], ["1/removed", "1/failed"])
+        self.assertCountEqual(
+            StorageDeletion.objects.values_list("name", flat=True),
+            ["1/failed", "1/later"],
+        )
+
+        failed = StorageDeletion.objects.get(name="1/failed")
+        self.assertEqual(failed.attempts, 1)
+        self.assertEqual(failed.last_error, "AccessDenied")
+        self.assertGreater(failed.next_attempt, timezone.now() + RETRY_DELAY / 2)
+
+        # Nothing is due until the retry delay has passed.
+        with mock.patch("utilities.storage_deletions.remove_files_from_aws") as remove:
+            self.assertEqual(drain_storage_deletions(), 0)
+
+        remove.assert_not_called()
+
+    def test_gives_up_after_max_attempts(self):
+        StorageDeletion.objects.create(name="1/stuck", attempts=2)
+
+        with mock.patch("utilities.storage_deletions.remove_files_from_aws") as remove:
+            self.assertEqual(drain_storage_deletions(max_attempts=2), 0)
+
+        remove.assert_not_called()
+        self.assertTrue(StorageDeletion.objects.filter(name="1/stuck").exists())
+
+
+class ExportTests(TransactionTestCase):
+    # Entries are opened on the export thread pool, which only sees committed
+    # rows.
+
+    def setUp(self):
+        self.user = create_user()
+        self.objects = {"1/text": b"stored", "1/canvas": b"png"}
+        patcher = mock.patch(
+            "utilities.export.get_object_from_aws", side_effect=self.get_object
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_object(self, name: str):
+        body = mock.Mock()
+        body.iter_chunks.return_value = [self.objects[name]]
+
+        return {"Body": body}
+
+    def export(self, *resources) -> zipfile.ZipFile:
+        archive = b"".join(stream_zip(get_export_entries(resources), workers=2))
+
+        return zipfile.ZipFile(io.BytesIO(archive))
+
+    def test_exports_subtree_with_texts_and_canvases(self):
+        folder = Folder.objects.create(user=self.user, name="folder")
+        subfolder = Folder.objects.create(user=self.user, name="sub", folder=folder)
+        inline = create_note(self.user, "inline", folder=folder)
+        InlineNoteText.objects.create(note=inline, text="inline text")
+        pending = create_note(self.user, "pending", folder=subfolder)
+        PendingNoteText.objects.create(note=pending, text="pending text")
+        stored = create_note(self.user, "stored", text_file="1/text")
+        stored.canvas_file.file.name = "1/canvas"
+        stored.canvas_file.save()
+
+        archive = self.export(folder, stored)
+
+        self.assertCountEqual(
+            archive.namelist(),
+            [
+                "folder/",
+                "folder/sub/",
+                "folder/inline.txt",
+                "folder/sub/pending.txt",
+                "stored.txt",
+                "stored.png",
+            ],
+        )
+        self.assertEqual(archive.read("folder/inline.txt"), b"inline text")
+        self.assertEqual(archive.read("folder/sub/pending.txt"), b"pending text")
+        self.assertEqual(archive.read("stored.txt"), b"stored")
+        self.assertEqual(archive.read("stored.png"), b"png")
+
+    def test_unreadable_file_becomes_error_entry(self):
+        note = create_note(self.user, "missing", text_file="1/missing")
+
+        with self.assertLogs("utilities.export", "ERROR"):
+            archive = self.export(note)
+
+        self.assertEqual(archive.namelist(), ["missing.txt.error.txt"])
+
+
+@override_settings(HOME_PAGE_SIZE=2)
+class HomePaginationTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.client.force_login(self.user)
+
+    def list_home(self) -> list:
+        listed = []
+        after = None
+
+        while True:
+            response = self.client.get(
+                reverse("home"), {"after": after} if after else {}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context["resource_offset"], len(listed))
+            listed += [
+                (resource.type, resource.id)
+                for resource in response.context["resources"]
+            ]
+            after = response.context["next_after"]
+
+            if after is None:
+                return listed
+
+    def test_pages_list_every_resource_once(self):
+        # Siblings sharing an index are still paged in a stable order.
+        first = Folder.objects.create(user=self.user, name="first", index=1)
+        second = create_note(self.user, "second", index=1)
+        third = Folder.objects.create(user=self.user, name="third", index=1)
+        fourth = create_note(self.user, "fourth", index=2)
+        fifth = create_note(self.user, "fifth", index=3)
+        Folder.objects.create(user=create_user("other@example.com"), name="other")
+
+        self.assertEqual(
+            self.list_home(),
+            [
+                ("folder", first.id),
+                ("folder", third.id),
+                ("note", second.id),
+                ("note", fourth.id),
+                ("note", fifth.id),
+            ],
+        )
+
+
+class TextOperationTests(SimpleTestCase):
+    def assert_converges(self, text: str, a: TextOperation, b: TextOperation):
+        a_prime, b_prime = TextOperation.transform(a, b)
+
+        self.assertEqual(
+            apply_operation(b_prime, apply_operation(a, text)),
+            apply_operation(a_prime, apply_operation(b, text)),
+        )
+
+    def test_transform_converges(self):
+        text = "hello world"
+        operations = [
+            TextOperation().retain(5).insert(",").retain(6),
+            TextOperation().insert(">> ").retain(11),
+            TextOperation().delete(6).retain(5),
+            TextOperation().retain(3).delete(5).insert("p").retain(3),
+            TextOperation().retain(11).insert("!"),
+        ]
+
+        for a in operations:
+            for b in operations:
+                with self.subTest(a=a.components, b=b.components):
+                    self.assert_converges(text, a, b)
+
+    def test_transform_puts_first_insert_first(self):
+        a = TextOperation().retain(2).insert("a")
+        b = TextOperation().retain(2).insert("b")
+        a_prime, b_prime = TextOperation.transform(a, b)
+
+        self.assertEqual(apply_operation(b_prime, apply_operation(a, "xy")), "xyab")
+        self.assertEqual(apply_operation(a_prime, apply_operation(b, "xy")), "xyab")
+
+    def test_offsets_count_utf16_code_units(self):
+        text = "a😀b"
+        self.assertEqual(get_length(text), 4)
+
+        a = TextOperation().retain(3).insert("c").retain(1)
+        b = TextOperation().retain(1).delete(2).retain(1)
+        self.assertEqual(apply_operation(a, text), "a😀cb")
+        self.assertEqual(apply_operation(b, text), "ab")
+        self.assert_converges(text, a, b)
+
+        with self.assertRaises(OperationError):
+            apply_operation(TextOperation().retain(3), text)
+
+    def test_document_transforms_stale_operations(self):
+        document = NoteDocument("hello")
+
+        # Three clients edit version 0 at the same time.
+        document.apply(0, TextOperation().retain(5).insert(" world"))
+        document.apply(0, TextOperation().insert(">> ").retain(5))
+        document.apply(0, TextOperation().delete(1).insert("H").retain(4))
+
+        # The later "H" was transformed against ">> ", both inserted at the
+        # start, and goes first.
+        self.assertEqual(document.text, "H>> ello world")
+        self.assertEqual(document.version, 3)
+
+        with self.assertRaises(OperationError):
+            document.apply(4, TextOperation().retain(14))
+
+
+class NoteTextBufferTests(TestCase):
+    def setUp(self):
+        self.note = create_note(create_user())
+
+    def test_flush_uploads_latest_text_once(self):
+        buffer_note_text(self.note.pk, "first")
+        buffer_note_text(self.note.pk, "second")
+
+        # Not due before NOTE_TEXT_FLUSH_DELAY.
+        with mock.patch.object(Note, "save_text_file") as save:
+            self.assertEqual(flush_note_texts(), 0)
+            self.assertEqual(flush_note_texts(flush_all=True), 1)
+
+        save.assert_called_once()
+        self.assertEqual(save.call_args.args[0].read(), b"second")
+        self.assertFalse(PendingNoteText.objects.exists())
+
+    def test_failed_upload_is_retried_later(self):
+        buffer_note_text(self.note.pk, "text")
+
+        with mock.patch.object(Note, "save_text_file", side_effect=OSError("down")):
+            with self.assertLogs("utilities.note_text_buffer", "ERROR"):
+                self.assertEqual(flush_note_texts(flush_all=True), 0)
+
+        pending_text = PendingNoteText.objects.get()
+        self.assertEqual(pending_text.attempts, 1)
+        self.assertEqual(pending_text.last_error, "down")
+        self.assertIsNone(pending_text.claimed_until)
+        self.assertGreater(pending_text.next_attempt, timezone.now())
+
+    def test_claimed_text_is_not_flushed_twice_nor_lost(self):
+        buffer_note_text(self.note.pk, "old")
+        nested_flushes = []
+
+        def save_text_file(file):
+            # Another worker runs while this one uploads, and the note is
+            # saved again in the meantime.
+            nested_flushes.append(flush_note_texts(flush_all=True))
+            buffer_note_text(self.note.pk, "new")
+
+        with mock.patch.object(Note, "save_text_file", side_effect=save_text_file):
+            self.assertEqual(flush_note_texts(flush_all=True), 1)
+
+        self.assertEqual(nested_flushes, [0])
+        pending_text = PendingNoteText.objects.get()
+        self.assertEqual(pending_text.text, "new")
+        self.assertIsNone(pending_text.claimed_until)
+
+
+@override_settings(NOTE_TEXT_CONTENT_ADDRESSED=True, NOTE_TEXT_INLINE_MAX_SIZE=0)
+class TextBlobTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        patcher = mock.patch("texteditor.models.upload_text_blob", return_value=1)
+        self.upload = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def save_text(self, note: Note, text: str) -> None:
+        note.save_text_file(ContentFile(text.encode("utf-8"), name="text.txt"))
+
+    def test_identical_texts_share_one_blob(self):
+        first = create_note(self.user, "Note1")
+        second = create_note(self.user, "Note2")
+
+        self.save_text(first, "same")
+        self.save_text(second, "same")
+
+        self.upload.assert_called_once()
+        blob = TextBlob.objects.get()
+        self.assertEqual(blob.references, 2)
+        self.assertEqual(first.text_file.name, blob.name)
+        self.assertEqual(second.text_file.name, blob.name)
+
+    def test_unreferenced_blobs_are_collected(self):
+        first = create_note(self.user, "Note1")
+        second = create_note(self.user, "Note2")
+        self.save_text(first, "old")
+        self.save_text(second, "old")
+        old = TextBlob.objects.get()
+
+        self.save_text(first, "new")
+        self.assertEqual(collect_text_blobs(), 0)
+        self.save_text(second, "new")
+
+        old.refresh_from_db()
+        self.assertEqual(old.references, 0)
+        self.assertEqual(TextBlob.objects.get(references=2).name, first.text_file.name)
+        self.assertEqual(collect_text_blobs(), 1)
+        self.assertFalse(TextBlob.objects.filter(pk=old.pk).exists())
+        self.assertEqual(
+            list(StorageDeletion.objects.values_list("name", flat=True)), [old.name]
+        )
+
+        # Storing the same text again cancels the pending deletion.
+        self.save_text(first, "old")
+        self.assertFalse(StorageDeletion.objects.exists())
+        self.assertEqual(TextBlob.objects.get(pk=old.pk).references, 1)
+
+
+@override_settings(NOTE_TEXT_CONTENT_ADDRESSED=False, NOTE_TEXT_INLINE_MAX_SIZE=8)
+class NoteTextPlacementTests(TestCase):
+    def setUp(self):
+        note_text_cache.clear()
+        self.note = create_note(create_user())
+
+    def save_text(self, text: str) -> None:
+        self.note.save_text_file(ContentFile(text.encode("utf-8"), name="text.txt"))
+
+    def test_text_moves_with_its_size(self):
+        self.save_text("small")
+
+        self.assertEqual(InlineNoteText.objects.get(note=self.note).text, "small")
+        self.assertFalse(Note.objects.get(pk=self.note.pk).text_file)
+
+        storage = Note._meta.get_field("text_file").storage
+
+        with mock.patch.object(
+            storage, "_save", side_effect=lambda name, content: name
+        ) as upload:
+            self.save_text("larger than eight bytes")
+
+        upload.assert_called_once()
+        note = Note.objects.get(pk=self.note.pk)
+        self.assertTrue(note.text_file)
+        self.assertFalse(InlineNoteText.objects.filter(note=note).exists())
+        self.assertEqual(note.get_text(), "larger than eight bytes")
+
+        self.save_text("small")
+
+        self.assertEqual(InlineNoteText.objects.get(note=self.note).text, "small")
+        self.assertFalse(Note.objects.get(pk=self.note.pk).text_file)
+        self.assertEqual(
+            list(StorageDeletion.objects.values_list("name", flat=True)),
+            [note.text_file.name],
+        )
+
+    def test_place_note_texts_moves_small_stored_text_inline(self):
+        name = get_text_blob_name("0" * 64)
+        TextBlob.objects.create(digest="0" * 64, size=5, stored_size=5, references=1)
+        Note.objects.filter(pk=self.note.pk).update(text_file=name)
+        second = create_note(self.note.user, "Note2")
+
+        with mock.patch(
+            "texteditor.models.download_file_from_aws",
+            return_value=io.BytesIO(compress_text(b"small")),
+        ):
+            self.assertEqual(place_note_texts(), (2, 1, second.pk))
+
+        self.assertEqual(InlineNoteText.objects.get(note=self.note).text, "small")
+        self.assertEqual(TextBlob.objects.get().references, 0)
+
+
+class AnonymousNoteTextTests(TestCase):
+    def setUp(self):
+        self.session_key = None
+
+    def request(self, change, status: int = 200) -> None:
+        """
+        Run `change` on the workspace of the anonymous user within a request
+        answered with `status`.
+        """
+
+        def view(request):
+            user = AnonymousUser.from_request(request)
+            change(user)
+            user.save(request.session)
+
+            return HttpResponse(status=status)
+
+        request = RequestFactory().get("/")
+        request.user = DjangoAnonymousUser()
+
+        if self.session_key:
+            request.COOKIES[settings.SESSION_COOKIE_NAME] = self.session_key
+
+        AnonymousNoteTextMiddleware(SessionMiddleware(view))(request)
+        self.session_key = request.session.session_key
+
+    def get_texts(self) -> list:
+        return list(
+            AnonymousNoteText.objects.filter(session_key=self.session_key).values_list(
+                "text", flat=True
+            )
+        )
+
+    def test_texts_are_only_written_with_successful_responses(self):
+        notes = []
+        self.request(lambda user: notes.append(user.add_note(text="first")))
+        self.assertEqual(self.get_texts(), ["first"])
+
+        def edit(user):
+            note = user.get_note_by_id(notes[0].id)
+            user.load_texts([note])
+            note.text = "lost"
+
+        def delete(user):
+            user.delete_note(user.get_note_by_id(notes[0].id))
+
+        self.request(edit, status=500)
+        self.request(delete, status=500)
+        self.assertEqual(self.get_texts(), ["first"])
+
+        self.request(edit)
+        self.assertEqual(self.get_texts(), ["lost"])
+        self.request(delete)
+        self.assertEqual(self.get_texts(), [])
+
+    def test_texts_of_expired_sessions_are_cleared(self):
+        self.request(lambda user: user.add_note(text="kept"))
+        AnonymousNoteText.objects.create(session_key="expired", note_id=1, text="gone")
+
+        self.assertEqual(clear_anonymous_note_texts(), 1)
+        self.assertEqual(
+            list(AnonymousNoteText.objects.values_list("text", flat=True)), ["kept"]
+        )
+        self.assertTrue(
+            import_module(settings.SESSION_ENGINE)
+            .SessionStore()
+            .exists(self.session_key)
+        )
+
+
+class NoteNameAllocatorTests(SimpleTestCase):
+    def test_takes_smallest_free_name(self):
+        allocator = NoteNameAllocator(["Note1", "Note3", "Shopping", "Note0"])
+
+        self.assertEqual(allocator.get_free_name(), "Note2")
+        allocator.take("Note2")
+        self.assertEqual(allocator.get_free_name(), "Note4")
+
+    def test_reuses_released_name(self):
+        allocator = NoteNameAllocator(["Note1", "Note2", "Note3"])
+
+        allocator.release("Note2")
+        self.assertFalse(allocator.is_taken("Note2"))
+        self.assertEqual(allocator.get_free_name(), "Note2")
+
+        allocator.take("Note2")
+        self.assertEqual(allocator.get_free_name(), "Note4")
+
+    def test_name_used_twice_is_released_by_both(self):
+        allocator = NoteNameAllocator(["Note1", "Note1"])
+
+        allocator.release("Note1")
+        self.assertEqual(allocator.get_free_name(), "Note2")
+        allocator.release("Note1")
+        self.assertEqual(allocator.get_free_name(), "Note1")
+
+
+class DefaultNoteNameTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+
+    def test_free_name_is_picked_from_taken_ones(self):
+        create_note(self.user, "Note1")
+        create_note(self.user, "Note3")
+        create_note(create_user("other@example.com"), "Note2")
+
+        self.assertEqual(Note.get_free_name(self.user), "Note2")
+
+    def test_default_names_are_unique_per_user(self):
+        create_note(self.user, "Note1")
+        create_note(self.user, "Shopping")
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Note.objects.create(
+                user=self.user, name="Note1", canvas_file=Canvas.objects.create()
+            )
+
+        # Other names can be repeated.
+        Note.objects.create(
+            user=self.user, name="Shopping", canvas_file=Canvas.objects.create()
+        )
+        self.assertEqual(Note.objects.filter(name="Shopping").count(), 2)
@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
+
+# Views that read or write object storage, in their async variants if enabled.
+storage_views = async_views if settings.ASYNC_STORAGE_VIEWS else views
 
 urlpatterns = [
     # fmt: off
@@ -9,17 +13,22 @@ urlpatterns = [
     path('notes/create', views.CreateNote.as_view(), name="create_note"),
     path('folders/create', views.CreateFolder.as_view(), name="create_folder"),
     
-    path('notes/<str:note_token>/text', views.GetNoteText.as_view(), name="get_note_text"),
-    path('notes/<str:note_token>/canvas', views.GetNoteCanvas.as_view(), name="get_note_canvas"),
+    path('notes/<str:note_token>/text', storage_views.GetNoteText.as_view(), name="get_note_text"),
+    path('notes/<str:note_token>/canvas', storage_views.GetNoteCanvas.as_view(), name="get_note_canvas"),
+    path('notes/<str:note_token>/canvas/url', views.GetNoteCanvasUrl.as_view(), name="get_note_canvas_url"),
     path('notes/<int:note_id>/display', views.UpdateDefaultDisplay.as_view(), name="update_default_display"),
-    path('notes/<str:note_token>/canvas/save', views.SaveCanvas.as_view(), name="save_note_canvas"),
+    path('notes/<str:note_token>/canvas/save', storage_views.SaveCanvas.as_view(), name="save_note_canvas"),
+    path('notes/<str:note_token>/canvas/upload', views.CreateCanvasUpload.as_view(), name="create_canvas_upload"),
+    path('notes/<str:note_token>/canvas/upload/complete', views.CompleteCanvasUpload.as_view(), name="complete_canvas_upload"),
     path('notes/<int:note_id>/canvas/background', views.UpdateCanvasBackground.as_view(), name="update_canvas_background"),
     
     path('rooms/<int:room_id>/permissions/<str:permission>/update', views.UpdatePermission.as_view(), name="update_permission"),
-    path('rooms/<str:note_token>/save', views.SaveRoom.as_view(), name="save_room"),
+    path('rooms/<str:note_token>/save', storage_views.SaveRoom.as_view(), name="save_room"),
     
     path('resources/transfer', views.TransferResource.as_view(), name="transfer_resource"),
     path('resources/move', views.MoveResource.as_view(), name="move_resource"),
+    path('resources/delete', views.BulkDeleteResource.as_view(), name="bulk_delete_resource"),
+    path('resources/export', views.ExportResources.as_view(), name="export_resources"),
     
     path('<int:item_id>/<str:item_token>/delete', views.DeleteResource.as_view(), name="delete_resource"),
     path('<int:item_id>/<str:item_token>/rename', views.RenameResource.as_view(), name="rename_resource"),
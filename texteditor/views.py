@@ -1,24 +1,57 @@
 import enum
 import json
+import re
 import secrets
 import typing
 from http import HTTPStatus
 
+from botocore.exceptions import ClientError
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import Http404, HttpRequest, HttpResponse
+from django.db import IntegrityError, transaction
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.views import View
 
 from account.models import Accounts
 from utilities.aws import (
-    download_file_from_aws,
-    remove_file_from_aws,
+    get_object_from_aws,
+    iter_object_body,
     upload_file_to_aws,
 )
-from utilities.folder_history import get_folder_history, get_next_folders
+from utilities.canvas_uploads import (
+    CanvasUploadError,
+    complete_canvas_upload,
+    create_canvas_upload,
+    get_canvas_url,
+)
+from utilities.delete_resources import delete_resources
+from utilities.export import (
+    get_anonymous_export_entries,
+    get_export_entries,
+    stream_zip,
+)
+from utilities.folder_history import get_folder_history
 from utilities.generate_meta_tags import generate_meta_tags
+from utilities.note_text_buffer import buffer_note_text
 from utilities.resource_count import count_resources_in_folder
+from utilities.resource_index import (
+    get_next_index,
+    get_position,
+    lock_folders,
+    move_to_position,
+)
+from utilities.resource_listing import (
+    get_anonymous_resource_page,
+    get_resource_page,
+    parse_cursor,
+)
 from utilities.responses import (
     ApiErrorKwargsResponse,
     ApiErrorMessageAndCodeResponse,
@@ -31,10 +64,12 @@ from .anonymous import Folder as AnonymousFolder
 from .anonymous import Note as AnonymousNote
 from .forms import (
     ChangePermissionForm,
+    CompleteCanvasUploadForm,
     CreateFolderForm,
     CreateNoteForm,
     MoveResourceForm,
     RenameResourceForm,
+    ResourceSelectionForm,
     SaveCanvasForm,
     SaveRoomForm,
     TransferResourceForm,
@@ -65,6 +100,36 @@ class ErrorCode(enum.IntEnum):
     CHANGE_ORDER_SAME_POSITION = 1018
     INVALID_FORM = 1019
     CHANGE_ORDER_INVALID_DESTINATION = 1020
+    INVALID_UPLOAD = 1024
+    NAME_TAKEN = 1025
+
+
+# Attempts at creating a note before giving up, as concurrent creates can
+# race for the same default name.
+CREATE_NOTE_ATTEMPTS = 3
+
+
+def get_selected_resources(
+    user: Accounts, selection: typing.List[typing.Tuple[int, str]]
+) -> typing.Optional[typing.List[typing.Union[Note, Folder]]]:
+    """
+    Load the notes and folders matching the (id, token) pairs of a selection
+    with one query per resource type. Returns None if any of them does not
+    exist or belongs to someone else.
+    """
+    selected = set(selection)
+    tokens = [item_token for _, item_token in selected]
+    resources = [
+        resource
+        for model in (Note, Folder)
+        for resource in model.objects.filter(user=user, token__in=tokens)
+        if (resource.id, resource.token) in selected
+    ]
+
+    if len(resources) != len(selected):
+        return None
+
+    return resources
 
 
 class TextEditorRoom(View):
@@ -129,10 +194,14 @@ class Home(View):
     text_editor_template = "home.html"
 
     def get(self, request: HttpRequest, folder_token: typing.Optional[str] = None):
+        after = parse_cursor(request.GET.get("after"))
+
         if not request.user.is_authenticated:
             user = AnonymousUser.from_request(request)
             folder = user.get_folder_by_token(folder_token) if folder_token else None
-            resources = user.get_resources_in_folder(folder, order_by="index")
+            page = get_anonymous_resource_page(
+                user.get_resources_in_folder(folder), after
+            )
             previous_folders = folder.get_folder_history() if folder else []
 
         else:
@@ -143,11 +212,7 @@ class Home(View):
             else:
                 folder = None
 
-            notes = Note.objects.filter(user=request.user, folder=folder)
-            folders = Folder.objects.filter(
-                user=request.user, folder=folder if folder else None
-            )
-            resources = sorted([*notes, *folders], key=lambda item: item.index)
+            page = get_resource_page(request.user, folder, after)
             previous_folders = get_folder_history(folder)
 
         meta_tags = generate_meta_tags(
@@ -158,7 +223,9 @@ class Home(View):
 
         context = {
             "meta_tags": meta_tags,
-            "resources": resources,
+            "resources": page.resources,
+            "resource_offset": page.offset,
+            "next_after": page.next_after,
             "current_folder": folder,
             "previous_folders": previous_folders,
         }
@@ -230,12 +297,15 @@ class SaveRoom(View):
                     ErrorCode.NOTE_NOT_FOUND,
                 )
 
-            if note.text_file:
-                path = note.text_file.name
-                upload_file_to_aws(path, file)
-            else:
-                note.text_file = file
-                note.save()
+            try:
+                text = file.read().decode("utf-8")
+            except UnicodeDecodeError:
+                return ApiErrorMessageAndCodeResponse(
+                    "The file must be UTF-8 text.",
+                    ErrorCode.INVALID_FORM,
+                )
+
+            buffer_note_text(note.pk, text)
 
             return ApiSuccessResponse("File saved successfully.")
         else:
@@ -291,6 +361,66 @@ class SaveCanvas(View):
         return ApiSuccessResponse("Canvas saved successfully.")
 
 
+class CreateCanvasUpload(View):
+    def post(self, request: HttpRequest, note_token: str):
+        try:
+            note = Note.objects.select_related("room").get(token=note_token)
+        except Note.DoesNotExist:
+            return ApiErrorMessageAndCodeResponse(
+                "Note not found.",
+                ErrorCode.NOTE_NOT_FOUND,
+            )
+
+        if not request.user == note.user and not note.room.is_editable:
+            return ApiErrorMessageAndCodeResponse(
+                "You do not have permission to save this canvas.",
+                ErrorCode.NO_EDIT_PERMISSION,
+                HTTPStatus.FORBIDDEN,
+            )
+
+        url, fields, upload = create_canvas_upload(note)
+
+        return ApiSuccessKwargsResponse(url=url, fields=fields, upload=upload)
+
+
+class CompleteCanvasUpload(View):
+    def post(self, request: HttpRequest, note_token: str):
+        form = CompleteCanvasUploadForm(request.POST)
+
+        if not form.is_valid():
+            return ApiErrorKwargsResponse(
+                status=HTTPStatus.BAD_REQUEST,
+                errors=form.errors,
+                message="Invalid form.",
+                code=ErrorCode.INVALID_FORM,
+            )
+
+        try:
+            note = Note.objects.select_related("room").get(token=note_token)
+        except Note.DoesNotExist:
+            return ApiErrorMessageAndCodeResponse(
+                "Note not found.",
+                ErrorCode.NOTE_NOT_FOUND,
+            )
+
+        if not request.user == note.user and not note.room.is_editable:
+            return ApiErrorMessageAndCodeResponse(
+                "You do not have permission to save this canvas.",
+                ErrorCode.NO_EDIT_PERMISSION,
+                HTTPStatus.FORBIDDEN,
+            )
+
+        try:
+            complete_canvas_upload(note, form.cleaned_data["upload"])
+        except CanvasUploadError as error:
+            return ApiErrorMessageAndCodeResponse(
+                str(error),
+                ErrorCode.INVALID_UPLOAD,
+            )
+
+        return ApiSuccessResponse("Canvas saved successfully.")
+
+
 class UpdatePermission(LoginRequiredMixin, View):
     def post(self, request: HttpRequest, room_id: int, permission: str):
         form = ChangePermissionForm(json.loads(request.body))
@@ -379,34 +509,26 @@ class CreateNote(View):
                         ErrorCode.FOLDER_NOT_FOUND,
                     )
 
-            user_notes = Note.objects.filter(user=request.user)
-            room = Room.objects.create(user=request.user, name=secrets.token_hex(16))
-            resource_count_in_folder = count_resources_in_folder(folder, request.user)
-
-            if user_notes:
-                for index in range(len(user_notes) + 1):
-                    if f"Note{str(index+1)}" not in user_notes.values_list(
-                        "name", flat=True
-                    ):
-                        note = Note(
+            for attempt in range(CREATE_NOTE_ATTEMPTS):
+                try:
+                    with transaction.atomic():
+                        lock_folders(request.user, folder)
+                        room = Room.objects.create(
+                            user=request.user, name=secrets.token_hex(16)
+                        )
+                        note = Note.objects.create(
                             user=request.user,
-                            name=f"Note{index+1}",
+                            name=Note.get_free_name(request.user),
                             room=room,
-                            index=resource_count_in_folder,
+                            folder=folder,
+                            index=get_next_index(folder, request.user),
                             canvas_file=Canvas.objects.create(),
                         )
-                        break
-            else:
-                note = Note(
-                    user=request.user,
-                    name="Note1",
-                    room=room,
-                    index=resource_count_in_folder,
-                    canvas_file=Canvas.objects.create(),
-                )
-
-            note.folder = folder
-            note.save()
+                except IntegrityError:
+                    if attempt == CREATE_NOTE_ATTEMPTS - 1:
+                        raise
+                else:
+                    break
 
             path = reverse("text_editor_room", args=[note.token, room.name])
 
@@ -437,38 +559,95 @@ class DeleteResource(View):
             except Folder.DoesNotExist:
                 return redirect("home")
 
-        if isinstance(item, Folder):
-            folders_to_delete = get_next_folders(item)
+        delete_resources([item])
 
-            for folder in folders_to_delete:
-                notes = Note.objects.filter(folder=folder)
+        return redirect("home")
 
-                for note in notes:
-                    remove_file_from_aws(note.text_file.name)
 
-                folder.delete()
-        else:
-            remove_file_from_aws(item.text_file.name)
+class BulkDeleteResource(View):
+    def post(self, request: HttpRequest):
+        form = ResourceSelectionForm(json.loads(request.body))
 
-        resources_with_higher_index_in_folder = list(
-            Note.objects.filter(
-                user=request.user, folder=item.folder, index__gt=item.index
+        if not form.is_valid():
+            return ApiErrorKwargsResponse(
+                status=HTTPStatus.BAD_REQUEST,
+                errors=form.errors,
+                message="Invalid form.",
+                code=ErrorCode.INVALID_FORM,
             )
-        ) + list(
-            Folder.objects.filter(
-                user=request.user,
-                folder=item.folder,
-                index__gt=item.index,
+
+        selection: typing.List[typing.Tuple[int, str]] = form.cleaned_data.get(
+            "resources"
+        )
+
+        if not request.user.is_authenticated:
+            user = AnonymousUser.from_request(request)
+
+            for item_id, item_token in selection:
+                resource = user.get_resource_by_id_and_token(item_id, item_token)
+
+                if resource is not None:
+                    resource.delete()
+
+            user.save(request.session)
+
+            return ApiSuccessKwargsResponse(message="Resources deleted successfully.")
+
+        resources = get_selected_resources(request.user, selection)
+
+        if resources is None:
+            return ApiErrorMessageAndCodeResponse(
+                "You are not allowed to remove some of these resources.",
+                ErrorCode.REMOVE_ITEM_NOT_ALLOWED,
+            )
+
+        delete_resources(resources)
+
+        return ApiSuccessKwargsResponse(message="Resources deleted successfully.")
+
+
+class ExportResources(View):
+    def post(self, request: HttpRequest):
+        form = ResourceSelectionForm(request.POST)
+
+        if not form.is_valid():
+            return ApiErrorKwargsResponse(
+                status=HTTPStatus.BAD_REQUEST,
+                errors=form.errors,
+                message="Invalid form.",
+                code=ErrorCode.INVALID_FORM,
             )
+
+        selection: typing.List[typing.Tuple[int, str]] = form.cleaned_data.get(
+            "resources"
         )
 
-        for resource in resources_with_higher_index_in_folder:
-            resource.index -= 1
-            resource.save()
+        if not request.user.is_authenticated:
+            user = AnonymousUser.from_request(request)
+            resources = [
+                user.get_resource_by_id_and_token(item_id, item_token)
+                for item_id, item_token in selection
+            ]
 
-        item.delete()
+            if None in resources:
+                raise Http404("Not found")
 
-        return redirect("home")
+            user.load_texts()
+            entries = get_anonymous_export_entries(resources)
+        else:
+            resources = get_selected_resources(request.user, selection)
+
+            if resources is None:
+                raise Http404("Not found")
+
+            entries = get_export_entries(resources)
+
+        response = StreamingHttpResponse(
+            stream_zip(entries), content_type="application/zip"
+        )
+        response["Content-Disposition"] = 'attachment; filename="noteboard.zip"'
+
+        return response
 
 
 class RenameResource(View):
@@ -500,8 +679,13 @@ class RenameResource(View):
                     "You are not allowed to rename this resource.",
                     ErrorCode.RENAME_ITEM_NOT_ALLOWED,
                 )
+            elif not user.rename_resource(resource, name):
+                return ApiErrorMessageAndCodeResponse(
+                    "Another note already has this name.",
+                    ErrorCode.NAME_TAKEN,
+                    HTTPStatus.CONFLICT,
+                )
             else:
-                resource.name = name
                 user.save(request.session)
 
                 return ApiSuccessKwargsResponse(
@@ -522,7 +706,16 @@ class RenameResource(View):
                 )
 
         item.name = name
-        item.save()
+
+        try:
+            with transaction.atomic():
+                item.save(update_fields=["name"])
+        except IntegrityError:
+            return ApiErrorMessageAndCodeResponse(
+                "Another note already has this name.",
+                ErrorCode.NAME_TAKEN,
+                HTTPStatus.CONFLICT,
+            )
 
         return ApiSuccessKwargsResponse(message="Resource renamed successfully.")
 
@@ -561,18 +754,14 @@ class CreateFolder(View):
             else:
                 parent_folder = None
 
-            resource_count_in_folder = count_resources_in_folder(
-                parent_folder, request.user
-            )
-
-            folder = Folder(
-                user=request.user,
-                name=name,
-                index=resource_count_in_folder,
-                folder=parent_folder,
-            )
-
-            folder.save()
+            with transaction.atomic():
+                lock_folders(request.user, parent_folder)
+                Folder.objects.create(
+                    user=request.user,
+                    name=name,
+                    index=get_next_index(parent_folder, request.user),
+                    folder=parent_folder,
+                )
 
             return ApiSuccessResponse("Folder created successfully.")
         else:
@@ -592,22 +781,7 @@ class TransferResource(View):
         moved_resource: typing.Union[AnonymousNote, AnonymousFolder],
         destination_folder: typing.Optional[AnonymousFolder],
     ):
-        resources_with_higher_index_in_source_folder = (
-            user.get_resources_with_index_gt_in_folder(
-                moved_resource.folder, moved_resource.index
-            )
-        )
-
-        resource_count_in_destination_folder = user.get_resource_count_in_folder(
-            destination_folder
-        )
-        moved_resource.folder = destination_folder
-        moved_resource.folder_id = destination_folder.id if destination_folder else None
-        moved_resource.index = resource_count_in_destination_folder
-
-        for resource in resources_with_higher_index_in_source_folder:
-            resource.index -= 1
-
+        user.move_resource(moved_resource, destination_folder)
         user.save(request.session)
 
         return ApiSuccessResponse(
@@ -624,29 +798,12 @@ class TransferResource(View):
         moved_resource: typing.Union[Note, Folder],
         destination_folder: typing.Optional[Folder],
     ):
-        resources_with_higher_index_in_source_folder = list(
-            Note.objects.filter(
-                folder=moved_resource.folder, index__gt=moved_resource.index
-            ).exclude(id=moved_resource.id)
-        ) + list(
-            Folder.objects.filter(
-                folder=moved_resource.folder if moved_resource.folder else None,
-                index__gt=moved_resource.index,
-            ).exclude(id=moved_resource.id)
-        )
-
-        moved_resource.folder = destination_folder
-
-        resource_count_in_destination_folder = count_resources_in_folder(
-            destination_folder, user
-        )
-        moved_resource.index = resource_count_in_destination_folder
-
-        for resource in resources_with_higher_index_in_source_folder:
-            resource.index -= 1
-            resource.save()
+        with transaction.atomic():
+            lock_folders(user, destination_folder)
 
-        moved_resource.save()
+            moved_resource.folder = destination_folder
+            moved_resource.index = get_next_index(destination_folder, user)
+            moved_resource.save(update_fields=["folder", "index"])
 
         return ApiSuccessResponse(
             {
@@ -765,7 +922,7 @@ class MoveResource(View):
             if moved_resource is None:
                 return resource_not_found_response
 
-            largest_index = len(user.get_resources_in_folder(moved_resource.folder)) - 1
+            largest_index = user.get_resource_count_in_folder(moved_resource.folder) - 1
             if largest_index < 0:
                 largest_index = 0
 
@@ -816,23 +973,7 @@ class MoveResource(View):
         if moved_resource.index == destination_index:
             return ApiSuccessResponse("Resource order changed successfully.")
 
-        parent_folder = moved_resource.folder
-
-        if moved_resource.index < destination_index:
-            range_start = moved_resource.index + 1
-            range_end = destination_index
-        else:
-            range_start = destination_index
-            range_end = moved_resource.index - 1
-
-        resources_to_update = user.get_resources_with_index_in_range_in_folder(
-            parent_folder, range_start, range_end
-        )
-        for resource in resources_to_update:
-            resource.index += 1 if moved_resource.index > destination_index else -1
-
-        moved_resource.index = destination_index
-
+        user.change_resource_index(moved_resource, destination_index)
         user.save(request.session)
 
         return ApiSuccessResponse("Resource order changed successfully.")
@@ -843,46 +984,27 @@ class MoveResource(View):
         moved_resource: typing.Union[Note, Folder],
         destination_index: int,
     ):
-        if moved_resource.index == destination_index:
-            return ApiSuccessResponse("Resource order changed successfully.")
-
         parent_folder = moved_resource.folder
 
-        largest_index = (
-            Note.objects.filter(folder=parent_folder, user=user).count()
-            + Folder.objects.filter(folder=parent_folder, user=user).count()
-        ) - 1
+        with transaction.atomic():
+            lock_folders(user, parent_folder)
+            moved_resource.refresh_from_db(fields=["index"])
 
-        if largest_index < 0:
-            largest_index = 0
+            if get_position(moved_resource, user) == destination_index:
+                return ApiSuccessResponse("Resource order changed successfully.")
 
-        if destination_index > largest_index:
-            return ApiErrorMessageAndCodeResponse(
-                "Invalid destination index.",
-                ErrorCode.CHANGE_ORDER_INVALID_DESTINATION,
-            )
+            largest_index = count_resources_in_folder(parent_folder, user) - 1
 
-        if moved_resource.index < destination_index:
-            range_start = moved_resource.index + 1
-            range_end = destination_index
-        else:
-            range_start = destination_index
-            range_end = moved_resource.index - 1
-
-        notes_to_update = Note.objects.filter(
-            folder=parent_folder, index__range=(range_start, range_end)
-        )
-        folders_to_update = Folder.objects.filter(
-            folder=parent_folder, index__range=(range_start, range_end)
-        )
-        resources_to_update = [*notes_to_update, *folders_to_update]
+            if largest_index < 0:
+                largest_index = 0
 
-        for resource in resources_to_update:
-            resource.index += 1 if moved_resource.index > destination_index else -1
-            resource.save()
+            if destination_index > largest_index:
+                return ApiErrorMessageAndCodeResponse(
+                    "Invalid destination index.",
+                    ErrorCode.CHANGE_ORDER_INVALID_DESTINATION,
+                )
 
-        moved_resource.index = destination_index
-        moved_resource.save()
+            move_to_position(moved_resource, destination_index, user)
 
         return ApiSuccessResponse("Resource order changed successfully.")
 
@@ -915,6 +1037,9 @@ class GetNoteText(View):
 
 
 class GetNoteCanvas(View):
+    chunk_size = 64 * 1024
+    range_pattern = re.compile(r"^bytes=(\d+-\d*|-\d+)$")
+
     def get(self, request: HttpRequest, note_token: str):
         try:
             note = Note.objects.get(token=note_token)
@@ -937,10 +1062,80 @@ class GetNoteCanvas(View):
                 ErrorCode.NOTE_NOT_FOUND,
             )
 
-        file = download_file_from_aws(note.canvas_file.file)
-        bytes = file.read()
+        parameters = {}
+
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            parameters["IfNoneMatch"] = if_none_match
+
+        byte_range = request.headers.get("Range")
+        if byte_range and self.range_pattern.match(byte_range):
+            parameters["Range"] = byte_range
+
+        try:
+            s3_object = get_object_from_aws(note.canvas_file.file, **parameters)
+        except ClientError as error:
+            metadata = error.response.get("ResponseMetadata", {})
+            status = metadata.get("HTTPStatusCode")
+
+            if status == HTTPStatus.NOT_MODIFIED:
+                response = HttpResponseNotModified()
+                response["ETag"] = metadata.get("HTTPHeaders", {}).get(
+                    "etag", if_none_match
+                )
+                return response
+
+            if status == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+                return HttpResponse(status=HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+
+            raise
+
+        response = StreamingHttpResponse(
+            iter_object_body(s3_object["Body"], self.chunk_size),
+            content_type="image/png",
+            status=(
+                HTTPStatus.PARTIAL_CONTENT
+                if "ContentRange" in s3_object
+                else HTTPStatus.OK
+            ),
+        )
+        response["Content-Length"] = s3_object["ContentLength"]
+        response["ETag"] = s3_object["ETag"]
+        response["Accept-Ranges"] = "bytes"
+        response["Cache-Control"] = "private, no-cache"
+
+        if "ContentRange" in s3_object:
+            response["Content-Range"] = s3_object["ContentRange"]
+
+        return response
+
+
+class GetNoteCanvasUrl(View):
+    def get(self, request: HttpRequest, note_token: str):
+        try:
+            note = Note.objects.select_related("room", "canvas_file").get(
+                token=note_token
+            )
+        except Note.DoesNotExist:
+            return ApiErrorMessageAndCodeResponse(
+                "Note not found.",
+                ErrorCode.NOTE_NOT_FOUND,
+            )
+
+        if not request.user == note.user and not note.room.is_public:
+            return ApiErrorMessageAndCodeResponse(
+                "You do not have permission to view this canvas.",
+                ErrorCode.NO_EDIT_PERMISSION,
+                HTTPStatus.FORBIDDEN,
+            )
+
+        if not note.canvas_file.file:
+            return ApiErrorMessageAndCodeResponse(
+                "Canvas not found.",
+                ErrorCode.NOTE_NOT_FOUND,
+            )
 
-        return HttpResponse(bytes, content_type="image/png")
+        return ApiSuccessKwargsResponse(url=get_canvas_url(note))
 
 
 class UpdateCanvasBackground(View):
@@ -0,0 +1,34 @@
+from importlib import import_module
+
+from django.conf import settings
+
+from texteditor.models import AnonymousNoteText
+
+BATCH_SIZE = 1000
+
+
+def clear_anonymous_note_texts(batch_size: int = BATCH_SIZE) -> int:
+    """
+    Delete the anonymous note texts of sessions that no longer exist, and
+    return the number of sessions cleared. Run it after `clearsessions`, so
+    that expired sessions are gone.
+    """
+    session_store = import_module(settings.SESSION_ENGINE).SessionStore()
+    session_keys = (
+        AnonymousNoteText.objects.order_by("session_key")
+        .values_list("session_key", flat=True)
+        .distinct()
+    )
+    cleared = 0
+    after = ""
+
+    while True:
+        batch = list(session_keys.filter(session_key__gt=after)[:batch_size])
+
+        if not batch:
+            return cleared
+
+        expired = [key for key in batch if not session_store.exists(key)]
+        AnonymousNoteText.objects.filter(session_key__in=expired).delete()
+        cleared += len(expired)
+        after = batch[-1]
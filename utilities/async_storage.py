@@ -0,0 +1,282 @@
+import abc
+import asyncio
+import contextlib
+import hashlib
+import re
+import typing
+
+from asgiref.sync import sync_to_async
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.utils.module_loading import import_string
+from storages.utils import clean_name
+
+from texteditor.storage import get_private_media_storage
+from utilities.aws import get_object_from_aws, put_object_to_aws
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+except ImportError:
+    AioConfig = get_session = None
+
+CHUNK_SIZE = 64 * 1024
+
+
+class AsyncObjectStorage(abc.ABC):
+    """
+    Non-blocking access to the objects of the private media storage, for
+    async views. Objects are addressed by the same names as the FileFields
+    use, and `get_object` returns the same mapping as boto3's GetObject,
+    except that its "Body" is read with `aiter_object_body`.
+    """
+
+    @abc.abstractmethod
+    async def get_object(self, name: str, **parameters) -> typing.Dict:
+        pass
+
+    @abc.abstractmethod
+    async def put_object(self, name: str, body: bytes, **parameters) -> None:
+        pass
+
+    async def read(self, name: str) -> bytes:
+        s3_object = await self.get_object(name)
+
+        return b"".join([chunk async for chunk in aiter_object_body(s3_object["Body"])])
+
+    async def close(self) -> None:
+        pass
+
+
+async def aiter_object_body(
+    body, chunk_size: int = CHUNK_SIZE
+) -> typing.AsyncIterator[bytes]:
+    try:
+        async for chunk in body.iter_chunks(chunk_size):
+            yield chunk
+    finally:
+        body.close()
+
+
+def get_write_parameters(name: str, content=None) -> typing.Dict:
+    """
+    Return the metadata (ContentType, AWS_S3_OBJECT_PARAMETERS, ACL) the
+    synchronous storage writes `content` with, so that objects put through
+    the async storage are stored the same way.
+    """
+    return get_private_media_storage()._get_write_parameters(name, content)
+
+
+def _get_key(name: str) -> str:
+    return get_private_media_storage()._normalize_name(clean_name(str(name)))
+
+
+class AioBotocoreObjectStorage(AsyncObjectStorage):
+    """
+    Storage backed by aiobotocore, with one client (and connection pool)
+    per event loop, configured like the synchronous one.
+    """
+
+    def __init__(self):
+        if get_session is None:
+            raise ImportError("aiobotocore is required for this storage.")
+
+        self._clients: typing.Dict[asyncio.AbstractEventLoop, typing.Any] = {}
+        self._exit_stacks: typing.Dict[
+            asyncio.AbstractEventLoop, contextlib.AsyncExitStack
+        ] = {}
+
+    async def _get_client(self):
+        loop = asyncio.get_running_loop()
+
+        if loop not in self._clients:
+            storage = get_private_media_storage()
+            exit_stack = contextlib.AsyncExitStack()
+            client = await exit_stack.enter_async_context(
+                get_session().create_client(
+                    "s3",
+                    region_name=storage.region_name,
+                    endpoint_url=storage.endpoint_url,
+                    use_ssl=storage.use_ssl,
+                    verify=storage.verify,
+                    aws_access_key_id=storage.access_key,
+                    aws_secret_access_key=storage.secret_key,
+                    aws_session_token=storage.security_token,
+                    config=AioConfig(
+                        s3={"addressing_style": storage.addressing_style},
+                        signature_version=storage.signature_version,
+                        max_pool_connections=settings.AWS_S3_MAX_POOL_CONNECTIONS,
+                        retries={
+                            "max_attempts": settings.AWS_S3_MAX_ATTEMPTS,
+                            "mode": settings.AWS_S3_RETRY_MODE,
+                        },
+                        connect_timeout=settings.AWS_S3_CONNECT_TIMEOUT,
+                        read_timeout=settings.AWS_S3_READ_TIMEOUT,
+                    ),
+                )
+            )
+            self._clients[loop] = client
+            self._exit_stacks[loop] = exit_stack
+
+        return self._clients[loop]
+
+    async def get_object(self, name: str, **parameters) -> typing.Dict:
+        client = await self._get_client()
+
+        return await client.get_object(
+            Bucket=get_private_media_storage().bucket_name,
+            Key=_get_key(name),
+            **parameters,
+        )
+
+    async def put_object(self, name: str, body: bytes, **parameters) -> None:
+        client = await self._get_client()
+
+        await client.put_object(
+            Bucket=get_private_media_storage().bucket_name,
+            Key=_get_key(name),
+            Body=body,
+            **parameters,
+        )
+
+    async def close(self) -> None:
+        loop = asyncio.get_running_loop()
+        exit_stack = self._exit_stacks.pop(loop, None)
+        self._clients.pop(loop, None)
+
+        if exit_stack is not None:
+            await exit_stack.aclose()
+
+
+class _ThreadedBody:
+    def __init__(self, body):
+        self._body = body
+
+    async def iter_chunks(self, chunk_size: int) -> typing.AsyncIterator[bytes]:
+        read = sync_to_async(self._body.read, thread_sensitive=False)
+
+        while True:
+            chunk = await read(chunk_size)
+
+            if not chunk:
+                return
+
+            yield chunk
+
+    def close(self) -> None:
+        self._body.close()
+
+
+class ThreadedObjectStorage(AsyncObjectStorage):
+    """
+    Opt-in alternative to aiobotocore: runs the synchronous client in the
+    default thread pool rather than in the thread shared by the synchronous
+    parts of Django, so slow calls do not queue behind each other. Each call
+    still holds a thread while it waits.
+    """
+
+    async def get_object(self, name: str, **parameters) -> typing.Dict:
+        s3_object = await sync_to_async(get_object_from_aws, thread_sensitive=False)(
+            name, **parameters
+        )
+
+        return {**s3_object, "Body": _ThreadedBody(s3_object["Body"])}
+
+    async def put_object(self, name: str, body: bytes, **parameters) -> None:
+        await sync_to_async(put_object_to_aws, thread_sensitive=False)(
+            name, body, **parameters
+        )
+
+
+class _MemoryBody:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    async def iter_chunks(self, chunk_size: int) -> typing.AsyncIterator[bytes]:
+        for start in range(0, len(self._data), chunk_size):
+            yield self._data[start : start + chunk_size]
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryObjectStorage(AsyncObjectStorage):
+    """
+    In-memory stand-in for local development and tests. It answers like S3
+    for the parameters the views use (Range and IfNoneMatch), including the
+    errors raised for missing objects, unmodified objects and unsatisfiable
+    ranges.
+    """
+
+    range_pattern = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+    def __init__(self):
+        self.objects: typing.Dict[str, typing.Tuple[bytes, typing.Dict]] = {}
+
+    async def get_object(self, name: str, **parameters) -> typing.Dict:
+        if name not in self.objects:
+            raise _client_error(404, "NoSuchKey", "GetObject")
+
+        data, metadata = self.objects[name]
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+
+        if parameters.get("IfNoneMatch") == etag:
+            raise _client_error(304, "304", "GetObject", etag=etag)
+
+        s3_object = {**metadata, "ETag": etag}
+        byte_range = parameters.get("Range")
+
+        if byte_range:
+            start, end = self.range_pattern.match(byte_range).groups()
+
+            if start:
+                start, end = int(start), min(int(end or len(data) - 1), len(data) - 1)
+            else:
+                start, end = max(len(data) - int(end), 0), len(data) - 1
+
+            if start >= len(data) or start > end:
+                raise _client_error(416, "InvalidRange", "GetObject")
+
+            s3_object["ContentRange"] = f"bytes {start}-{end}/{len(data)}"
+            data = data[start : end + 1]
+
+        return {**s3_object, "ContentLength": len(data), "Body": _MemoryBody(data)}
+
+    async def put_object(self, name: str, body: bytes, **parameters) -> None:
+        self.objects[name] = (bytes(body), parameters)
+
+
+def _client_error(status: int, code: str, operation: str, **headers) -> ClientError:
+    return ClientError(
+        {
+            "Error": {"Code": code},
+            "ResponseMetadata": {"HTTPStatusCode": status, "HTTPHeaders": headers},
+        },
+        operation,
+    )
+
+
+_storage: typing.Optional[AsyncObjectStorage] = None
+
+
+def get_async_object_storage() -> AsyncObjectStorage:
+    """
+    Return the process-wide async storage: the class named by the
+    ASYNC_OBJECT_STORAGE setting, or aiobotocore by default.
+    """
+    global _storage
+
+    if _storage is None:
+        if settings.ASYNC_OBJECT_STORAGE:
+            storage_class = import_string(settings.ASYNC_OBJECT_STORAGE)
+        else:
+            storage_class = AioBotocoreObjectStorage
+
+        _storage = storage_class()
+
+    return _storage
+
+
+async def close_async_object_storage() -> None:
+    if _storage is not None:
+        await _storage.close()
@@ -1,23 +1,140 @@
+import logging
 
-from texteditor.storage import PrivateMediaStorage
+from storages.utils import clean_name
+
+from texteditor.storage import get_private_media_storage
+
+logger = logging.getLogger(__name__)
 
 
 def upload_file_to_aws(full_filename, file):
-    media_storage = PrivateMediaStorage()
+    media_storage = get_private_media_storage()
     media_storage.save(full_filename, file)
 
 
 def remove_file_from_aws(source):
-    media_storage = PrivateMediaStorage()
+    media_storage = get_private_media_storage()
     try:
         media_storage.delete(f"{source}")
         return True
-    except Exception as e:
-        print(str(e))
+    except Exception:
+        logger.exception("Failed to remove %s from S3", source)
         return False
 
 
+def remove_files_from_aws(sources, batch_size=1000):
+    """
+    Delete many files with as few DeleteObjects calls as possible. Returns a
+    mapping of the files S3 did not delete to the reported error.
+    """
+    media_storage = get_private_media_storage()
+    client = media_storage.client
+    keys = {
+        media_storage._normalize_name(clean_name(str(source))): str(source)
+        for source in sources
+    }
+    key_list = list(keys)
+    failed = {}
+
+    for start in range(0, len(key_list), batch_size):
+        batch = key_list[start : start + batch_size]
+
+        try:
+            response = client.delete_objects(
+                Bucket=media_storage.bucket_name,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+        except Exception as e:
+            logger.exception("Failed to remove %d files from S3", len(batch))
+            failed.update({keys[key]: str(e) for key in batch})
+            continue
+
+        for error in response.get("Errors", []):
+            failed[keys[error["Key"]]] = error.get("Message", error.get("Code", ""))
+
+    return failed
+
+
 def download_file_from_aws(source):
 
-    with PrivateMediaStorage().open(str(source)) as s3_file:
+    with get_private_media_storage().open(str(source)) as s3_file:
         return s3_file
+
+
+def get_object_from_aws(source, **parameters):
+    """
+    Issue a raw GetObject call for the file and return the response without
+    reading its body, so that callers can stream it. Extra parameters (e.g.
+    Range or IfNoneMatch) are passed through to S3 as-is.
+    """
+    media_storage = get_private_media_storage()
+    key = media_storage._normalize_name(clean_name(str(source)))
+
+    return media_storage.client.get_object(
+        Bucket=media_storage.bucket_name, Key=key, **parameters
+    )
+
+
+def put_object_to_aws(source, body, **parameters):
+    """
+    Issue a raw PutObject call, so that callers control the object metadata
+    (e.g. ContentEncoding). Extra parameters are passed through to S3 as-is.
+    """
+    media_storage = get_private_media_storage()
+    key = media_storage._normalize_name(clean_name(str(source)))
+
+    return media_storage.client.put_object(
+        Bucket=media_storage.bucket_name, Key=key, Body=body, **parameters
+    )
+
+
+def head_object_from_aws(source):
+    """
+    Issue a raw HeadObject call and return the object metadata.
+    """
+    media_storage = get_private_media_storage()
+    key = media_storage._normalize_name(clean_name(str(source)))
+
+    return media_storage.client.head_object(Bucket=media_storage.bucket_name, Key=key)
+
+
+def generate_presigned_url(source, client_method, expires_in, **parameters):
+    """
+    Return a URL granting `client_method` (e.g. "get_object" or
+    "put_object") on the file to whoever holds it, for `expires_in` seconds.
+    Extra parameters are signed along, so the request must match them.
+    """
+    media_storage = get_private_media_storage()
+    key = media_storage._normalize_name(clean_name(str(source)))
+
+    return media_storage.client.generate_presigned_url(
+        client_method,
+        Params={"Bucket": media_storage.bucket_name, "Key": key, **parameters},
+        ExpiresIn=expires_in,
+    )
+
+
+def generate_presigned_post(source, expires_in, fields=None, conditions=None):
+    """
+    Return the URL and form fields of an HTML form upload of the file, valid
+    for `expires_in` seconds. Unlike a presigned PUT, `conditions` (e.g.
+    ["content-length-range", 0, size]) are enforced by the storage itself.
+    """
+    media_storage = get_private_media_storage()
+    key = media_storage._normalize_name(clean_name(str(source)))
+    post = media_storage.client.generate_presigned_post(
+        media_storage.bucket_name,
+        key,
+        Fields=fields,
+        Conditions=conditions,
+        ExpiresIn=expires_in,
+    )
+
+    return post["url"], post["fields"]
+
+
+def iter_object_body(body, chunk_size=64 * 1024):
+    try:
+        yield from body.iter_chunks(chunk_size)
+    finally:
+        body.close()
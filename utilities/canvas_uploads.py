@@ -0,0 +1,123 @@
+import datetime
+import typing
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from texteditor.models import Canvas, Note, StorageDeletion, generate_file_name
+from utilities.aws import (
+    generate_presigned_post,
+    generate_presigned_url,
+    head_object_from_aws,
+)
+from utilities.storage_deletions import enqueue_storage_deletions
+
+SALT = "canvas-upload"
+# Extra time given to complete an upload once its URL has expired.
+COMPLETION_GRACE = 60
+# Share of its lifetime a download URL is served from the cache, so that the
+# browser keeps requesting the same URL and can revalidate it with its ETag.
+DOWNLOAD_URL_CACHE_SHARE = 0.75
+
+
+class CanvasUploadError(ValueError):
+    pass
+
+
+def create_canvas_upload(
+    note: Note,
+) -> typing.Tuple[str, typing.Dict[str, str], str]:
+    """
+    Return a presigned URL and form fields the browser can POST a new canvas
+    PNG to, and the signed token to pass to `complete_canvas_upload`
+    afterwards. Storage rejects files larger than CANVAS_MAX_SIZE.
+
+    Every upload goes to a new file, which is queued for deletion right away
+    with a delay: completing the upload cancels the deletion, so abandoned
+    uploads are cleaned up by the outbox worker.
+    """
+    name = generate_file_name(note)
+    expires_in = settings.CANVAS_URL_EXPIRY
+    StorageDeletion.objects.create(
+        name=name,
+        next_attempt=timezone.now()
+        + datetime.timedelta(seconds=expires_in + 2 * COMPLETION_GRACE),
+    )
+    url, fields = generate_presigned_post(
+        name,
+        expires_in,
+        fields={"Content-Type": "image/png"},
+        conditions=[
+            {"Content-Type": "image/png"},
+            ["content-length-range", 0, settings.CANVAS_MAX_SIZE],
+        ],
+    )
+
+    return url, fields, signing.dumps({"note": note.pk, "name": name}, salt=SALT)
+
+
+def complete_canvas_upload(note: Note, upload: str) -> None:
+    """
+    Point the canvas of `note` at an uploaded file and queue the previous
+    file for deletion. Each upload can only be completed once.
+    """
+    try:
+        data = signing.loads(
+            upload, salt=SALT, max_age=settings.CANVAS_URL_EXPIRY + COMPLETION_GRACE
+        )
+    except signing.BadSignature:
+        raise CanvasUploadError("Invalid or expired upload.")
+
+    if data["note"] != note.pk:
+        raise CanvasUploadError("Invalid or expired upload.")
+
+    try:
+        size = head_object_from_aws(data["name"])["ContentLength"]
+    except Exception:
+        raise CanvasUploadError("The file was not uploaded.")
+
+    if size > settings.CANVAS_MAX_SIZE:
+        raise CanvasUploadError("The file is too large.")
+
+    with transaction.atomic():
+        # Fails if the upload was already completed, or if the worker is
+        # removing the file (then waits for it to finish first).
+        if not StorageDeletion.objects.filter(name=data["name"]).delete()[0]:
+            raise CanvasUploadError("Invalid or expired upload.")
+
+        canvas = Canvas.objects.select_for_update().get(pk=note.canvas_file_id)
+        enqueue_storage_deletions([canvas.file.name])
+        canvas.file.name = data["name"]
+        canvas.save(update_fields=["file"])
+
+
+def get_canvas_url(note: Note) -> str:
+    """
+    Return a presigned URL to download the canvas of `note` from storage.
+
+    The URL is cached per file for most of its lifetime. Every upload goes to
+    a new file, so a cached URL never points at an outdated canvas.
+    """
+    name = note.canvas_file.file.name
+    cache = caches[settings.CANVAS_URL_CACHE_ALIAS]
+    key = f"canvas-url:{name}"
+    url = cache.get(key)
+
+    if url is None:
+        url = generate_presigned_url(
+            name,
+            "get_object",
+            settings.CANVAS_URL_EXPIRY,
+            ResponseContentType="image/png",
+            ResponseCacheControl="private, no-cache",
+        )
+        cache.set(
+            key,
+            url,
+            timeout=int(settings.CANVAS_URL_EXPIRY * DOWNLOAD_URL_CACHE_SHARE),
+        )
+
+    return url
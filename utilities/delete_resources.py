@@ -0,0 +1,42 @@
+import typing
+
+from django.db import transaction
+
+from texteditor.models import Canvas, Folder, Note
+from utilities.folder_history import get_subtree
+from utilities.storage_deletions import enqueue_storage_deletions
+
+
+def delete_resources(resources: typing.Iterable[typing.Union[Note, Folder]]) -> None:
+    """
+    Delete notes and folders (with everything inside them) in one transaction.
+
+    The text and canvas files of the deleted notes are queued in the storage
+    deletion outbox within the same transaction and removed from S3 by the
+    background worker. Sibling indexes are sparse sort keys, so the remaining
+    resources need no reindexing.
+    """
+    resources = list(resources)
+    folders = [resource for resource in resources if isinstance(resource, Folder)]
+    note_ids = {resource.id for resource in resources if isinstance(resource, Note)}
+
+    with transaction.atomic():
+        subtree = get_subtree(*folders)
+        note_ids.update(subtree.note_ids)
+
+        files = list(
+            Note.objects.filter(id__in=note_ids).values_list(
+                "text_file", "canvas_file_id", "canvas_file__file"
+            )
+        )
+        canvas_ids = [canvas_id for _, canvas_id, _ in files]
+
+        enqueue_storage_deletions(
+            name
+            for text_file, _, canvas_file in files
+            for name in (text_file, canvas_file)
+        )
+
+        Note.objects.filter(id__in=note_ids).delete()
+        Canvas.objects.filter(id__in=canvas_ids).delete()
+        Folder.objects.filter(id__in=subtree.folder_ids).delete()
@@ -0,0 +1,336 @@
+import collections
+import dataclasses
+import logging
+import typing
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+from texteditor.anonymous import Note as AnonymousNote
+from texteditor.models import Folder, Note
+from utilities.aws import get_object_from_aws, iter_object_body
+from utilities.folder_history import get_subtree
+from utilities.text_blobs import is_text_blob_name, iter_decompressed_text
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class ExportEntry:
+    path: str
+    open: typing.Optional[typing.Callable[[], typing.Iterable[bytes]]] = None
+    compress: bool = True
+
+    @property
+    def is_directory(self) -> bool:
+        return self.open is None
+
+
+class _ZipOutput:
+    """
+    Write-only, unseekable sink for `zipfile`. Whatever the archive writes is
+    buffered until the streaming generator collects it with `pop`.
+    """
+
+    def __init__(self):
+        self._chunks: typing.List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(
+    entries: typing.Iterable[ExportEntry],
+    workers: typing.Optional[int] = None,
+) -> typing.Iterator[bytes]:
+    """
+    Build a ZIP archive on the fly and yield it chunk by chunk.
+
+    Up to `workers` entries are opened ahead of time on a thread pool, so the
+    S3 round trips overlap, while file contents are still copied into the
+    archive one chunk at a time and never held in memory as a whole.
+
+    A file that cannot be opened is replaced by an "<path>.error.txt" entry
+    saying so, rather than silently left out. An error while a file is being
+    copied fails the stream. Files opened ahead of time are closed if the
+    client goes away before they are written.
+    """
+    workers = workers or settings.EXPORT_WORKERS
+    entries = iter(entries)
+    pending = collections.deque()
+    output = _ZipOutput()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            yield from _write_zip(entries, pending, output, executor, workers)
+        finally:
+            for _, future in pending:
+                if future is not None and not future.cancel():
+                    future.add_done_callback(_close_opened_entry)
+
+    yield output.pop()
+
+
+def _write_zip(
+    entries: typing.Iterator[ExportEntry],
+    pending: typing.Deque,
+    output: "_ZipOutput",
+    executor: ThreadPoolExecutor,
+    workers: int,
+) -> typing.Iterator[bytes]:
+    def prefetch():
+        while len(pending) < workers:
+            entry = next(entries, None)
+
+            if entry is None:
+                return
+
+            future = None if entry.is_directory else executor.submit(entry.open)
+            pending.append((entry, future))
+
+    with zipfile.ZipFile(output, mode="w") as archive:
+        prefetch()
+
+        while pending:
+            entry, future = pending.popleft()
+            prefetch()
+
+            if future is None:
+                archive.writestr(f"{entry.path}/", b"")
+                continue
+
+            try:
+                chunks = future.result()
+            except Exception:
+                logger.exception("Failed to export %s", entry.path)
+                archive.writestr(
+                    f"{entry.path}.error.txt",
+                    f"{entry.path} could not be exported.\n",
+                )
+                yield output.pop()
+                continue
+
+            info = zipfile.ZipInfo(entry.path)
+            info.compress_type = (
+                zipfile.ZIP_DEFLATED if entry.compress else zipfile.ZIP_STORED
+            )
+
+            try:
+                with archive.open(info, mode="w") as destination:
+                    for chunk in chunks:
+                        destination.write(chunk)
+                        yield output.pop()
+            finally:
+                _close_entry_chunks(chunks)
+
+            yield output.pop()
+
+
+def _close_entry_chunks(chunks: typing.Iterable[bytes]) -> None:
+    close = getattr(chunks, "close", None)
+
+    if close is not None:
+        close()
+
+
+def _close_opened_entry(future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        _close_entry_chunks(future.result())
+
+
+class _ObjectChunks:
+    """
+    Content of a storage object, read chunk by chunk. The object is fetched
+    when created and holds its connection until read to the end or closed.
+    """
+
+    def __init__(self, name: str):
+        self._body = get_object_from_aws(name)["Body"]
+        self._decompress = is_text_blob_name(name)
+
+    def __iter__(self) -> typing.Iterator[bytes]:
+        chunks = iter_object_body(self._body)
+
+        return iter_decompressed_text(chunks) if self._decompress else chunks
+
+    def close(self) -> None:
+        self._body.close()
+
+
+def _open_file(name: str) -> typing.Callable[[], typing.Iterable[bytes]]:
+    def open_file():
+        return _ObjectChunks(name)
+
+    return open_file
+
+
+def _open_note_text(note_id: int) -> typing.Callable[[], typing.Iterable[bytes]]:
+    """
+    Open the text of a note kept in the database. It is only loaded when the
+    entry is written, and read through `Note.get_text` in case it was flushed
+    to storage since the entries were listed.
+    """
+
+    def open_text():
+        try:
+            return [Note.objects.get(pk=note_id).get_text().encode("utf-8")]
+        finally:
+            # Runs on a pool thread, which would otherwise keep its connection.
+            connections.close_all()
+
+    return open_text
+
+
+def _open_text(text: str) -> typing.Callable[[], typing.Iterable[bytes]]:
+    def open_text():
+        return [text.encode("utf-8")]
+
+    return open_text
+
+
+class _PathAllocator:
+    def __init__(self):
+        self._taken: typing.Set[str] = set()
+
+    def allocate(self, directory: str, name: str, extension: str = "") -> str:
+        name = name.replace("/", "_").replace("\\", "_").strip() or "Untitled"
+        prefix = f"{directory}/" if directory else ""
+        path = f"{prefix}{name}{extension}"
+        copy = 1
+
+        while path.lower() in self._taken:
+            copy += 1
+            path = f"{prefix}{name} ({copy}){extension}"
+
+        self._taken.add(path.lower())
+
+        return path
+
+
+def get_export_entries(
+    resources: typing.Iterable[typing.Union[Note, Folder]],
+) -> typing.List[ExportEntry]:
+    """
+    Resolve the selected notes and folders (with their whole subtrees) into
+    archive entries, keeping the folder structure below each selected folder.
+    Only names and flags are loaded here; text is read entry by entry while
+    the archive is written.
+    """
+    resources = list(resources)
+    selected_folders = [
+        resource for resource in resources if isinstance(resource, Folder)
+    ]
+    selected_note_ids = [
+        resource.id for resource in resources if isinstance(resource, Note)
+    ]
+
+    subtree = get_subtree(*selected_folders)
+    folders = {
+        folder["id"]: folder
+        for folder in Folder.objects.filter(id__in=subtree.folder_ids).values(
+            "id", "name", "folder_id"
+        )
+    }
+    notes = Note.objects.filter(id__in={*selected_note_ids, *subtree.note_ids}).values(
+        "id",
+        "name",
+        "folder_id",
+        "text_file",
+        "pending_text__pk",
+        "inline_text__pk",
+        "canvas_file__file",
+    )
+
+    paths = _PathAllocator()
+    folder_paths: typing.Dict[int, str] = {}
+    entries = []
+
+    def get_folder_path(folder_id: typing.Optional[int]) -> str:
+        if folder_id not in folders:
+            return ""
+
+        if folder_id not in folder_paths:
+            folder = folders[folder_id]
+            folder_paths[folder_id] = paths.allocate(
+                get_folder_path(folder["folder_id"]), folder["name"]
+            )
+            entries.append(ExportEntry(folder_paths[folder_id]))
+
+        return folder_paths[folder_id]
+
+    for folder_id in subtree.folder_ids:
+        get_folder_path(folder_id)
+
+    for note in notes.order_by("folder_id", "index"):
+        directory = get_folder_path(note["folder_id"])
+
+        if note["pending_text__pk"] is not None or note["inline_text__pk"] is not None:
+            open_text = _open_note_text(note["id"])
+        elif note["text_file"]:
+            open_text = _open_file(note["text_file"])
+        else:
+            open_text = _open_text("")
+
+        entries.append(
+            ExportEntry(paths.allocate(directory, note["name"], ".txt"), open_text)
+        )
+
+        if note["canvas_file__file"]:
+            entries.append(
+                ExportEntry(
+                    paths.allocate(directory, note["name"], ".png"),
+                    _open_file(note["canvas_file__file"]),
+                    compress=False,
+                )
+            )
+
+    return entries
+
+
+def get_anonymous_export_entries(resources) -> typing.List[ExportEntry]:
+    """
+    Same as `get_export_entries`, for the in-memory workspace of an anonymous
+    user.
+    """
+    paths = _PathAllocator()
+    entries = []
+    visited = set()
+
+    def add(resource, directory: str) -> None:
+        if id(resource) in visited:
+            return
+
+        visited.add(id(resource))
+
+        if isinstance(resource, AnonymousNote):
+            entries.append(
+                ExportEntry(
+                    paths.allocate(directory, resource.name, ".txt"),
+                    _open_text(resource.get_text()),
+                )
+            )
+            return
+
+        path = paths.allocate(directory, resource.name)
+        entries.append(ExportEntry(path))
+
+        for child in sorted(
+            [*resource.folders, *resource.notes], key=lambda child: child.index
+        ):
+            add(child, path)
+
+    for resource in resources:
+        add(resource, "")
+
+    return entries
@@ -1,39 +1,113 @@
-from texteditor.models import Folder
+import dataclasses
+import typing
 
+from django.db import connection
 
-def get_folder_history(folder, only_public=False, with_current_folder=False):
-    previous_folders = list()
-    prev_folder = folder
+from texteditor.models import Folder, Note
 
-    if not with_current_folder:
-        prev_folder = folder.folder if folder else None
 
-    while prev_folder:
-        previous_folders.insert(0, prev_folder)
-        if only_public:
-            if prev_folder.folder and prev_folder.folder.is_public:
-                prev_folder = prev_folder.folder
-            else:
-                prev_folder = None
-        else:
-            prev_folder = prev_folder.folder
+@dataclasses.dataclass
+class FolderSubtree:
+    folder_ids: typing.List[int]
+    note_ids: typing.List[int]
+
+
+def get_ancestors(folder: Folder) -> typing.List[Folder]:
+    """
+    Return the ancestors of `folder`, root first, using a single recursive
+    query.
+
+    The result is memoized on every folder in the chain and the `folder`
+    relations along it are pre-populated, so later lookups within the same
+    request (including `folder.folder.folder` traversals) do not hit the
+    database again.
+    """
+    ancestors = getattr(folder, "_ancestors", None)
+
+    if ancestors is not None:
+        return ancestors
+
+    if folder.folder_id is None:
+        ancestors = []
+    else:
+        table = connection.ops.quote_name(Folder._meta.db_table)
+        query = f"""
+            WITH RECURSIVE ancestors(id, depth) AS (
+                SELECT CAST(%s AS BIGINT), 0
+                UNION ALL
+                SELECT parent.folder_id, ancestors.depth + 1 FROM {table} parent
+                INNER JOIN ancestors ON parent.id = ancestors.id
+                WHERE parent.folder_id IS NOT NULL
+            )
+            SELECT folder.* FROM {table} folder
+            INNER JOIN ancestors ON folder.id = ancestors.id
+            ORDER BY ancestors.depth DESC
+        """
+        ancestors = list(Folder.objects.raw(query, [folder.folder_id]))
+
+    chain = [*ancestors, folder]
+
+    for depth, ancestor in enumerate(chain):
+        if depth > 0:
+            ancestor.folder = chain[depth - 1]
+
+        ancestor._ancestors = chain[:depth]
+
+    return ancestors
+
+
+def get_folder_history(folder, with_current_folder=False):
+    if folder is None:
+        return []
+
+    previous_folders = list(get_ancestors(folder))
+
+    if with_current_folder:
+        previous_folders.append(folder)
 
     return previous_folders
 
 
-def get_next_folders(folder, only_public=False):
-    next_folders = list()
-    current_folders = Folder.objects.filter(folder=folder)
-
-    while current_folders:
-        next_folders.extend(current_folders)
-        temp_folders = [*current_folders]
-        current_folders.clear()
-        for folder in temp_folders:
-            if only_public:
-                temp_folder = Folder.objects.filter(folder=folder, is_public=True)
-                current_folders.extend(temp_folder)
-            else:
-                temp_folder = Folder.objects.filter(folder=folder)
-                current_folders.extend(temp_folder)
-    return next_folders
+def get_descendant_folder_ids(*folders: Folder) -> typing.List[int]:
+    if not folders:
+        return []
+
+    table = connection.ops.quote_name(Folder._meta.db_table)
+    placeholders = ", ".join(["%s"] * len(folders))
+    query = f"""
+        WITH RECURSIVE descendants(id) AS (
+            SELECT id FROM {table} WHERE folder_id IN ({placeholders})
+            UNION
+            SELECT child.id FROM {table} child
+            INNER JOIN descendants ON child.folder_id = descendants.id
+        )
+        SELECT id FROM descendants
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(query, [folder.id for folder in folders])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def get_subtree(*folders: Folder, with_self: bool = True) -> FolderSubtree:
+    """
+    Resolve every folder and note below the given folders in two queries: a
+    recursive CTE for the folder ids and a single lookup for the notes inside
+    them.
+    """
+    root_ids = list(dict.fromkeys(folder.id for folder in folders))
+    folder_ids = [
+        folder_id
+        for folder_id in get_descendant_folder_ids(*folders)
+        if folder_id not in root_ids
+    ]
+    note_ids = list(
+        Note.objects.filter(folder_id__in=[*root_ids, *folder_ids]).values_list(
+            "id", flat=True
+        )
+    )
+
+    if with_self:
+        folder_ids = [*root_ids, *folder_ids]
+
+    return FolderSubtree(folder_ids=folder_ids, note_ids=note_ids)
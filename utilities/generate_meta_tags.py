@@ -1,6 +1,9 @@
+import functools
+
 from django.conf import settings
 
 
+@functools.lru_cache(maxsize=1024)
 def generate_meta_tags(
     title,
     description,
@@ -0,0 +1,81 @@
+import collections
+import heapq
+import re
+import typing
+
+# New notes are named "Note1", "Note2", ..., taking the smallest number that
+# no note of the user is named after.
+NOTE_NAME_PREFIX = "Note"
+NOTE_NAME_REGEX = r"^Note([1-9][0-9]*)$"
+
+_note_name_pattern = re.compile(NOTE_NAME_REGEX)
+
+
+def get_note_name(number: int) -> str:
+    return f"{NOTE_NAME_PREFIX}{number}"
+
+
+def get_note_number(name: str) -> typing.Optional[int]:
+    match = _note_name_pattern.match(name)
+
+    return int(match.group(1)) if match else None
+
+
+class NoteNameAllocator:
+    """
+    Track which "NoteN" names are taken, to find the smallest free one
+    without trying every name in turn.
+
+    Every number below the high-water mark that is not taken is kept in a
+    min-heap. Entries are not removed when their number gets taken by a
+    rename, but skipped when they reach the top, so every operation is
+    O(log n) amortized.
+    """
+
+    def __init__(self, names: typing.Iterable[str] = ()):
+        # Names can repeat after a rename, so count how many notes use each.
+        self._taken: typing.Counter[int] = collections.Counter()
+        self._free: typing.List[int] = []
+        self._next = 1
+
+        for name in names:
+            self.take(name)
+
+    def take(self, name: str) -> None:
+        number = get_note_number(name)
+
+        if number is None:
+            return
+
+        self._taken[number] += 1
+
+        if number == self._next:
+            while self._next in self._taken:
+                self._next += 1
+
+    def release(self, name: str) -> None:
+        number = get_note_number(name)
+
+        if number is None or number not in self._taken:
+            return
+
+        self._taken[number] -= 1
+
+        if self._taken[number] == 0:
+            del self._taken[number]
+
+            if number < self._next:
+                heapq.heappush(self._free, number)
+
+    def is_taken(self, name: str) -> bool:
+        return get_note_number(name) in self._taken
+
+    def get_free_name(self) -> str:
+        """
+        Return the smallest name not taken. It is only reserved once passed
+        to `take`.
+        """
+        while self._free and self._free[0] in self._taken:
+            heapq.heappop(self._free)
+
+        return get_note_name(self._free[0] if self._free else self._next)
@@ -0,0 +1,128 @@
+import datetime
+import logging
+import typing
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from texteditor.models import PendingNoteText
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+RETRY_DELAY = datetime.timedelta(seconds=30)
+MAX_RETRY_DELAY = datetime.timedelta(hours=1)
+# How long a worker owns the texts it selected. Upload timeouts must stay well
+# below it, or an expired claim lets another worker upload the note as well.
+CLAIM_DURATION = datetime.timedelta(minutes=5)
+
+
+def buffer_note_text(note_id: int, text: str) -> None:
+    """
+    Record the latest text of a note, to be uploaded to storage later.
+
+    Saves made before the pending text is flushed only replace it, so a note
+    edited continuously is still uploaded once per NOTE_TEXT_FLUSH_DELAY
+    rather than once per save. The row is committed before returning, so an
+    acknowledged save survives a restart.
+    """
+    updated = PendingNoteText.objects.filter(note_id=note_id).update(
+        text=text, revision=F("revision") + 1, date=timezone.now()
+    )
+
+    if updated:
+        return
+
+    try:
+        with transaction.atomic():
+            PendingNoteText.objects.create(
+                note_id=note_id,
+                text=text,
+                next_attempt=timezone.now()
+                + datetime.timedelta(seconds=settings.NOTE_TEXT_FLUSH_DELAY),
+            )
+    except IntegrityError:
+        # Another request buffered the note in the meantime.
+        PendingNoteText.objects.filter(note_id=note_id).update(
+            text=text, revision=F("revision") + 1, date=timezone.now()
+        )
+
+
+def flush_note_texts(
+    batch_size: typing.Optional[int] = BATCH_SIZE, flush_all: bool = False
+) -> int:
+    """
+    Upload one batch of due pending texts, or of all of them with
+    `flush_all`, and return the number of texts uploaded. A `batch_size` of
+    None uploads every selected text at once.
+
+    The texts are claimed in a short transaction first, skipping those other
+    workers hold, so several workers never upload the same note at once. No
+    lock is held during the uploads. A row is only removed if its revision
+    is still the one that was uploaded; text saved in the meantime stays
+    buffered for the next round. Failed uploads are retried with exponential
+    backoff.
+    """
+    pending_texts = _claim_pending_texts(batch_size, flush_all)
+    uploaded = 0
+
+    for pending_text in pending_texts:
+        note = pending_text.note
+
+        try:
+            note.save_text_file(
+                ContentFile(pending_text.text.encode("utf-8"), name=f"{note.token}.txt")
+            )
+        except Exception as error:
+            logger.exception("Failed to upload the text of note %s", note.pk)
+            delay = min(RETRY_DELAY * 2**pending_text.attempts, MAX_RETRY_DELAY)
+            PendingNoteText.objects.filter(note_id=note.pk).update(
+                attempts=F("attempts") + 1,
+                next_attempt=timezone.now() + delay,
+                last_error=str(error),
+                claimed_until=None,
+            )
+            continue
+
+        uploaded += 1
+        flushed = PendingNoteText.objects.filter(
+            note_id=note.pk, revision=pending_text.revision
+        ).delete()[0]
+
+        if not flushed:
+            PendingNoteText.objects.filter(note_id=note.pk).update(
+                attempts=0,
+                next_attempt=timezone.now()
+                + datetime.timedelta(seconds=settings.NOTE_TEXT_FLUSH_DELAY),
+                last_error="",
+                claimed_until=None,
+            )
+
+    return uploaded
+
+
+def _claim_pending_texts(
+    batch_size: typing.Optional[int], flush_all: bool
+) -> typing.List[PendingNoteText]:
+    now = timezone.now()
+
+    with transaction.atomic():
+        pending_texts = (
+            PendingNoteText.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("note")
+            .filter(Q(claimed_until__isnull=True) | Q(claimed_until__lte=now))
+            .order_by("next_attempt")
+        )
+
+        if not flush_all:
+            pending_texts = pending_texts.filter(next_attempt__lte=now)
+
+        pending_texts = list(pending_texts[:batch_size])
+        PendingNoteText.objects.filter(
+            note_id__in=[pending_text.note_id for pending_text in pending_texts]
+        ).update(claimed_until=now + CLAIM_DURATION)
+
+    return pending_texts
@@ -0,0 +1,71 @@
+import logging
+import typing
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from texteditor.models import Note, TextBlob
+from utilities.text_blobs import is_text_blob_name, parse_text_blob_name
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+
+
+def _get_stored_size(note: Note) -> int:
+    if is_text_blob_name(note.text_file.name):
+        blob = TextBlob.objects.filter(
+            digest=parse_text_blob_name(note.text_file.name)
+        ).first()
+
+        if blob is not None:
+            return blob.size
+
+    return note.text_file.size
+
+
+def place_note_texts(
+    batch_size: int = BATCH_SIZE, after: int = 0
+) -> typing.Tuple[int, int, typing.Optional[int]]:
+    """
+    Move the text of one batch of notes (those with an id greater than
+    `after`) to where `Note.save_text_file` would put it today: into the
+    database if it fits NOTE_TEXT_INLINE_MAX_SIZE, into storage otherwise.
+
+    Only small files are downloaded; the size of the others is read from
+    their metadata. Notes with buffered text are skipped, since flushing it
+    places it anyway. Returns the number of notes checked and moved, and the
+    id to continue after (None once every note was checked).
+    """
+    notes = list(
+        Note.objects.filter(pk__gt=after, pending_text__isnull=True)
+        .select_related("inline_text")
+        .order_by("pk")[:batch_size]
+    )
+    moved = 0
+
+    for note in notes:
+        inline_text = getattr(note, "inline_text", None)
+
+        try:
+            if inline_text is not None:
+                content = inline_text.text.encode("utf-8")
+
+                if len(content) <= settings.NOTE_TEXT_INLINE_MAX_SIZE:
+                    continue
+            elif note.text_file:
+                if _get_stored_size(note) > settings.NOTE_TEXT_INLINE_MAX_SIZE:
+                    continue
+
+                content = note.read_text_file()
+            else:
+                continue
+
+            note.save_text_file(ContentFile(content, name=f"{note.token}.txt"))
+        except Exception:
+            logger.exception("Failed to move the text of note %s", note.pk)
+            continue
+
+        moved += 1
+
+    return len(notes), moved, notes[-1].pk if notes else None
@@ -0,0 +1,116 @@
+import datetime
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from account.models import Accounts
+from texteditor.models import Note, StorageDeletion, TextBlob, generate_file_name
+from utilities.aws import put_object_to_aws
+from utilities.text_blobs import is_text_blob_name
+
+# Time an upload has to be confirmed before the outbox worker removes it.
+CONFIRMATION_GRACE = datetime.timedelta(hours=1)
+
+
+def upload_note_texts(
+    user: Accounts,
+    contents: typing.Dict[typing.Any, bytes],
+    workers: typing.Optional[int] = None,
+) -> typing.Dict[typing.Any, str]:
+    """
+    Upload note texts for notes about to be created for `user`, up to
+    `workers` at a time, and return the file name of each. The files must
+    then be confirmed, with `confirm_note_text_uploads`, in the transaction
+    that creates the notes; if that fails, `release_note_text_uploads`
+    undoes the uploads.
+
+    Each file is queued for deletion before it is uploaded and confirming
+    cancels the deletion, so uploads that are never confirmed (even after a
+    crash) are removed by the outbox worker. With NOTE_TEXT_CONTENT_ADDRESSED,
+    texts are stored as blobs instead and hold a reference from the start.
+    """
+    if not contents:
+        return {}
+
+    workers = workers or settings.NOTE_TEXT_UPLOAD_WORKERS
+
+    if settings.NOTE_TEXT_CONTENT_ADDRESSED:
+
+        def upload(key) -> str:
+            return _acquire_text_blob(contents[key])
+
+    else:
+        names = {key: generate_file_name(Note(user=user)) for key in contents}
+        StorageDeletion.objects.bulk_create(
+            [
+                StorageDeletion(
+                    name=name, next_attempt=timezone.now() + CONFIRMATION_GRACE
+                )
+                for name in names.values()
+            ]
+        )
+
+        def upload(key) -> str:
+            put_object_to_aws(names[key], contents[key])
+
+            return names[key]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {key: executor.submit(upload, key) for key in contents}
+
+    uploaded = {
+        key: future.result()
+        for key, future in futures.items()
+        if not future.exception()
+    }
+
+    if len(uploaded) < len(futures):
+        release_note_text_uploads(
+            uploaded.values()
+            if settings.NOTE_TEXT_CONTENT_ADDRESSED
+            else names.values()
+        )
+
+        for future in futures.values():
+            future.result()
+
+    return uploaded
+
+
+def confirm_note_text_uploads(names: typing.Iterable[str]) -> None:
+    """
+    Keep uploaded files. Call it inside the transaction that creates the
+    notes referencing them.
+    """
+    names = [name for name in names if not is_text_blob_name(name)]
+
+    if not names:
+        return
+
+    confirmed = StorageDeletion.objects.filter(name__in=names).delete()[0]
+
+    if confirmed < len(set(names)):
+        raise RuntimeError("Note text uploads expired before being confirmed.")
+
+
+def release_note_text_uploads(names: typing.Iterable[str]) -> None:
+    """
+    Undo uploads that will not be confirmed: their pending deletions are
+    made due right away, and blobs lose the reference taken for them.
+    """
+    names = list(names)
+    TextBlob.release(name for name in names if is_text_blob_name(name))
+    StorageDeletion.objects.filter(
+        name__in=[name for name in names if not is_text_blob_name(name)]
+    ).update(next_attempt=timezone.now())
+
+
+def _acquire_text_blob(content: bytes) -> str:
+    try:
+        return TextBlob.acquire(content)
+    finally:
+        # Runs on a pool thread, which would otherwise keep its connection.
+        connections.close_all()
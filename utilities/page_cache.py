@@ -0,0 +1,53 @@
+import hashlib
+import typing
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+
+CSRF_TOKEN_PLACEHOLDER = "__page_cache_csrf_token__"
+
+# Cached pages are keyed by release, so that a deploy never serves pages
+# rendered from the previous templates. Without an explicit release, every
+# process gets its own keys, which is still safe, only colder.
+_release = settings.RELEASE or uuid.uuid4().hex
+
+
+def _get_cache_key(request: HttpRequest, template_name: str) -> str:
+    # The query string is left out: the cached pages do not depend on it, and
+    # keying on it would let any client fill the cache with random URLs.
+    url = f"{request.scheme}://{request.get_host()}{request.path}"
+    url = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    auth = "user" if request.user.is_authenticated else "anonymous"
+
+    return f"page:{_release}:{template_name}:{auth}:{url}"
+
+
+def render_cached_page(
+    request: HttpRequest,
+    template_name: str,
+    get_context: typing.Callable[[], typing.Dict[str, typing.Any]],
+) -> HttpResponse:
+    """
+    Render a page whose content only depends on the URL (without its query
+    string) and on whether the user is signed in, and serve it from the page
+    cache afterwards.
+
+    The page is rendered with a placeholder in place of the CSRF token, and
+    the token of the current request is substituted when serving it, so one
+    cached copy is valid for every visitor. `get_context` is only called on
+    a cache miss.
+    """
+    cache = caches[settings.PAGE_CACHE_ALIAS]
+    key = _get_cache_key(request, template_name)
+    content = cache.get(key)
+
+    if content is None:
+        context = {**get_context(), "csrf_token": CSRF_TOKEN_PLACEHOLDER}
+        content = render_to_string(template_name, context, request)
+        cache.set(key, content, timeout=settings.PAGE_CACHE_TIMEOUT)
+
+    return HttpResponse(content.replace(CSRF_TOKEN_PLACEHOLDER, get_token(request)))
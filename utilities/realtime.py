@@ -0,0 +1,413 @@
+import asyncio
+import collections
+import json
+import logging
+import re
+import time
+import typing
+from http.cookies import CookieError, SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.utils.module_loading import import_string
+
+from texteditor.models import Note, Room
+from utilities.async_storage import close_async_object_storage
+from utilities.note_text_buffer import buffer_note_text
+from utilities.text_operations import NoteDocument, OperationError, TextOperation
+
+logger = logging.getLogger(__name__)
+
+ROOM_PATH = re.compile(r"^/ws/(?P<note_token>[^/]+)/r/(?P<room_name>[^/]+)/?$")
+
+# How long a connection trusts the room permissions it read last.
+PERMISSION_TTL = 5
+# Messages waiting for a slow client before it gets disconnected.
+QUEUE_SIZE = 256
+
+CLOSE_NOT_FOUND = 4404
+CLOSE_FORBIDDEN = 4403
+CLOSE_TOO_SLOW = 4408
+
+
+class Subscriber:
+    """
+    Outgoing message queue of one connection. A client that falls more than
+    QUEUE_SIZE messages behind is disconnected (and reloads the note when it
+    reconnects) instead of making the queue grow without bound.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE + 1)
+
+    def deliver(self, message: str) -> None:
+        if self._queue.qsize() < QUEUE_SIZE:
+            self._queue.put_nowait(message)
+        elif self._queue.qsize() == QUEUE_SIZE:
+            self._queue.put_nowait(None)
+
+    async def next(self) -> typing.Optional[str]:
+        return await self._queue.get()
+
+
+class InProcessBroker:
+    """
+    Publish/subscribe between the connections of the current process.
+
+    Any other backend (e.g. one built on Redis pub/sub, for deployments with
+    several processes) only needs the same three coroutines, and is selected
+    with the REALTIME_BROKER setting.
+    """
+
+    def __init__(self):
+        self._subscribers: typing.Dict[str, typing.Set[Subscriber]] = (
+            collections.defaultdict(set)
+        )
+
+    async def subscribe(self, channel: str, subscriber: Subscriber) -> None:
+        self._subscribers[channel].add(subscriber)
+
+    async def unsubscribe(self, channel: str, subscriber: Subscriber) -> None:
+        subscribers = self._subscribers.get(channel)
+
+        if subscribers is None:
+            return
+
+        subscribers.discard(subscriber)
+
+        if not subscribers:
+            del self._subscribers[channel]
+
+    async def publish(
+        self,
+        channel: str,
+        message: str,
+        sender: typing.Optional[Subscriber] = None,
+    ) -> None:
+        for subscriber in list(self._subscribers.get(channel, ())):
+            if subscriber is not sender:
+                subscriber.deliver(message)
+
+
+class NoteTextWriter:
+    """
+    Snapshots the text of each note being edited to the note text buffer at
+    most once per `interval`, whatever the number of clients and keystrokes.
+    The text is only read when the snapshot is taken.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: typing.Dict[int, typing.Callable[[], str]] = {}
+        self._tasks: typing.Dict[int, asyncio.Task] = {}
+
+    def schedule(self, note_id: int, get_text: typing.Callable[[], str]) -> None:
+        self._pending[note_id] = get_text
+
+        if note_id not in self._tasks:
+            self._tasks[note_id] = asyncio.ensure_future(self._flush_later(note_id))
+
+    def get_pending_text(self, note_id: int) -> typing.Optional[str]:
+        get_text = self._pending.get(note_id)
+
+        return get_text() if get_text is not None else None
+
+    async def flush(self, note_id: int) -> None:
+        get_text = self._pending.pop(note_id, None)
+
+        if get_text is None:
+            return
+
+        text = get_text()
+
+        try:
+            await sync_to_async(buffer_note_text)(note_id, text)
+        except Exception:
+            logger.exception("Failed to save the text of note %s", note_id)
+
+    async def flush_all(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+
+        for note_id in list(self._pending):
+            await self.flush(note_id)
+
+    async def _flush_later(self, note_id: int) -> None:
+        try:
+            await asyncio.sleep(self.interval)
+            await self.flush(note_id)
+        finally:
+            self._tasks.pop(note_id, None)
+
+
+class DocumentStore:
+    """
+    The documents of the notes currently open in this process, kept while at
+    least one connection uses them.
+
+    Documents are per process: the broker can fan messages out across
+    processes, but every connection to a given room must be served by the
+    same process (e.g. by routing on the room in the load balancer).
+    """
+
+    def __init__(self):
+        self._documents: typing.Dict[int, NoteDocument] = {}
+        self._connections: typing.Counter[int] = collections.Counter()
+        self._lock = asyncio.Lock()
+
+    async def open(self, note: Note) -> NoteDocument:
+        async with self._lock:
+            if note.pk not in self._documents:
+                text = writer.get_pending_text(note.pk)
+
+                if text is None:
+                    text = await sync_to_async(note.get_text)()
+
+                self._documents[note.pk] = NoteDocument(text)
+
+            self._connections[note.pk] += 1
+
+            return self._documents[note.pk]
+
+    def close(self, note: Note) -> None:
+        self._connections[note.pk] -= 1
+
+        if self._connections[note.pk] <= 0:
+            del self._connections[note.pk]
+            del self._documents[note.pk]
+
+
+broker = import_string(settings.REALTIME_BROKER)()
+writer = NoteTextWriter(settings.REALTIME_SAVE_INTERVAL)
+documents = DocumentStore()
+
+
+def _get_header(scope, name: bytes) -> typing.Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin1")
+
+    return None
+
+
+def _get_user(scope):
+    cookie = SimpleCookie()
+
+    try:
+        cookie.load(_get_header(scope, b"cookie") or "")
+    except CookieError:
+        pass
+
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    session_store = import_module(settings.SESSION_ENGINE).SessionStore
+    session = session_store(morsel.value if morsel else None)
+
+    return get_user(SimpleNamespace(session=session))
+
+
+def _is_same_origin(scope) -> bool:
+    origin = _get_header(scope, b"origin")
+
+    if origin is None:
+        return True
+
+    return origin.split("://", 1)[-1] == _get_header(scope, b"host")
+
+
+class RoomAccess:
+    """
+    What a connection may do in a room. Permissions are re-read at most every
+    PERMISSION_TTL seconds, so changes made by the owner apply to clients
+    that are already connected.
+    """
+
+    def __init__(self, room: Room, is_owner: bool):
+        self.room = room
+        self.is_owner = is_owner
+        self._checked_at = time.monotonic()
+
+    async def refresh(self) -> None:
+        if self.is_owner or time.monotonic() - self._checked_at < PERMISSION_TTL:
+            return
+
+        await self.room.arefresh_from_db(fields=["is_public", "is_editable"])
+        self._checked_at = time.monotonic()
+
+    @property
+    def can_view(self) -> bool:
+        return self.is_owner or self.room.is_public
+
+    @property
+    def can_edit(self) -> bool:
+        return self.is_owner or (self.room.is_public and self.room.is_editable)
+
+
+async def _authorize(
+    scope, note_token: str, room_name: str
+) -> typing.Optional[typing.Tuple[Note, RoomAccess]]:
+    note = await (
+        Note.objects.select_related("room")
+        .filter(token=note_token, room__name=room_name)
+        .afirst()
+    )
+
+    if note is None:
+        return None
+
+    user = await sync_to_async(_get_user)(scope)
+    access = RoomAccess(note.room, is_owner=note.room.user_id == user.pk)
+
+    return note, access
+
+
+async def room_websocket(scope, receive, send) -> None:
+    """
+    ASGI application for the collaboration channel of a room, served at
+    `/ws/<note_token>/r/<room_name>/`.
+
+    Connections are authenticated with the session cookie and accepted for
+    anyone who may open the room. Each client first receives a snapshot of
+    the text and its version, and from then on only exchanges operations:
+
+    - client: {"type": "operation", "version": <base version>, "operation": [...]}
+    - server: {"type": "operation", "version": <new version>, "operation": [...]}
+      for the edits of other members, {"type": "ack", "version": <new version>}
+      for the client's own, and a new snapshot when an operation is rejected.
+
+    Clients send one operation at a time and wait for its acknowledgement.
+    """
+    event = await receive()
+
+    if event["type"] != "websocket.connect":
+        return
+
+    match = ROOM_PATH.match(scope["path"])
+
+    if match is None:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+
+    authorized = await _authorize(scope, **match.groupdict())
+
+    if authorized is None or not authorized[1].can_view or not _is_same_origin(scope):
+        await send({"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+        return
+
+    note, access = authorized
+    channel = f"room-{note.room_id}"
+    subscriber = Subscriber()
+
+    await send({"type": "websocket.accept"})
+    document = await documents.open(note)
+    await broker.subscribe(channel, subscriber)
+    # Operations published from here on are also relayed, clients skip the
+    # ones already included in the snapshot.
+    subscriber.deliver(_get_snapshot_message(document))
+
+    async def relay():
+        while True:
+            message = await subscriber.next()
+
+            if message is None:
+                await send({"type": "websocket.close", "code": CLOSE_TOO_SLOW})
+                return
+
+            await send({"type": "websocket.send", "text": message})
+
+    relay_task = asyncio.ensure_future(relay())
+
+    try:
+        while True:
+            event = await receive()
+
+            if event["type"] == "websocket.disconnect":
+                break
+
+            await access.refresh()
+
+            if not access.can_view:
+                await send({"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+                break
+
+            if not access.can_edit:
+                subscriber.deliver(
+                    json.dumps(
+                        {
+                            "type": "error",
+                            "message": (
+                                "You do not have permission to change this file."
+                            ),
+                        }
+                    )
+                )
+                continue
+
+            try:
+                version, operation = _parse_operation(event)
+                operation = document.apply(version, operation)
+            except OperationError:
+                subscriber.deliver(_get_snapshot_message(document))
+                continue
+
+            subscriber.deliver(json.dumps({"type": "ack", "version": document.version}))
+            await broker.publish(
+                channel,
+                json.dumps(
+                    {
+                        "type": "operation",
+                        "version": document.version,
+                        "operation": operation.to_json(),
+                    }
+                ),
+                sender=subscriber,
+            )
+            writer.schedule(note.pk, lambda: document.text)
+    finally:
+        relay_task.cancel()
+        await broker.unsubscribe(channel, subscriber)
+        documents.close(note)
+
+
+def _get_snapshot_message(document: NoteDocument) -> str:
+    return json.dumps(
+        {"type": "snapshot", "version": document.version, "text": document.text}
+    )
+
+
+def _parse_operation(event) -> typing.Tuple[int, TextOperation]:
+    data = event.get("text")
+
+    if data is None or len(data) > settings.REALTIME_MAX_MESSAGE_SIZE:
+        raise OperationError("Invalid message.")
+
+    try:
+        message = json.loads(data)
+        version = message["version"]
+        operation = TextOperation.from_json(message["operation"])
+    except (ValueError, KeyError, TypeError):
+        raise OperationError("Invalid message.")
+
+    if not isinstance(version, int):
+        raise OperationError("Invalid version.")
+
+    return version, operation
+
+
+async def lifespan(scope, receive, send) -> None:
+    """
+    ASGI lifespan handler that saves pending room text and closes the async
+    object storage on shutdown.
+    """
+    while True:
+        event = await receive()
+
+        if event["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif event["type"] == "lifespan.shutdown":
+            await writer.flush_all()
+            await close_async_object_storage()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -0,0 +1,153 @@
+from typing import List, Optional, Union
+
+from django.db.models import Max
+
+from account.models import Accounts
+from texteditor.models import Folder, Note
+
+# Resources are ordered by sparse keys spaced INDEX_GAP apart, so that a move
+# can usually take a key halfway between its new neighbours and only the
+# moved row needs to be written. The API keeps exposing dense positions.
+INDEX_GAP = 1024
+MAX_INDEX = 2**31 - 1
+
+
+def lock_folders(user: Accounts, *folders: Optional[Folder]) -> None:
+    """
+    Serialize index changes inside the given folders for the rest of the
+    current transaction.
+
+    The root folder has no row of its own, so the user's account row stands
+    in for it. Locks are always taken in the same order (account first, then
+    folders by id) so that concurrent moves cannot deadlock.
+    """
+    if any(folder is None for folder in folders):
+        list(Accounts.objects.select_for_update().filter(pk=user.pk))
+
+    folder_ids = sorted({folder.pk for folder in folders if folder is not None})
+
+    if folder_ids:
+        list(
+            Folder.objects.select_for_update().filter(pk__in=folder_ids).order_by("pk")
+        )
+
+
+def get_sibling_indexes(
+    folder: Optional[Folder],
+    user: Accounts,
+    exclude: Union[Note, Folder, None] = None,
+):
+    """
+    Return a lazy, ordered queryset of the sort keys of every resource in
+    `folder`, built as a single UNION over notes and folders.
+    """
+    querysets = []
+
+    for model in (Note, Folder):
+        resources = model.objects.filter(user=user, folder=folder)
+
+        if isinstance(exclude, model):
+            resources = resources.exclude(pk=exclude.pk)
+
+        querysets.append(resources.values_list("index", flat=True))
+
+    return querysets[0].union(querysets[1], all=True).order_by("index")
+
+
+def get_position(resource: Union[Note, Folder], user: Accounts) -> int:
+    return sum(
+        model.objects.filter(
+            user=user, folder=resource.folder, index__lt=resource.index
+        ).count()
+        for model in (Note, Folder)
+    )
+
+
+def get_next_index(folder: Optional[Folder], user: Accounts) -> int:
+    """
+    Return a key placing a new resource after every existing one in `folder`.
+    Callers are expected to hold the folder lock (see `lock_folders`) until
+    the resource is saved, so that concurrent creates and moves cannot pick
+    the same key.
+    """
+    largest_indexes = []
+
+    for model in (Note, Folder):
+        resources = model.objects.filter(user=user, folder=folder)
+        largest_index = resources.aggregate(largest=Max("index"))["largest"]
+
+        if largest_index is not None:
+            largest_indexes.append(largest_index)
+
+    if not largest_indexes:
+        return INDEX_GAP
+
+    largest_index = max(largest_indexes)
+
+    if largest_index + INDEX_GAP > MAX_INDEX:
+        largest_index = rebalance_folder(folder, user)
+
+    return largest_index + INDEX_GAP
+
+
+def rebalance_folder(folder: Optional[Folder], user: Accounts) -> int:
+    """
+    Respace every key in `folder` INDEX_GAP apart, keeping the current order
+    and leaving a gap before the first resource. Returns the largest key
+    assigned. Callers are expected to hold the folder lock.
+    """
+    notes = list(Note.objects.filter(user=user, folder=folder).only("id", "index"))
+    folders = list(Folder.objects.filter(user=user, folder=folder).only("id", "index"))
+    resources: List[Union[Note, Folder]] = sorted(
+        [*notes, *folders], key=lambda resource: resource.index
+    )
+
+    for position, resource in enumerate(resources):
+        resource.index = (position + 1) * INDEX_GAP
+
+    Note.objects.bulk_update(notes, ["index"])
+    Folder.objects.bulk_update(folders, ["index"])
+
+    return len(resources) * INDEX_GAP
+
+
+def _get_index_between(lower: Optional[int], upper: Optional[int]) -> Optional[int]:
+    if lower is None and upper is None:
+        return INDEX_GAP
+
+    if lower is None:
+        return upper // 2 if upper > 0 else None
+
+    if upper is None:
+        return lower + INDEX_GAP if lower + INDEX_GAP <= MAX_INDEX else None
+
+    return (lower + upper) // 2 if upper - lower > 1 else None
+
+
+def move_to_position(resource: Union[Note, Folder], position: int, user: Accounts):
+    """
+    Give `resource` a key placing it at `position` among its siblings. Only
+    the moved row is written unless the surrounding gap is exhausted, in
+    which case the folder is rebalanced first. Callers are expected to hold
+    the folder lock (see `lock_folders`).
+    """
+    for _ in range(2):
+        siblings = get_sibling_indexes(resource.folder, user, exclude=resource)
+
+        if position == 0:
+            lower = None
+            upper = next(iter(siblings[:1]), None)
+        else:
+            neighbours = list(siblings[position - 1 : position + 1])
+            lower = neighbours[0] if neighbours else None
+            upper = neighbours[1] if len(neighbours) > 1 else None
+
+        index = _get_index_between(lower, upper)
+
+        if index is not None:
+            break
+
+        rebalance_folder(resource.folder, user)
+
+    resource.index = index
+    resource.save(update_fields=["index"])
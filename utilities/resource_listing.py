@@ -0,0 +1,231 @@
+import dataclasses
+import re
+import typing
+
+from django.conf import settings
+from django.db.models import (
+    CharField,
+    Count,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce
+
+from account.models import Accounts
+from texteditor.anonymous import Folder as AnonymousFolder
+from texteditor.models import Folder, Note
+
+LISTING_COLUMNS = (
+    "listed_type",
+    "listed_id",
+    "listed_name",
+    "listed_token",
+    "listed_index",
+    "listed_user_id",
+    "listed_text_file",
+    "listed_room_name",
+    "listed_resource_count",
+)
+
+
+@dataclasses.dataclass
+class ListedResource:
+    """
+    Read-only row of the home page listing. Carries exactly what the template
+    renders, so that no model instance (or related object) is loaded per item.
+    """
+
+    type: str
+    id: int
+    name: str
+    token: str
+    index: int
+    user_id: int
+    text_file: typing.Optional[str] = None
+    room_name: typing.Optional[str] = None
+    resource_count: typing.Optional[int] = None
+
+
+# Position of a resource in a listing: (index, type, id). Siblings can share
+# an index, so the type and id break ties to make the order total.
+SortKey = typing.Tuple[int, str, int]
+
+_cursor_pattern = re.compile(r"^(\d+)-(folder|note)-(\d+)$")
+
+
+@dataclasses.dataclass
+class ResourcePage:
+    resources: typing.List
+    # Number of resources in the folder that come before this page.
+    offset: int = 0
+    # Cursor to pass as `after` to fetch the following page, if there is one.
+    next_after: typing.Optional[str] = None
+
+
+def parse_cursor(cursor: typing.Optional[str]) -> typing.Optional[SortKey]:
+    """
+    Return the sort key encoded in a `next_after` cursor, or None if the
+    cursor is missing or malformed.
+    """
+    match = _cursor_pattern.match(cursor or "")
+
+    if match is None:
+        return None
+
+    index, resource_type, resource_id = match.groups()
+
+    return int(index), resource_type, int(resource_id)
+
+
+def _format_cursor(key: SortKey) -> str:
+    return "-".join(str(part) for part in key)
+
+
+def _get_after_filter(resource_type: str, after: SortKey) -> Q:
+    """
+    Match the resources of `resource_type` that sort after `after`.
+    """
+    index, after_type, after_id = after
+
+    if resource_type > after_type:
+        return Q(index__gte=index)
+    elif resource_type < after_type:
+        return Q(index__gt=index)
+    else:
+        return Q(index__gt=index) | Q(index=index, id__gt=after_id)
+
+
+def _count_children(model):
+    children = (
+        model.objects.filter(folder=OuterRef("pk"))
+        .order_by()
+        .values("folder")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+
+    return Coalesce(Subquery(children, output_field=IntegerField()), 0)
+
+
+def get_resource_page(
+    user: Accounts,
+    folder: typing.Optional[Folder],
+    after: typing.Optional[SortKey] = None,
+    page_size: typing.Optional[int] = None,
+) -> ResourcePage:
+    """
+    Return one page of the notes and folders in `folder`, ordered by index.
+
+    The page is read with a single UNION query sorted and limited by the
+    database, and is continued with keyset pagination on (index, type, id),
+    which is unique even when siblings share an index, so the cost of a page
+    does not depend on the size of the folder.
+    """
+    page_size = page_size or settings.HOME_PAGE_SIZE
+
+    notes = Note.objects.filter(user=user, folder=folder)
+    folders = Folder.objects.filter(user=user, folder=folder)
+    offset = 0
+
+    if after is not None:
+        note_filter = _get_after_filter("note", after)
+        folder_filter = _get_after_filter("folder", after)
+        offset = (
+            notes.exclude(note_filter).count() + folders.exclude(folder_filter).count()
+        )
+        notes = notes.filter(note_filter)
+        folders = folders.filter(folder_filter)
+
+    notes = notes.annotate(
+        listed_type=Value("note", output_field=CharField()),
+        listed_id=F("id"),
+        listed_name=F("name"),
+        listed_token=F("token"),
+        listed_index=F("index"),
+        listed_user_id=F("user_id"),
+        listed_text_file=F("text_file"),
+        listed_room_name=F("room__name"),
+        listed_resource_count=Value(None, output_field=IntegerField()),
+    ).values(*LISTING_COLUMNS)
+    folders = folders.annotate(
+        listed_type=Value("folder", output_field=CharField()),
+        listed_id=F("id"),
+        listed_name=F("name"),
+        listed_token=F("token"),
+        listed_index=F("index"),
+        listed_user_id=F("user_id"),
+        listed_text_file=Value(None, output_field=CharField()),
+        listed_room_name=Value(None, output_field=CharField()),
+        listed_resource_count=_count_children(Note) + _count_children(Folder),
+    ).values(*LISTING_COLUMNS)
+
+    rows = notes.union(folders, all=True).order_by(
+        "listed_index", "listed_type", "listed_id"
+    )[: page_size + 1]
+    resources = [
+        ListedResource(
+            **{
+                column.removeprefix("listed_"): row[column]
+                for column in LISTING_COLUMNS
+            }
+        )
+        for row in rows
+    ]
+
+    return _make_page(
+        resources,
+        offset,
+        page_size,
+        lambda resource: (resource.index, resource.type, resource.id),
+    )
+
+
+def _get_anonymous_sort_key(resource) -> SortKey:
+    resource_type = "folder" if isinstance(resource, AnonymousFolder) else "note"
+
+    return resource.index, resource_type, resource.id
+
+
+def get_anonymous_resource_page(
+    resources: typing.Iterable,
+    after: typing.Optional[SortKey] = None,
+    page_size: typing.Optional[int] = None,
+) -> ResourcePage:
+    """
+    Same as `get_resource_page`, for resources already held in memory.
+    """
+    page_size = page_size or settings.HOME_PAGE_SIZE
+    resources = sorted(resources, key=_get_anonymous_sort_key)
+    offset = 0
+
+    if after is not None:
+        offset = sum(
+            1 for resource in resources if _get_anonymous_sort_key(resource) <= after
+        )
+
+    return _make_page(
+        resources[offset : offset + page_size + 1],
+        offset,
+        page_size,
+        _get_anonymous_sort_key,
+    )
+
+
+def _make_page(
+    resources: typing.List,
+    offset: int,
+    page_size: int,
+    get_sort_key: typing.Callable[[typing.Any], SortKey],
+) -> ResourcePage:
+    if len(resources) <= page_size:
+        return ResourcePage(resources, offset)
+
+    resources = resources[:page_size]
+
+    return ResourcePage(
+        resources, offset, next_after=_format_cursor(get_sort_key(resources[-1]))
+    )
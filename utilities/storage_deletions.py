@@ -0,0 +1,103 @@
+import datetime
+import typing
+
+from django.db import transaction
+from django.utils import timezone
+
+from texteditor.models import StorageDeletion, TextBlob
+from utilities.aws import remove_files_from_aws
+from utilities.text_blobs import is_text_blob_name
+
+BATCH_SIZE = 1000
+MAX_ATTEMPTS = 10
+RETRY_DELAY = datetime.timedelta(seconds=30)
+
+
+def enqueue_storage_deletions(names: typing.Iterable[str]) -> None:
+    """
+    Schedule files for removal. Call it inside the transaction that deletes
+    the records referencing the files so both commit or roll back together.
+
+    Text blobs are shared, so one reference is released per occurrence of
+    their name instead; `collect_text_blobs` removes them once unused.
+    """
+    names = [name for name in names if name]
+
+    TextBlob.release(name for name in names if is_text_blob_name(name))
+    StorageDeletion.objects.bulk_create(
+        [
+            StorageDeletion(name=name)
+            for name in dict.fromkeys(names)
+            if not is_text_blob_name(name)
+        ]
+    )
+
+
+def drain_storage_deletions(
+    batch_size: int = BATCH_SIZE, max_attempts: int = MAX_ATTEMPTS
+) -> int:
+    """
+    Remove one batch of due files with a single DeleteObjects call. Failed
+    files are retried with exponential backoff until `max_attempts` is
+    reached, after which they are left in the outbox for inspection. Returns
+    the number of files processed.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        deletions = list(
+            StorageDeletion.objects.select_for_update(skip_locked=True)
+            .filter(next_attempt__lte=now, attempts__lt=max_attempts)
+            .order_by("id")[:batch_size]
+        )
+
+        if not deletions:
+            return 0
+
+        failed = remove_files_from_aws(
+            [deletion.name for deletion in deletions], batch_size=batch_size
+        )
+
+        StorageDeletion.objects.filter(
+            id__in=[
+                deletion.id for deletion in deletions if deletion.name not in failed
+            ]
+        ).delete()
+
+        retried = [deletion for deletion in deletions if deletion.name in failed]
+
+        for deletion in retried:
+            deletion.attempts += 1
+            deletion.next_attempt = now + RETRY_DELAY * 2 ** (deletion.attempts - 1)
+            deletion.last_error = failed[deletion.name]
+
+        StorageDeletion.objects.bulk_update(
+            retried, ["attempts", "next_attempt", "last_error"]
+        )
+
+    return len(deletions)
+
+
+def collect_text_blobs(batch_size: int = BATCH_SIZE) -> int:
+    """
+    Move one batch of unreferenced text blobs to the deletion outbox and
+    return the number of blobs collected. Blobs being acquired at the same
+    time are locked and skipped.
+    """
+    with transaction.atomic():
+        digests = list(
+            TextBlob.objects.select_for_update(skip_locked=True)
+            .filter(references=0)
+            .order_by("date")
+            .values_list("digest", flat=True)[:batch_size]
+        )
+        # Re-read the counts now that the rows are locked: a blob acquired
+        # just before it was locked is referenced again and must be kept.
+        blobs = list(TextBlob.objects.filter(digest__in=digests, references=0))
+
+        StorageDeletion.objects.bulk_create(
+            [StorageDeletion(name=blob.name) for blob in blobs]
+        )
+        TextBlob.objects.filter(digest__in=[blob.digest for blob in blobs]).delete()
+
+    return len(blobs)
@@ -0,0 +1,67 @@
+import gzip
+import hashlib
+import typing
+import zlib
+
+from utilities.aws import put_object_to_aws
+
+TEXT_BLOB_PREFIX = "blobs/"
+TEXT_BLOB_SUFFIX = ".txt.gz"
+
+
+def get_text_blob_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def get_text_blob_name(digest: str) -> str:
+    return f"{TEXT_BLOB_PREFIX}{digest}{TEXT_BLOB_SUFFIX}"
+
+
+def parse_text_blob_name(name: str) -> str:
+    return str(name).removeprefix(TEXT_BLOB_PREFIX).removesuffix(TEXT_BLOB_SUFFIX)
+
+
+def is_text_blob_name(name: typing.Optional[str]) -> bool:
+    return bool(name) and str(name).startswith(TEXT_BLOB_PREFIX)
+
+
+def compress_text(content: bytes) -> bytes:
+    # A fixed mtime keeps the output, and so the uploaded object, identical
+    # for identical content.
+    return gzip.compress(content, mtime=0)
+
+
+def decompress_text(data: bytes) -> bytes:
+    return gzip.decompress(data)
+
+
+def iter_decompressed_text(chunks: typing.Iterable[bytes]) -> typing.Iterator[bytes]:
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+
+        if data:
+            yield data
+
+    data = decompressor.flush()
+
+    if data:
+        yield data
+
+
+def upload_text_blob(name: str, content: bytes) -> int:
+    """
+    Upload gzip-compressed text under a content-addressed name and return
+    its stored size. The object is marked with `Content-Encoding: gzip`, so
+    it can also be served to browsers as is.
+    """
+    body = compress_text(content)
+    put_object_to_aws(
+        name,
+        body,
+        ContentType="text/plain; charset=utf-8",
+        ContentEncoding="gzip",
+    )
+
+    return len(body)
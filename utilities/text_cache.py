@@ -0,0 +1,145 @@
+import sys
+import threading
+import typing
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class NoteTextCache:
+    """
+    Read-through cache for note bodies.
+
+    Entries live in a size-bounded in-process LRU and, when a cache alias is
+    configured, in a shared Django cache backend so that other workers can
+    reuse them. Keys are expected to change whenever the underlying object
+    changes (e.g. object key plus a version), so stale entries are never
+    returned and simply age out.
+    """
+
+    key_prefix = "note-text"
+
+    def __init__(
+        self,
+        max_size: int,
+        shared_cache_alias: typing.Optional[str] = None,
+        shared_cache_timeout: typing.Optional[int] = None,
+    ):
+        self.max_size = max_size
+        self.shared_cache_alias = shared_cache_alias
+        self.shared_cache_timeout = shared_cache_timeout
+        self._entries: typing.OrderedDict[str, str] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def shared_cache(self):
+        if self.shared_cache_alias is None:
+            return None
+
+        return caches[self.shared_cache_alias]
+
+    def get(self, key: str) -> typing.Optional[str]:
+        with self._lock:
+            text = self._entries.get(key)
+
+            if text is not None:
+                self._entries.move_to_end(key)
+                return text
+
+        shared_cache = self.shared_cache
+
+        if shared_cache is not None:
+            text = shared_cache.get(self._shared_key(key))
+
+            if text is not None:
+                self._set_local(key, text)
+                return text
+
+        return None
+
+    def set(self, key: str, text: str) -> None:
+        self._set_local(key, text)
+
+        shared_cache = self.shared_cache
+
+        if shared_cache is not None:
+            shared_cache.set(
+                self._shared_key(key), text, timeout=self.shared_cache_timeout
+            )
+
+    async def aget(self, key: str) -> typing.Optional[str]:
+        with self._lock:
+            text = self._entries.get(key)
+
+            if text is not None:
+                self._entries.move_to_end(key)
+                return text
+
+        shared_cache = self.shared_cache
+
+        if shared_cache is not None:
+            text = await shared_cache.aget(self._shared_key(key))
+
+            if text is not None:
+                self._set_local(key, text)
+                return text
+
+        return None
+
+    async def aset(self, key: str, text: str) -> None:
+        self._set_local(key, text)
+
+        shared_cache = self.shared_cache
+
+        if shared_cache is not None:
+            await shared_cache.aset(
+                self._shared_key(key), text, timeout=self.shared_cache_timeout
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._pop_local(key)
+
+        shared_cache = self.shared_cache
+
+        if shared_cache is not None:
+            shared_cache.delete(self._shared_key(key))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _set_local(self, key: str, text: str) -> None:
+        size = sys.getsizeof(text)
+
+        with self._lock:
+            self._pop_local(key)
+
+            if size > self.max_size:
+                return
+
+            self._entries[key] = text
+            self._size += size
+
+            while self._size > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= sys.getsizeof(evicted)
+
+    def _pop_local(self, key: str) -> None:
+        text = self._entries.pop(key, None)
+
+        if text is not None:
+            self._size -= sys.getsizeof(text)
+
+    def _shared_key(self, key: str) -> str:
+        return f"{self.key_prefix}:{key}"
+
+
+note_text_cache = NoteTextCache(
+    max_size=settings.NOTE_TEXT_CACHE_MAX_SIZE,
+    shared_cache_alias=settings.NOTE_TEXT_CACHE_ALIAS,
+    shared_cache_timeout=settings.NOTE_TEXT_CACHE_TIMEOUT,
+)
@@ -0,0 +1,220 @@
+import collections
+import typing
+
+# Operations are sequences of components, the same as in ot.js: a positive
+# integer retains that many characters, a negative one deletes them, and a
+# string is inserted. Lengths are counted in UTF-16 code units, like the
+# strings of the browser that produce the operations.
+Component = typing.Union[int, str]
+
+# Operations kept to transform edits made against older versions.
+HISTORY_SIZE = 1000
+
+
+class OperationError(ValueError):
+    pass
+
+
+def get_length(text: str) -> int:
+    return len(text.encode("utf-16-le", "surrogatepass")) // 2
+
+
+class TextOperation:
+    def __init__(self):
+        self.components: typing.List[Component] = []
+        self.base_length = 0
+        self.target_length = 0
+
+    @classmethod
+    def from_json(cls, data) -> "TextOperation":
+        if not isinstance(data, list):
+            raise OperationError("An operation must be a list.")
+
+        operation = cls()
+
+        for component in data:
+            if isinstance(component, str):
+                operation.insert(component)
+            elif isinstance(component, int) and not isinstance(component, bool):
+                if component > 0:
+                    operation.retain(component)
+                elif component < 0:
+                    operation.delete(-component)
+                else:
+                    raise OperationError("Empty component.")
+            else:
+                raise OperationError(f"Unknown component: {component!r}.")
+
+        return operation
+
+    def to_json(self) -> typing.List[Component]:
+        return list(self.components)
+
+    def retain(self, length: int) -> "TextOperation":
+        if length == 0:
+            return self
+
+        self.base_length += length
+        self.target_length += length
+
+        if self.components and _is_retain(self.components[-1]):
+            self.components[-1] += length
+        else:
+            self.components.append(length)
+
+        return self
+
+    def insert(self, text: str) -> "TextOperation":
+        if not text:
+            return self
+
+        self.target_length += get_length(text)
+        components = self.components
+
+        if components and isinstance(components[-1], str):
+            components[-1] += text
+        elif components and _is_delete(components[-1]):
+            # Inserts always go before deletes, so that equivalent operations
+            # have the same components.
+            if len(components) > 1 and isinstance(components[-2], str):
+                components[-2] += text
+            else:
+                components.insert(len(components) - 1, text)
+        else:
+            components.append(text)
+
+        return self
+
+    def delete(self, length: int) -> "TextOperation":
+        if length == 0:
+            return self
+
+        self.base_length += length
+
+        if self.components and _is_delete(self.components[-1]):
+            self.components[-1] -= length
+        else:
+            self.components.append(-length)
+
+        return self
+
+    def apply(self, document: bytearray) -> None:
+        """
+        Apply the operation in place to a UTF-16-LE encoded document.
+        """
+        if len(document) // 2 != self.base_length:
+            raise OperationError("The operation does not match the document.")
+
+        cursor = 0
+
+        for component in self.components:
+            if isinstance(component, str):
+                encoded = component.encode("utf-16-le", "surrogatepass")
+                document[cursor:cursor] = encoded
+                cursor += len(encoded)
+            elif component > 0:
+                cursor += component * 2
+            else:
+                del document[cursor : cursor - component * 2]
+
+    @staticmethod
+    def transform(
+        a: "TextOperation", b: "TextOperation"
+    ) -> typing.Tuple["TextOperation", "TextOperation"]:
+        """
+        Transform two concurrent operations on the same document into
+        `(a', b')`, so that applying `a` then `b'` gives the same document as
+        `b` then `a'`. Text inserted by `a` goes first when both insert at the
+        same position.
+        """
+        if a.base_length != b.base_length:
+            raise OperationError("Concurrent operations must share a base.")
+
+        a_prime, b_prime = TextOperation(), TextOperation()
+        components_a, components_b = iter(a.components), iter(b.components)
+        component_a, component_b = next(components_a, None), next(components_b, None)
+
+        while component_a is not None or component_b is not None:
+            if isinstance(component_a, str):
+                a_prime.insert(component_a)
+                b_prime.retain(get_length(component_a))
+                component_a = next(components_a, None)
+                continue
+
+            if isinstance(component_b, str):
+                a_prime.retain(get_length(component_b))
+                b_prime.insert(component_b)
+                component_b = next(components_b, None)
+                continue
+
+            if component_a is None or component_b is None:
+                raise OperationError("Concurrent operations must share a base.")
+
+            length = min(abs(component_a), abs(component_b))
+
+            if _is_retain(component_a) and _is_retain(component_b):
+                a_prime.retain(length)
+                b_prime.retain(length)
+            elif _is_delete(component_a) and _is_retain(component_b):
+                a_prime.delete(length)
+            elif _is_retain(component_a) and _is_delete(component_b):
+                b_prime.delete(length)
+
+            # Whatever is left of the longer component is handled next round.
+            component_a = _shorten(component_a, length) or next(components_a, None)
+            component_b = _shorten(component_b, length) or next(components_b, None)
+
+        return a_prime, b_prime
+
+
+def _is_retain(component: Component) -> bool:
+    return isinstance(component, int) and component > 0
+
+
+def _is_delete(component: Component) -> bool:
+    return isinstance(component, int) and component < 0
+
+
+def _shorten(component: int, length: int) -> int:
+    return component - length if component > 0 else component + length
+
+
+class NoteDocument:
+    """
+    Authoritative copy of a note being edited, with the operations applied
+    to it recently.
+
+    Every applied operation increases `version`. Operations written against
+    an older version are transformed against the ones applied since, as long
+    as those are still in the history.
+    """
+
+    def __init__(self, text: str, history_size: int = HISTORY_SIZE):
+        self._data = bytearray(text.encode("utf-16-le", "surrogatepass"))
+        self._history: typing.Deque[TextOperation] = collections.deque(
+            maxlen=history_size
+        )
+        self.version = 0
+
+    @property
+    def text(self) -> str:
+        return self._data.decode("utf-16-le", "replace")
+
+    def apply(self, version: int, operation: TextOperation) -> TextOperation:
+        """
+        Apply an operation written against `version` and return it as it was
+        applied to the current text.
+        """
+        oldest_version = self.version - len(self._history)
+
+        if not oldest_version <= version <= self.version:
+            raise OperationError(f"Unknown version: {version}.")
+
+        for index in range(version - oldest_version, len(self._history)):
+            operation, _ = TextOperation.transform(operation, self._history[index])
+
+        operation.apply(self._data)
+        self._history.append(operation)
+        self.version += 1
+
+        return operation